@@ -0,0 +1,215 @@
+"""Store airtable schema fields in shared blobs. The fields of each table
+are moved out of the `airtable_schema_field` table and into compressed blobs,
+addressed by their hash, that the tables point to.
+
+Revision ID: 0021e479f3db
+Revises: f373f5b0b6ce
+Create Date: 2026-10-18 05:58:04.312737
+
+"""
+import json
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from hashlib import sha256
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+from sqlalchemy.dialects import sqlite
+
+# the schema tables as they are at this revision. The setting ids are copied
+# as they are stored, so they are plain strings here.
+schema_table_table = sa.table(
+    "airtable_schema_table",
+    sa.column("data_store_setting_id", sa.String),
+    sa.column("base_id", sa.String),
+    sa.column("table_id", sa.String),
+    sa.column("blob_hash", sa.String),
+)
+schema_field_table = sa.table(
+    "airtable_schema_field",
+    sa.column("data_store_setting_id", sa.String),
+    sa.column("base_id", sa.String),
+    sa.column("table_id", sa.String),
+    sa.column("field_id", sa.String),
+    sa.column("name", sa.String),
+    sa.column("description", sa.String),
+    sa.column("type", sa.String),
+    sa.column("options", sa.JSON),
+    sa.column("position", sa.Integer),
+)
+schema_blob_table = sa.table(
+    "airtable_schema_blob",
+    sa.column("hash", sa.String),
+    sa.column("data", sa.LargeBinary),
+    sa.column("size", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+)
+
+# revision identifiers, used by Alembic.
+revision = "0021e479f3db"
+down_revision = "f373f5b0b6ce"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "airtable_schema_blob",
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("hash", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("hash"),
+    )
+    op.create_table(
+        "airtable_schema_source",
+        sa.Column(
+            "data_store_setting_id", sqlmodel.sql.sqltypes.GUID(), nullable=False
+        ),
+        sa.Column("account_id", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["data_store_setting_id"], ["data_store_setting.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("data_store_setting_id"),
+    )
+    op.create_index(
+        op.f("ix_airtable_schema_source_account_id"),
+        "airtable_schema_source",
+        ["account_id"],
+        unique=False,
+    )
+    op.add_column(
+        "airtable_schema_table",
+        sa.Column("blob_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+
+    # Move the fields of every table into blobs
+    connection = op.get_bind()
+    fields_by_table = defaultdict(list)
+    for row in connection.execute(
+        sa.select(schema_field_table).order_by(schema_field_table.c.position)
+    ):
+        field = {
+            "id": row.field_id,
+            "name": row.name,
+            "description": row.description,
+            "type": row.type,
+            "options": row.options,
+        }
+        fields_by_table[(row.data_store_setting_id, row.base_id, row.table_id)].append(
+            {key: value for key, value in field.items() if value is not None}
+        )
+    blobs = {}
+    for row in connection.execute(sa.select(schema_table_table)):
+        fields_json = json.dumps(
+            fields_by_table[(row.data_store_setting_id, row.base_id, row.table_id)],
+            sort_keys=True,
+            separators=(",", ":"),
+        ).encode()
+        blob_hash = sha256(fields_json).hexdigest()
+        if blob_hash not in blobs:
+            blobs[blob_hash] = {
+                "hash": blob_hash,
+                "data": zlib.compress(fields_json, 9),
+                "size": len(fields_json),
+                "created_at": datetime.utcnow(),
+            }
+        connection.execute(
+            schema_table_table.update()
+            .where(
+                schema_table_table.c.data_store_setting_id == row.data_store_setting_id
+            )
+            .where(schema_table_table.c.base_id == row.base_id)
+            .where(schema_table_table.c.table_id == row.table_id)
+            .values(blob_hash=blob_hash)
+        )
+    if blobs:
+        op.bulk_insert(schema_blob_table, list(blobs.values()))
+
+    # sqlite can't add a foreign key to an existing table, so the table has to
+    # be recreated
+    with op.batch_alter_table("airtable_schema_table") as batch_op:
+        batch_op.alter_column("blob_hash", nullable=False)
+        batch_op.create_index(
+            batch_op.f("ix_airtable_schema_table_blob_hash"),
+            ["blob_hash"],
+            unique=False,
+        )
+        batch_op.create_foreign_key(
+            "fk_airtable_schema_table_blob_hash",
+            "airtable_schema_blob",
+            ["blob_hash"],
+            ["hash"],
+        )
+    op.drop_index(
+        "ix_airtable_schema_field_field_id", table_name="airtable_schema_field"
+    )
+    op.drop_table("airtable_schema_field")
+
+
+def downgrade() -> None:
+    op.create_table(
+        "airtable_schema_field",
+        sa.Column("data_store_setting_id", sa.CHAR(length=32), nullable=False),
+        sa.Column("options", sqlite.JSON(), nullable=True),
+        sa.Column("base_id", sa.VARCHAR(), nullable=False),
+        sa.Column("table_id", sa.VARCHAR(), nullable=False),
+        sa.Column("field_id", sa.VARCHAR(), nullable=False),
+        sa.Column("name", sa.VARCHAR(), nullable=False),
+        sa.Column("description", sa.VARCHAR(), nullable=True),
+        sa.Column("type", sa.VARCHAR(), nullable=True),
+        sa.Column("position", sa.INTEGER(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["data_store_setting_id"], ["data_store_setting.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint(
+            "data_store_setting_id", "base_id", "table_id", "field_id"
+        ),
+    )
+    op.create_index(
+        "ix_airtable_schema_field_field_id",
+        "airtable_schema_field",
+        ["field_id"],
+        unique=False,
+    )
+
+    # Move the fields out of the blobs again
+    connection = op.get_bind()
+    fields_by_hash = {
+        row.hash: json.loads(zlib.decompress(row.data))
+        for row in connection.execute(sa.select(schema_blob_table))
+    }
+    field_rows = []
+    for row in connection.execute(sa.select(schema_table_table)):
+        for position, field in enumerate(fields_by_hash[row.blob_hash]):
+            field_rows.append(
+                {
+                    "data_store_setting_id": row.data_store_setting_id,
+                    "base_id": row.base_id,
+                    "table_id": row.table_id,
+                    "field_id": field["id"],
+                    "name": field["name"],
+                    "description": field.get("description"),
+                    "type": field.get("type"),
+                    "options": field.get("options"),
+                    "position": position,
+                }
+            )
+    if field_rows:
+        op.bulk_insert(schema_field_table, field_rows)
+
+    with op.batch_alter_table("airtable_schema_table") as batch_op:
+        batch_op.drop_constraint(
+            "fk_airtable_schema_table_blob_hash", type_="foreignkey"
+        )
+        batch_op.drop_index(batch_op.f("ix_airtable_schema_table_blob_hash"))
+        batch_op.drop_column("blob_hash")
+    op.drop_index(
+        op.f("ix_airtable_schema_source_account_id"),
+        table_name="airtable_schema_source",
+    )
+    op.drop_table("airtable_schema_source")
+    op.drop_table("airtable_schema_blob")
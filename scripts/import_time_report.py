@@ -0,0 +1,88 @@
+"""
+This script reports how long it takes to import the server (or any other
+modules), and which modules that time goes to. It imports the modules in a
+fresh interpreter with `-X importtime` and prints:
+
+1. The total import time and the peak memory (RSS) of that interpreter
+2. The modules that took the longest to import, including their own imports
+3. The top-level packages that took the longest, counting only the time
+    spent in their own modules
+
+Usage (from the root of the repo):
+    python scripts/import_time_report.py [module ...] [--top N]
+
+The modules default to `server.api.views`, i.e. what every API worker loads.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# e.g. "import time:       212 |     175982 |   fastapi_azure_auth"
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+parser = argparse.ArgumentParser(description="Report the import time of modules")
+parser.add_argument("modules", nargs="*", default=["server.api.views"])
+parser.add_argument(
+    "--top", type=int, default=20, help="how many modules and packages to list"
+)
+args = parser.parse_args()
+
+imports = "; ".join(f"import {module}" for module in args.modules)
+child = subprocess.run(
+    [
+        sys.executable,
+        "-X",
+        "importtime",
+        "-c",
+        # ru_maxrss is in kilobytes on linux (and bytes on macOS)
+        f"import resource; {imports}; "
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)",
+    ],
+    cwd=Path(__file__).resolve().parent.parent,
+    env={**os.environ, "PYTHONPATH": "."},
+    capture_output=True,
+    text=True,
+    check=False,
+)
+if child.returncode != 0:
+    sys.exit(child.stderr)
+
+# (self time, cumulative time, depth, module) of every imported module, in
+# microseconds
+timings = []
+for line in child.stderr.splitlines():
+    match = IMPORT_TIME_LINE.match(line)
+    if match:
+        self_us, cumulative_us, indent, module = match.groups()
+        timings.append((int(self_us), int(cumulative_us), len(indent), module))
+
+# only the modules imported directly count towards the total, since the
+# cumulative time of each one already includes its own imports
+total_us = sum(cumulative for _, cumulative, depth, _ in timings if depth == 1)
+max_rss = int(child.stdout.split()[-1])
+if sys.platform == "darwin":
+    max_rss //= 1024
+
+print(f"Imported {', '.join(args.modules)}")
+print(
+    f"  {len(timings)} modules in {total_us / 1e6:.2f}s, peak RSS {max_rss / 1024:.1f} MB"
+)
+
+print("\nSlowest modules (including their imports):")
+for self_us, cumulative_us, _, module in sorted(
+    timings, key=lambda timing: timing[1], reverse=True
+)[: args.top]:
+    print(f"  {cumulative_us / 1e3:9.1f} ms  {module}")
+
+self_us_by_package: dict[str, int] = defaultdict(int)
+for self_us, _, _, module in timings:
+    self_us_by_package[module.split(".")[0]] += self_us
+print("\nSlowest packages (own modules only):")
+for package, self_us in sorted(
+    self_us_by_package.items(), key=lambda item: item[1], reverse=True
+)[: args.top]:
+    print(f"  {self_us / 1e3:9.1f} ms  {package}")
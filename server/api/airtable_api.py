@@ -1,13 +1,23 @@
 import json
 import logging
 import sys
-from typing import Any, Literal, TypedDict, cast
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from hashlib import sha256
+from typing import Any, Literal, Mapping, TypedDict, cast
+from urllib.parse import urlparse
 
 import requests
 from fastapi import HTTPException
+from pydantic import BaseModel, Field
 from pyairtable import Api  # type: ignore
-from pyairtable.formulas import FIND, LOWER, OR, STR_VALUE
+from pyairtable.formulas import FIND, LOWER, OR, STR_VALUE, escape_quotes
+from requests.adapters import HTTPAdapter
 
+from server.api.airtable_cache import airtable_cache
+from server.api.airtable_config import AIRTABLE_SCHEMA_FETCH_WORKERS
+from server.api.airtable_rate_limit import META_BUCKET, airtable_rate_limiter
+from server.api.single_flight import SingleFlight, token_fingerprint
 from server.models.data_store_setting.airtable_config import (
     AirtableBase,
     AirtableConfig,
@@ -20,6 +30,95 @@ from server.models.data_store_setting.airtable_config import (
 Record = dict[str, Any]
 PartialRecord = dict[str, Any]
 
+
+class RecordsPage(TypedDict):
+    """A single page of records. `offset` is the cursor to pass back to get
+    the next page, and is None on the last page."""
+
+    records: list[Record]
+    offset: str | None
+
+
+class SearchOptions(BaseModel):
+    """Options of a search that are pushed down into the Airtable request, so
+    that Airtable only sends us what we actually need."""
+
+    # the fields to return for each record. All fields are returned if None.
+    fields: list[str] | None = None
+    # the name or id of a view to search in
+    view: str | None = None
+    # field names to sort by, prefixed with a '-' to sort in descending order
+    sort: list[str] | None = None
+    # the maximum number of records to return in total
+    maxRecords: int | None = None
+
+    def cache_key(self) -> tuple:
+        return (
+            tuple(self.fields) if self.fields is not None else None,
+            self.view,
+            tuple(self.sort) if self.sort is not None else None,
+            self.maxRecords,
+        )
+
+    def to_params(self) -> dict[str, Any]:
+        """Convert the options to the query params of Airtable's list records
+        endpoint"""
+        params: dict[str, Any] = {}
+        if self.fields:
+            params["fields[]"] = self.fields
+        if self.view:
+            params["view"] = self.view
+        for idx, sort_field in enumerate(self.sort or []):
+            params[f"sort[{idx}][field]"] = sort_field.lstrip("-")
+            params[f"sort[{idx}][direction]"] = (
+                "desc" if sort_field.startswith("-") else "asc"
+            )
+        if self.maxRecords:
+            params["maxRecords"] = self.maxRecords
+        return params
+
+    def to_pyairtable_options(self) -> dict[str, Any]:
+        """Convert the options to the keyword arguments pyairtable expects"""
+        options: dict[str, Any] = {}
+        if self.fields:
+            options["fields"] = self.fields
+        if self.view:
+            options["view"] = self.view
+        if self.sort:
+            options["sort"] = self.sort
+        if self.maxRecords:
+            options["max_records"] = self.maxRecords
+        return options
+
+
+class RecordUpdate(BaseModel):
+    """An update to a single record in a batch update"""
+
+    id: str
+    fields: PartialRecord
+
+
+class RecordUpsert(BaseModel):
+    """Records to create, or to update if a record with the same values in
+    `fieldsToMergeOn` already exists"""
+
+    fieldsToMergeOn: list[str] = Field(..., min_items=1, max_items=3)
+    records: list[PartialRecord]
+
+
+class BatchRecordResult(BaseModel):
+    """The result of creating or updating a single record in a batch. If the
+    write failed, `record` is None and `error` and `statusCode` say why, so
+    the caller can retry just the records that failed."""
+
+    record: Record | None = None
+    error: str | None = None
+    statusCode: int = 200
+    # set instead of `record` when the write was stored in the outbox, to be
+    # delivered to Airtable later
+    outboxEntryId: str | None = None
+
+
 logger = logging.getLogger("airtable_api")
 logger.setLevel(logging.INFO)
 
@@ -29,6 +128,23 @@ h.setFormatter(f)
 
 logger.addHandler(h)
 
+# concurrent identical calls to Airtable share a single upstream request
+_fetch_record_flight = SingleFlight("airtable.fetch_record")
+_search_records_flight = SingleFlight("airtable.search_records")
+_fetch_base_schema_flight = SingleFlight("airtable.fetch_base_schema")
+
+# the metadata API is only used for schema fetches, which fetch many bases at
+# once, so they share a session that keeps a connection open per worker
+_schema_session = requests.Session()
+_schema_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=max(AIRTABLE_SCHEMA_FETCH_WORKERS, 1),
+    ),
+)
+SCHEMA_REQUEST_TIMEOUT_SECONDS = 30
+
 
 class AirtableAPI_BaseModel(TypedDict):
     id: str
@@ -106,6 +222,79 @@ class GetBaseSchemaResponse(TypedDict):
     tables: list[AirtableAPI_TableModel]
 
 
+def raise_for_airtable_error(
+    error: Exception,
+    status_code: int,
+    reason: str,
+    content: bytes,
+    url: str,
+    headers: Mapping[str, str] | None = None,
+) -> None:
+    """
+    Raise an HTTPException that forwards an error response from Airtable,
+    complete with proper error codes and helpful explanatory messages.
+    Errors that we don't know how to forward are left to the caller.
+    """
+    if status_code == 404:
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"Resource at {url} not found",
+        ) from error
+    if status_code == 400:
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"Bad Request: {reason}",
+        ) from error
+    if status_code == 422:
+        airtable_error = json.loads(content)["error"]
+        error_message = f"{airtable_error['type']}: {airtable_error['message']}"
+        raise HTTPException(status_code=status_code, detail=error_message) from error
+    if status_code == 429:
+        # we ran out of retries, so let the client know when to try again.
+        # Airtable locks us out for 30 seconds if it doesn't say otherwise.
+        raise HTTPException(
+            status_code=status_code,
+            detail="Too many requests to Airtable, try again shortly",
+            headers={"Retry-After": (headers or {}).get("Retry-After", "30")},
+        ) from error
+
+
+def airtable_base_fingerprint(
+    base: AirtableAPI_BaseModel, base_schema: GetBaseSchemaResponse
+) -> str:
+    """
+    Hash the parts of a base's schema that we store in an AirtableBase, so
+    that a schema refresh can skip bases that haven't changed. Views aren't
+    stored, so changes to them are ignored.
+    """
+    stored_schema = {
+        "name": base.get("name", ""),
+        "tables": [
+            {
+                "id": table["id"],
+                "name": table["name"],
+                "description": table.get("description", ""),
+                "fields": [
+                    {
+                        key: field.get(key)
+                        for key in ("id", "name", "description", "type", "options")
+                    }
+                    for field in table["fields"]
+                ],
+            }
+            for table in base_schema["tables"]
+        ],
+    }
+    return sha256(json.dumps(stored_schema, sort_keys=True).encode()).hexdigest()
+
+
+def airtable_schema_fingerprint(bases: list[AirtableBase]) -> str:
+    """Hash a whole schema from the fingerprints of its bases"""
+    return sha256(
+        json.dumps([(base.id, base.fingerprint) for base in bases]).encode()
+    ).hexdigest()
+
+
 def airtable_errors_wrapped(func):
     """
     Decorates a function that queries airtable.
@@ -128,31 +317,74 @@ def airtable_errors_wrapped(func):
                 e,
             )
 
-            if e.response:
-                if e.response.status_code == 404:
-                    url = e.request.url if e.request else "url"
-                    raise HTTPException(
-                        status_code=e.response.status_code,
-                        detail=f"Resource at {url} not found",
-                    ) from e
-                if e.response.status_code == 400:
-                    raise HTTPException(
-                        status_code=e.response.status_code,
-                        detail=f"Bad Request: {e.response.reason}",
-                    ) from e
-                if e.response.status_code == 422:
-                    airtable_error = json.loads(e.response.content)["error"]
-                    error_message = (
-                        f"{airtable_error['type']}: {airtable_error['message']}"
-                    )
-                    raise HTTPException(
-                        status_code=e.response.status_code, detail=error_message
-                    ) from e
+            # a failed `Response` is falsy, so compare against None explicitly
+            if e.response is not None:
+                raise_for_airtable_error(
+                    e,
+                    e.response.status_code,
+                    e.response.reason,
+                    e.response.content,
+                    e.request.url if e.request else "url",
+                    e.response.headers,
+                )
             raise
 
     return wrapped
 
 
+def build_search_formula(query: PartialRecord) -> str:
+    """
+    Build the formula for a search: a record matches if any of the queried
+    fields contains its query term, case-insensitive.
+    """
+    # we do NOT use pyairtable.FIELD (which is : "{%s}" % escape_quotes(name) )
+    # because it re-escaped single quotes that were already escaped
+    find_statements = [
+        FIND(LOWER(STR_VALUE(query_val)), LOWER("{%s}" % field_name))
+        for field_name, query_val in query.items()
+    ]
+    return OR(*find_statements)
+
+
+def build_record_ids_formula(record_ids: list[str]) -> str:
+    """Build the formula to select the records with the given ids"""
+    return OR(
+        *[f"RECORD_ID()='{escape_quotes(record_id)}'" for record_id in record_ids]
+    )
+
+
+def build_modified_since_formula(since: datetime | None) -> str | None:
+    """
+    Build the formula to select records that were created or modified after
+    a given (naive UTC) time. Returns None if there is no time to filter on.
+    """
+    if since is None:
+        return None
+    return "IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('%s'))" % (
+        since.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    )
+
+
+class RateLimitedApi(Api):
+    """A pyairtable `Api` that sends every request through the
+    `airtable_rate_limiter` bucket of its base."""
+
+    # the rate limiter paces requests, so pyairtable doesn't need to sleep
+    # between pages
+    API_LIMIT = 0
+
+    def _request(self, method: str, url: str, params=None, json_data=None):
+        # table urls look like https://api.airtable.com/v0/{base_id}/{table}
+        base_id = urlparse(url).path.split("/")[2]
+        response = airtable_rate_limiter.send(
+            base_id,
+            lambda: self.session.request(
+                method, url, params=params, json=json_data, timeout=self.timeout
+            ),
+        )
+        return self._process_response(response)
+
+
 class AirtableAPI:
     """
     A client to query an Airtable base.
@@ -163,7 +395,7 @@ class AirtableAPI:
             self.access_token = airtable_config.authSettings.accessToken
 
             # use the access token to authenticate with the Airtable API
-            self.api = Api(airtable_config.authSettings.accessToken)
+            self.api = RateLimitedApi(airtable_config.authSettings.accessToken)
         else:
             logger.warning(
                 "**No Airtable access token set. Airtable endpoints will not function.**"
@@ -180,12 +412,27 @@ class AirtableAPI:
 
         Returns: An Airtable record
         """
-        logger.debug("Fetching record %s in %s", id, table_name)
-        return self.api.get(base_id, table_name, id)
+        cached_record = airtable_cache.get_record(self.access_token, base_id, id)
+        if cached_record is not None:
+            return cached_record
+
+        def fetch() -> Record:
+            logger.debug("Fetching record %s in %s", id, table_name)
+            record = self.api.get(base_id, table_name, id)
+            airtable_cache.set_record(self.access_token, base_id, record)
+            return record
+
+        return _fetch_record_flight.do(
+            (token_fingerprint(self.access_token), base_id, id), fetch
+        )
 
     @airtable_errors_wrapped
     def search_records(
-        self, base_id: str, table_name: str, query: PartialRecord
+        self,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        options: SearchOptions | None = None,
     ) -> list[Record]:
         """
         Fetch all records from a table on Airtable that partially match a
@@ -196,6 +443,7 @@ class AirtableAPI:
         - table_name: The name of the table to be queried
         - query: a dictionary from query keys to query terms
             - expects any quotes in field_names to be properly escaped
+        - options: fields, view, sort and maxRecords to push down to Airtable
 
         Returns: A list of records matching that query
         """
@@ -207,15 +455,52 @@ class AirtableAPI:
         if query:
             logger.debug("With %s", query)
 
-        # we do NOT use pyairtable.FIELD (which is : "{%s}" % escape_quotes(name) )
-        # because it re-escaped single quotes that were already escaped
-        find_statements = [
-            FIND(LOWER(STR_VALUE(query_val)), LOWER("{%s}" % field_name))
-            for field_name, query_val in query.items()
-        ]
-        find_formula = OR(*find_statements)
-        results = self.api.all(base_id, table_name, formula=find_formula)
-        return results
+        options = options or SearchOptions()
+        cache_key = airtable_cache.search_key(
+            self.access_token, base_id, table_name, query, options.cache_key()
+        )
+        cached_results = airtable_cache.get_search(cache_key)
+        if cached_results is not None:
+            return cached_results
+
+        def search() -> list[Record]:
+            find_formula = build_search_formula(query)
+            results = self.api.all(
+                base_id,
+                table_name,
+                formula=find_formula,
+                **options.to_pyairtable_options(),
+            )
+            airtable_cache.set_search(cache_key, results)
+            return results
+
+        # the cache key starts with the access token's fingerprint, so searches
+        # made with different credentials are never coalesced
+        return _search_records_flight.do(cache_key, search)
+
+    @airtable_errors_wrapped
+    def fetch_records_modified_since(
+        self, base_id: str, table_name: str, since: datetime | None = None
+    ) -> list[Record]:
+        """
+        Fetch all records from a table on Airtable that were created or
+        modified after a given time. If `since` is None, all the records in
+        the table are returned.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - since: a naive UTC datetime
+
+        Returns: A list of records
+        """
+        logger.debug(
+            "Fetching records in base: %s table: %s modified since %s",
+            base_id,
+            table_name,
+            since,
+        )
+        formula = build_modified_since_formula(since)
+        return self.api.all(base_id, table_name, formula=formula)
 
     @airtable_errors_wrapped
     def create_record(self, base_id: str, table_name: str, record: Record) -> Record:
@@ -234,7 +519,9 @@ class AirtableAPI:
             table_name,
             record,
         )
-        return self.api.create(base_id, table_name, record, typecast=True)
+        new_record = self.api.create(base_id, table_name, record, typecast=True)
+        airtable_cache.record_written(self.access_token, base_id, new_record)
+        return new_record
 
     @airtable_errors_wrapped
     def update_record(
@@ -258,7 +545,7 @@ class AirtableAPI:
             table_name,
             update,
         )
-        return cast(
+        updated_record = cast(
             dict,
             self.api.update(
                 base_id=base_id,
@@ -268,23 +555,49 @@ class AirtableAPI:
                 typecast=True,
             ),
         )
+        airtable_cache.record_written(self.access_token, base_id, updated_record)
+        return updated_record
 
-    def fetch_schema(self) -> list[AirtableBase]:
+    def fetch_schema(
+        self, known_bases: list[AirtableBase] | None = None
+    ) -> list[AirtableBase]:
         """Fetch the airtable schema using the `authSettings` from an existing
         config.
         An airtable schema is just a list of AirtableBase models.
+
+        Arguments:
+        - known_bases: The bases we fetched before. Any of them that haven't
+          changed since (going by their fingerprint) are returned as is
+          instead of being converted again.
         """
+        known_bases_by_id = {base.id: base for base in known_bases or []}
         basesResponse = self._fetch_bases_list()
+        bases = basesResponse["bases"]
+
+        # fetch the base schemas concurrently: each base has its own rate
+        # limit, so this is only bounded by how many workers we allow
+        with ThreadPoolExecutor(
+            max_workers=max(min(AIRTABLE_SCHEMA_FETCH_WORKERS, len(bases)), 1)
+        ) as executor:
+            base_schemas = list(
+                executor.map(lambda base: self._fetch_base_schema(base["id"]), bases)
+            )
 
         airtable_bases = []
-        for base in basesResponse["bases"]:
-            base_schema = self._fetch_base_schema(base["id"])
+        for base, base_schema in zip(bases, base_schemas):
+            fingerprint = airtable_base_fingerprint(base, base_schema)
+            known_base = known_bases_by_id.get(base["id"])
+            if known_base is not None and known_base.fingerprint == fingerprint:
+                airtable_bases.append(known_base)
+                continue
+
             # convert the JSON schema we get from the backend into an
             # AirtableBase model
             airtable_bases.append(
                 AirtableBase(
                     id=base.get("id", ""),
                     name=base.get("name", ""),
+                    fingerprint=fingerprint,
                     tables=[
                         AirtableTable(
                             id=table["id"],
@@ -309,20 +622,50 @@ class AirtableAPI:
             )
         return airtable_bases
 
-    def _fetch_bases_list(self) -> ListBasesResponse:
+    def fetch_user_id(self) -> str:
         """
-        Fetch the list of bases.
-        curl "https://api.airtable.com/v0/meta/bases" \
+        Fetch the id of the Airtable user that the access token belongs to.
+        curl "https://api.airtable.com/v0/meta/whoami" \
         -H "Authorization: Bearer YOUR_TOKEN"
         """
-        r = requests.get(
-            "https://api.airtable.com/v0/meta/bases",
-            headers={"Authorization": f"Bearer {self.access_token}"},
+        r = airtable_rate_limiter.send(
+            META_BUCKET,
+            lambda: _schema_session.get(
+                "https://api.airtable.com/v0/meta/whoami",
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                timeout=SCHEMA_REQUEST_TIMEOUT_SECONDS,
+            ),
         )
         if r.status_code != 200:
             raise HTTPException(status_code=r.status_code, detail=r.reason)
-        bases_response = r.json()
-        return bases_response
+        return r.json()["id"]
+
+    def _fetch_bases_list(self) -> ListBasesResponse:
+        """
+        Fetch the list of bases, following the `offset` of each page until
+        all bases have been fetched.
+        curl "https://api.airtable.com/v0/meta/bases?offset=OFFSET" \
+        -H "Authorization: Bearer YOUR_TOKEN"
+        """
+        bases: list[AirtableAPI_BaseModel] = []
+        offset = None
+        while True:
+            r = airtable_rate_limiter.send(
+                META_BUCKET,
+                lambda: _schema_session.get(
+                    "https://api.airtable.com/v0/meta/bases",
+                    params={"offset": offset} if offset else None,
+                    headers={"Authorization": f"Bearer {self.access_token}"},
+                    timeout=SCHEMA_REQUEST_TIMEOUT_SECONDS,
+                ),
+            )
+            if r.status_code != 200:
+                raise HTTPException(status_code=r.status_code, detail=r.reason)
+            bases_page = r.json()
+            bases.extend(bases_page["bases"])
+            offset = bases_page.get("offset")
+            if not offset:
+                return {"bases": bases, "offset": None}
 
     def _fetch_base_schema(self, base_id: str) -> GetBaseSchemaResponse:
         """
@@ -331,11 +674,20 @@ class AirtableAPI:
         curl "https://api.airtable.com/v0/meta/bases/{base_id}/tables"
         -H "Authorization: Bearer YOUR_TOKEN
         """
-        r = requests.get(
-            f"https://api.airtable.com/v0/meta/bases/{base_id}/tables",
-            headers={"Authorization": f"Bearer {self.access_token}"},
+
+        def fetch() -> GetBaseSchemaResponse:
+            r = airtable_rate_limiter.send(
+                base_id,
+                lambda: _schema_session.get(
+                    f"https://api.airtable.com/v0/meta/bases/{base_id}/tables",
+                    headers={"Authorization": f"Bearer {self.access_token}"},
+                    timeout=SCHEMA_REQUEST_TIMEOUT_SECONDS,
+                ),
+            )
+            if r.status_code != 200:
+                raise HTTPException(status_code=r.status_code, detail=r.reason)
+            return r.json()
+
+        return _fetch_base_schema_flight.do(
+            (token_fingerprint(self.access_token), base_id), fetch
         )
-        if r.status_code != 200:
-            raise HTTPException(status_code=r.status_code, detail=r.reason)
-        tables_response = r.json()
-        return tables_response
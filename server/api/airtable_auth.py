@@ -0,0 +1,188 @@
+"""Helpers to keep the OAuth access tokens of Airtable data stores fresh."""
+import base64
+import logging
+from datetime import datetime, timedelta
+
+from cachetools import TTLCache
+
+from server.api.airtable_config import (
+    AIRTABLE_CLIENT_ID,
+    AIRTABLE_CLIENT_SECRET,
+    AIRTABLE_TOKEN_URL,
+)
+from server.api.airtable_rate_limit import OAUTH_BUCKET, airtable_rate_limiter
+from server.api.async_airtable_api import get_http_client
+from server.api.services.interview_service import InterviewService
+from server.models.data_store_setting.airtable_config import AirtableConfig
+
+LOG = logging.getLogger(__name__)
+
+AIRTABLE_AUTH_TIMEOUT_BUFFER_MS = 600000
+
+# the interviews whose token use was recorded recently. The token refresher
+# only cares about days of inactivity, so each server process writes the last
+# use of an interview's tokens at most once an hour.
+_recorded_token_uses: TTLCache = TTLCache(maxsize=10000, ttl=3600)
+
+
+def is_airtable_access_token_expired(
+    airtable_config: AirtableConfig, buffer=AIRTABLE_AUTH_TIMEOUT_BUFFER_MS
+):
+    """
+    Checks to see if the token expiry time (minus a buffer) has passed.
+    """
+    # time is stored in miliseconds, but python wants seconds
+    token_expiry_time = datetime.fromtimestamp(
+        airtable_config.authSettings.accessTokenExpires // 1000
+    ) - timedelta(milliseconds=buffer)
+    now = datetime.now()
+    if now > token_expiry_time:
+        LOG.info(
+            "Token expired | Current time: %s | Token expiry time: %s",
+            now,
+            token_expiry_time,
+        )
+        return True
+    return False
+
+
+def is_airtable_refresh_token_expired(airtable_config: AirtableConfig, buffer):
+    """
+    Checks to see if the token expiry time (minus a buffer) has passed.
+    """
+    # time is stored in miliseconds, but python wants seconds
+    if airtable_config.authSettings:
+        token_expiry_time = datetime.fromtimestamp(
+            airtable_config.authSettings.refreshTokenExpires // 1000
+        ) - timedelta(milliseconds=buffer)
+        now = datetime.now()
+        if now > token_expiry_time:
+            LOG.info(
+                "Refresh token expired | Current time: %s | Refresh token expiry time: %s",
+                now,
+                token_expiry_time,
+            )
+            return True
+        LOG.info(
+            "Refresh token NOT expired | Current time: %s | Refresh token expiry time: %s",
+            now,
+            token_expiry_time,
+        )
+    return False
+
+
+async def refresh_airtable_auth(airtable_config: AirtableConfig):
+    if AIRTABLE_TOKEN_URL is None:
+        LOG.error("AIRTABLE_TOKEN_URL environment variable is not set")
+        return
+
+    if airtable_config.authSettings is None:
+        return
+
+    credentials = f"{AIRTABLE_CLIENT_ID}:{AIRTABLE_CLIENT_SECRET}".encode("utf-8")
+    encoded_credentials = base64.b64encode(credentials).decode("utf-8")
+    authorizationHeader = f"Basic {encoded_credentials}"
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Authorization": authorizationHeader,
+    }
+    params = {
+        "client_id": AIRTABLE_CLIENT_ID,
+        "grant_type": "refresh_token",
+        "refresh_token": airtable_config.authSettings.refreshToken,
+    }
+    response = await airtable_rate_limiter.send_async(
+        OAUTH_BUCKET,
+        lambda: get_http_client().post(
+            url=AIRTABLE_TOKEN_URL, headers=headers, data=params
+        ),
+    )
+    if response.status_code == 400:
+        return airtable_config
+    output = response.json()
+    now = datetime.now()
+
+    access_token_expires_in_seconds = int(output["expires_in"])
+    access_token_expires = now + timedelta(seconds=access_token_expires_in_seconds)
+    access_token_expires_timestamp = (access_token_expires.timestamp()) * 1000
+    output["expires_in"] = access_token_expires_timestamp
+
+    refresh_token_expires_in_seconds = int(output["refresh_expires_in"])
+    refresh_token_expires = now + timedelta(seconds=refresh_token_expires_in_seconds)
+    refresh_token_expires_timestamp = (refresh_token_expires.timestamp()) * 1000
+    output["refresh_expires_in"] = refresh_token_expires_timestamp
+
+    airtable_config.authSettings.accessToken = output["access_token"]
+    airtable_config.authSettings.refreshToken = output["refresh_token"]
+    airtable_config.authSettings.accessTokenExpires = output["expires_in"]
+    airtable_config.authSettings.refreshTokenExpires = output["refresh_expires_in"]
+    return airtable_config
+
+
+async def refresh_and_save_airtable_auth(
+    interview_service: InterviewService,
+    interview_id: str,
+    airtable_config: AirtableConfig,
+) -> AirtableConfig:
+    """
+    Refresh the access token of an interview's Airtable config and save the
+    new tokens.
+
+    Returns: The latest config. If the refresh failed, or the tokens were
+    refreshed by someone else first, this is whatever is stored.
+    """
+    used_refresh_token = airtable_config.authSettings.refreshToken
+    refreshed_airtable_config = await refresh_airtable_auth(
+        airtable_config.copy(deep=True)
+    )
+    # refresh_airtable_auth gives the config back unchanged when Airtable
+    # turns the refresh token down
+    if (
+        refreshed_airtable_config is not None
+        and refreshed_airtable_config.authSettings.refreshToken != used_refresh_token
+        and interview_service.save_refreshed_airtable_auth(
+            interview_id, used_refresh_token, refreshed_airtable_config
+        )
+    ):
+        return refreshed_airtable_config
+    return interview_service.get_airtable_config(interview_id)
+
+
+async def get_fresh_airtable_config(
+    interview_service: InterviewService, interview_id: str
+) -> AirtableConfig:
+    """
+    Get the Airtable config of an interview, refreshing (and saving) its
+    access token first if it has expired. The token refresher normally renews
+    access tokens well before this is needed.
+
+    This counts as a use of the interview's tokens, which keeps the token
+    refresher renewing them. Background jobs should use
+    `get_unexpired_airtable_config` instead.
+    """
+    airtable_config = interview_service.get_airtable_config(interview_id)
+    if interview_id not in _recorded_token_uses:
+        interview_service.record_airtable_token_use(interview_id)
+        _recorded_token_uses[interview_id] = True
+    if is_airtable_access_token_expired(airtable_config):
+        LOG.info("Refreshing Airtable auth token")
+        airtable_config = await refresh_and_save_airtable_auth(
+            interview_service, interview_id, airtable_config
+        )
+    return airtable_config
+
+
+def get_unexpired_airtable_config(
+    interview_service: InterviewService, interview_id: str
+) -> AirtableConfig | None:
+    """
+    Get the Airtable config of an interview for a background job, or None if
+    its access token has expired. Background jobs leave expired tokens alone:
+    refreshing them would keep the grants of interviews that nobody uses
+    alive forever. The tokens of interviews that are in use are kept fresh by
+    the token refresher, or refreshed on their next request.
+    """
+    airtable_config = interview_service.get_airtable_config(interview_id)
+    if is_airtable_access_token_expired(airtable_config):
+        return None
+    return airtable_config
@@ -0,0 +1,187 @@
+"""An in-process cache of Airtable search results and records.
+
+A published interview can have hundreds of respondents searching the same
+table at the same time, so we keep recent results around for a short time
+instead of going to Airtable on every keystroke. The cache is process-wide
+because `AirtableAPI` clients are created per request.
+
+Every entry is keyed by a fingerprint of the access token it was fetched
+with, so it is only served to callers with the same credentials. The runner
+endpoints take the base id from the URL, so the base alone says nothing about
+who may read it.
+"""
+import copy
+import threading
+from typing import Any, Hashable
+
+from cachetools import TTLCache
+
+from server.api.airtable_config import (
+    AIRTABLE_CACHE_MAX_SIZE,
+    AIRTABLE_CACHE_TTL_SECONDS,
+)
+from server.api.single_flight import token_fingerprint
+
+Record = dict[str, Any]
+# (access token fingerprint, base, table, normalized query, options)
+SearchKey = tuple[str, str, str, tuple[tuple[str, str], ...], Hashable]
+
+
+class _CountingTTLCache(TTLCache):
+    """A TTLCache (which evicts the least recently used items when it is
+    full) that counts its hits, misses and evictions.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def popitem(self):
+        # `popitem` is only called when an item has to be evicted to make room
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+    def lookup(self, key: Hashable) -> Any | None:
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+            "maxSize": int(self.maxsize),
+        }
+
+
+def normalize_query(query: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    """Normalize a search query so that equivalent queries share a cache key.
+    Searches are case-insensitive and OR the query terms together, so the
+    order of the terms and their case don't matter.
+    """
+    return tuple(
+        sorted(
+            (field_name, str(query_val).lower())
+            for field_name, query_val in query.items()
+        )
+    )
+
+
+class AirtableCache:
+    """
+    A bounded TTL + LRU cache for Airtable search results and records.
+
+    - Search results are keyed by (access token fingerprint, base, table,
+      normalized query, options), where the options are the fields, view,
+      sort and maxRecords
+    - Records are keyed by (access token fingerprint, base, record id)
+
+    Writes to a base must go through `record_written` so that stale entries
+    are patched or dropped. Callers get their own copies of the cached
+    results, so they are free to modify them.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.enabled = max_size > 0 and ttl_seconds > 0
+        self._lock = threading.Lock()
+        self._searches = _CountingTTLCache(max(max_size, 1), max(ttl_seconds, 1))
+        self._records = _CountingTTLCache(max(max_size, 1), max(ttl_seconds, 1))
+
+    @staticmethod
+    def search_key(
+        access_token: str | None,
+        base_id: str,
+        table_name: str,
+        query: dict[str, Any],
+        options: Hashable = None,
+    ) -> SearchKey:
+        return (
+            token_fingerprint(access_token),
+            base_id,
+            table_name,
+            normalize_query(query),
+            options,
+        )
+
+    def get_search(self, key: SearchKey) -> list[Record] | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            records = self._searches.lookup(key)
+        return copy.deepcopy(records)
+
+    def set_search(self, key: SearchKey, records: list[Record]) -> None:
+        if not self.enabled:
+            return
+        records = copy.deepcopy(records)
+        with self._lock:
+            self._searches[key] = records
+
+    def get_record(
+        self, access_token: str | None, base_id: str, record_id: str
+    ) -> Record | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            record = self._records.lookup(
+                (token_fingerprint(access_token), base_id, record_id)
+            )
+        return copy.deepcopy(record)
+
+    def set_record(
+        self, access_token: str | None, base_id: str, record: Record
+    ) -> None:
+        if not self.enabled:
+            return
+        key = (token_fingerprint(access_token), base_id, record["id"])
+        record = copy.deepcopy(record)
+        with self._lock:
+            self._records[key] = record
+
+    def record_written(
+        self, access_token: str | None, base_id: str, record: Record
+    ) -> None:
+        """
+        Update the cache after a record was created or updated in Airtable.
+        The writer's copy of the record is replaced, and any copies fetched
+        with other credentials are dropped. Any cached search on the same
+        base is dropped, because the write could change which records match
+        it. We invalidate per base rather than per table because a table can
+        be referred to by its name or its id.
+        """
+        if not self.enabled:
+            return
+        key = (token_fingerprint(access_token), base_id, record["id"])
+        record = copy.deepcopy(record)
+        with self._lock:
+            for stale_key in [
+                stale_key
+                for stale_key in self._records.keys()
+                if stale_key[1:] == key[1:]
+            ]:
+                self._records.pop(stale_key, None)
+            self._records[key] = record
+            for stale_key in [
+                stale_key
+                for stale_key in self._searches.keys()
+                if stale_key[1] == base_id
+            ]:
+                self._searches.pop(stale_key, None)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {
+                "searches": self._searches.stats(),
+                "records": self._records.stats(),
+            }
+
+
+airtable_cache = AirtableCache(AIRTABLE_CACHE_MAX_SIZE, AIRTABLE_CACHE_TTL_SECONDS)
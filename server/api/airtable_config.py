@@ -12,3 +12,92 @@ AIRTABLE_CLIENT_SECRET = get_env("AIRTABLE_CLIENT_SECRET")
 AIRTABLE_AUTH_URL = get_env("AIRTABLE_AUTH_URL")
 AIRTABLE_SCOPE = get_env("AIRTABLE_SCOPE")
 AIRTABLE_TOKEN_URL = get_env("AIRTABLE_TOKEN_URL")
+
+# Airtable mirror settings. When enabled, the tables referenced by an
+# interview's Airtable entries are synced into the local database and lookups
+# are answered from there.
+AIRTABLE_MIRROR_ENABLED = (get_env("AIRTABLE_MIRROR_ENABLED") or "").lower() == "true"
+# how old (in seconds) a mirrored table can get before a lookup triggers an
+# incremental sync
+AIRTABLE_MIRROR_MAX_STALENESS_SECONDS = int(
+    get_env("AIRTABLE_MIRROR_MAX_STALENESS_SECONDS") or 60
+)
+# for how long (in seconds) past the staleness bound lookups are still answered
+# from the mirror while it is synced in the background. Past that, lookups wait
+# for the sync, so records are never more than MAX_STALENESS + STALE_GRACE old.
+AIRTABLE_MIRROR_STALE_GRACE_SECONDS = int(
+    get_env("AIRTABLE_MIRROR_STALE_GRACE_SECONDS") or 60
+)
+# incremental syncs can't see deleted records, so every so often we do a full
+# sync of the table
+AIRTABLE_MIRROR_FULL_SYNC_SECONDS = int(
+    get_env("AIRTABLE_MIRROR_FULL_SYNC_SECONDS") or 3600
+)
+
+# In-process cache of Airtable search results and records. Set either value to
+# 0 to disable the cache.
+AIRTABLE_CACHE_MAX_SIZE = int(get_env("AIRTABLE_CACHE_MAX_SIZE") or 1024)
+AIRTABLE_CACHE_TTL_SECONDS = int(get_env("AIRTABLE_CACHE_TTL_SECONDS") or 30)
+
+# Airtable allows 5 requests per second per base. All our Airtable traffic is
+# paced per base to stay under that limit.
+AIRTABLE_RATE_LIMIT_PER_SECOND = float(get_env("AIRTABLE_RATE_LIMIT_PER_SECOND") or 5)
+AIRTABLE_RATE_LIMIT_BURST = int(get_env("AIRTABLE_RATE_LIMIT_BURST") or 5)
+# how many requests can wait for a turn on the same base, and how long (in
+# seconds) any of them may wait, before we start turning requests away
+AIRTABLE_RATE_LIMIT_MAX_QUEUE = int(get_env("AIRTABLE_RATE_LIMIT_MAX_QUEUE") or 50)
+AIRTABLE_RATE_LIMIT_MAX_WAIT_SECONDS = float(
+    get_env("AIRTABLE_RATE_LIMIT_MAX_WAIT_SECONDS") or 10
+)
+# how many times a request that got a 429 from Airtable is retried
+AIRTABLE_RATE_LIMIT_MAX_RETRIES = int(get_env("AIRTABLE_RATE_LIMIT_MAX_RETRIES") or 3)
+# how many bases we keep a bucket for. The buckets of the bases that were used
+# least recently are dropped first, so this only needs to be more than the
+# number of bases that are in use at any one time.
+AIRTABLE_RATE_LIMIT_MAX_BUCKETS = int(
+    get_env("AIRTABLE_RATE_LIMIT_MAX_BUCKETS") or 10000
+)
+
+# Airtable outbox settings. When enabled, record creates and updates are
+# stored locally and acknowledged right away, and a background worker delivers
+# them to Airtable.
+AIRTABLE_OUTBOX_ENABLED = (get_env("AIRTABLE_OUTBOX_ENABLED") or "").lower() == "true"
+# how often (in seconds) the worker checks for entries to deliver
+AIRTABLE_OUTBOX_FLUSH_INTERVAL_SECONDS = float(
+    get_env("AIRTABLE_OUTBOX_FLUSH_INTERVAL_SECONDS") or 5
+)
+# how many entries the worker delivers at a time
+AIRTABLE_OUTBOX_BATCH_SIZE = int(get_env("AIRTABLE_OUTBOX_BATCH_SIZE") or 100)
+# how many times delivering an entry is attempted before it is dead-lettered
+AIRTABLE_OUTBOX_MAX_ATTEMPTS = int(get_env("AIRTABLE_OUTBOX_MAX_ATTEMPTS") or 8)
+# Delivery is at least once: if Airtable creates a record but the response is
+# lost (e.g. a timeout), the create is retried and the record is created twice.
+# Setting this to the name of a text field makes the worker fill it in with the
+# outbox entry id of each record it creates, and create records as upserts on
+# that field, so a retried create updates the record instead. Every table that
+# records are created in through the outbox must then have this field.
+AIRTABLE_OUTBOX_CLIENT_KEY_FIELD = get_env("AIRTABLE_OUTBOX_CLIENT_KEY_FIELD")
+
+# Idempotency keys for Airtable record writes. A write that is retried with the
+# same `Idempotency-Key` header within the TTL (in seconds) gets the stored
+# result back instead of writing to Airtable again. At most MAX_KEYS results
+# are kept, the oldest are dropped first.
+AIRTABLE_IDEMPOTENCY_TTL_SECONDS = int(
+    get_env("AIRTABLE_IDEMPOTENCY_TTL_SECONDS") or 86400
+)
+AIRTABLE_IDEMPOTENCY_MAX_KEYS = int(get_env("AIRTABLE_IDEMPOTENCY_MAX_KEYS") or 10000)
+# how long (in seconds) a write holds the claim on its idempotency key. Other
+# server processes answer a retry with the same key with a 409 meanwhile. A
+# claim that is left behind, e.g. by a crashed process, can be taken over once
+# it expires, so this should be longer than the slowest batch write.
+AIRTABLE_IDEMPOTENCY_CLAIM_SECONDS = int(
+    get_env("AIRTABLE_IDEMPOTENCY_CLAIM_SECONDS") or 300
+)
+
+# how many base schemas are fetched at the same time when refreshing the
+# Airtable schema. Each base is still paced by its own rate limit bucket.
+AIRTABLE_SCHEMA_FETCH_WORKERS = int(get_env("AIRTABLE_SCHEMA_FETCH_WORKERS") or 8)
+# a refresh of an interview's schema stores it for every other interview that
+# is connected to the same Airtable account and bases. The periodic refresh
+# skips schemas that were refreshed within this many seconds.
+AIRTABLE_SCHEMA_REUSE_SECONDS = float(get_env("AIRTABLE_SCHEMA_REUSE_SECONDS") or 900)
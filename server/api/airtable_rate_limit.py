@@ -0,0 +1,253 @@
+"""Pacing of all our requests to Airtable.
+
+Airtable allows 5 requests per second per base, and answers anything over that
+with a 429. Every request to Airtable (record searches, fetches and writes,
+schema fetches and token refreshes) goes through `airtable_rate_limiter`,
+which keeps a token bucket per base and makes callers wait for their turn
+instead of bursting past the limit.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Hashable, Protocol, TypeVar
+
+from cachetools import LRUCache
+from fastapi import HTTPException
+
+from server.api.airtable_config import (
+    AIRTABLE_RATE_LIMIT_BURST,
+    AIRTABLE_RATE_LIMIT_MAX_BUCKETS,
+    AIRTABLE_RATE_LIMIT_MAX_QUEUE,
+    AIRTABLE_RATE_LIMIT_MAX_RETRIES,
+    AIRTABLE_RATE_LIMIT_MAX_WAIT_SECONDS,
+    AIRTABLE_RATE_LIMIT_PER_SECOND,
+)
+
+logger = logging.getLogger("airtable_api")
+
+# the buckets for requests that don't belong to a base
+META_BUCKET = "meta"
+OAUTH_BUCKET = "oauth"
+
+# backoff (in seconds) for a 429 that doesn't tell us how long to wait
+RETRY_BASE_DELAY_SECONDS = 1.0
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+
+class _Response(Protocol):
+    """The parts of a `requests` or `httpx` response that we look at"""
+
+    status_code: int
+    headers: dict
+
+
+ResponseT = TypeVar("ResponseT", bound=_Response)
+
+
+class _TokenBucket:
+    """
+    A token bucket that refills at `rate` tokens per second, up to `burst`
+    tokens. Callers reserve a token up front and are told how long to wait
+    for it, so waiting callers are served in order without polling.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1.0 / rate
+        # how far ahead of the steady rate a burst may run
+        self.tolerance = (max(burst, 1) - 1) * self.interval
+        # the time at which the bucket will next be full at the steady rate
+        self.next_free = 0.0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.delayed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    def reserve(self, now: float) -> float:
+        """Reserve the next token and return how long to wait for it"""
+        self.next_free = max(self.next_free, now)
+        wait = max(self.next_free - self.tolerance - now, 0.0)
+        self.next_free += self.interval
+        return wait
+
+    def block_until(self, until: float) -> None:
+        """Hold back new requests until a given time, e.g. after a 429"""
+        self.next_free = max(self.next_free, until + self.tolerance)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "queueDepth": self.queue_depth,
+            "maxQueueDepth": self.max_queue_depth,
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "totalWaitSeconds": round(self.total_wait_seconds, 3),
+            "maxWaitSeconds": round(self.max_wait_seconds, 3),
+            "rejected": self.rejected,
+            "rateLimited": self.rate_limited,
+            "retries": self.retries,
+        }
+
+
+class AirtableRateLimiter:
+    """
+    Schedules requests to Airtable through a token bucket per key (a base id,
+    or one of the META/OAUTH buckets).
+
+    - At most `max_queue` callers can wait on the same bucket, and no caller
+      waits more than `max_wait_seconds`. Anyone else gets a 503 right away.
+    - A 429 from Airtable holds back the whole bucket for the `Retry-After`
+      time (or an exponential backoff if there's none), and the request is
+      retried with jitter up to `max_retries` times. A 429 that asks us to
+      wait longer than `max_wait_seconds` is returned as is.
+
+    It can be used from threads (`send`) and from the event loop
+    (`send_async`) at the same time. Only the buckets of the `max_buckets`
+    most recently used keys are kept.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        max_queue: int,
+        max_wait_seconds: float,
+        max_retries: int,
+        max_buckets: int,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._buckets: LRUCache = LRUCache(maxsize=max(max_buckets, 1))
+
+    def _bucket(self, key: Hashable) -> _TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = _TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _reserve(self, key: Hashable) -> float:
+        """Reserve a turn on a bucket, or raise a 503 if its queue is full"""
+        with self._lock:
+            bucket = self._bucket(key)
+            now = time.monotonic()
+            if bucket.queue_depth >= self.max_queue or (
+                bucket.next_free - bucket.tolerance - now > self.max_wait_seconds
+            ):
+                bucket.rejected += 1
+                retry_after = max(bucket.next_free - bucket.tolerance - now, 1.0)
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many requests to Airtable, try again shortly",
+                    headers={"Retry-After": str(round(retry_after))},
+                )
+            wait = bucket.reserve(now)
+            bucket.requests += 1
+            if wait > 0:
+                bucket.delayed += 1
+                bucket.total_wait_seconds += wait
+                bucket.max_wait_seconds = max(bucket.max_wait_seconds, wait)
+                bucket.queue_depth += 1
+                bucket.max_queue_depth = max(bucket.max_queue_depth, bucket.queue_depth)
+            return wait
+
+    def _done_waiting(self, key: Hashable) -> None:
+        with self._lock:
+            # the bucket can have been dropped in the meantime, if a lot of
+            # other bases were used while we waited
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.queue_depth -= 1
+
+    def _retry_jitter(
+        self, key: Hashable, response: _Response, attempt: int
+    ) -> float | None:
+        """
+        Check if a response is a 429 that should be retried. If it is, the
+        bucket is held back until Airtable lets us make requests again and the
+        jitter to wait before getting back in line is returned.
+        """
+        if response.status_code != 429:
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = min(
+                RETRY_BASE_DELAY_SECONDS * 2**attempt, RETRY_MAX_DELAY_SECONDS
+            )
+        with self._lock:
+            bucket = self._bucket(key)
+            bucket.rate_limited += 1
+            bucket.block_until(time.monotonic() + delay)
+            # Airtable doesn't apply a request that was rate limited, so even
+            # writes are safe to retry
+            if attempt >= self.max_retries or delay > self.max_wait_seconds:
+                return None
+            bucket.retries += 1
+        # other server processes share Airtable's limit but not our buckets,
+        # so spread the retries out instead of having them all line up at the
+        # moment the block lifts
+        return random.uniform(0, RETRY_BASE_DELAY_SECONDS)
+
+    def send(self, key: Hashable, request: Callable[[], ResponseT]) -> ResponseT:
+        """Make a blocking request to Airtable once it is our turn"""
+        attempt = 0
+        while True:
+            wait = self._reserve(key)
+            if wait > 0:
+                try:
+                    time.sleep(wait)
+                finally:
+                    self._done_waiting(key)
+            response = request()
+            jitter = self._retry_jitter(key, response, attempt)
+            if jitter is None:
+                return response
+            logger.warning("Rate limited by Airtable on %s, retrying", key)
+            time.sleep(jitter)
+            attempt += 1
+
+    async def send_async(
+        self, key: Hashable, request: Callable[[], Awaitable[ResponseT]]
+    ) -> ResponseT:
+        """The async version of `send`"""
+        attempt = 0
+        while True:
+            wait = self._reserve(key)
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._done_waiting(key)
+            response = await request()
+            jitter = self._retry_jitter(key, response, attempt)
+            if jitter is None:
+                return response
+            logger.warning("Rate limited by Airtable on %s, retrying", key)
+            await asyncio.sleep(jitter)
+            attempt += 1
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Get the counters of every bucket, keyed by base id"""
+        with self._lock:
+            return {str(key): bucket.stats() for key, bucket in self._buckets.items()}
+
+
+airtable_rate_limiter = AirtableRateLimiter(
+    rate=AIRTABLE_RATE_LIMIT_PER_SECOND,
+    burst=AIRTABLE_RATE_LIMIT_BURST,
+    max_queue=AIRTABLE_RATE_LIMIT_MAX_QUEUE,
+    max_wait_seconds=AIRTABLE_RATE_LIMIT_MAX_WAIT_SECONDS,
+    max_retries=AIRTABLE_RATE_LIMIT_MAX_RETRIES,
+    max_buckets=AIRTABLE_RATE_LIMIT_MAX_BUCKETS,
+)
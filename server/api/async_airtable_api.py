@@ -0,0 +1,641 @@
+"""An asyncio client for the Airtable records API.
+
+`AirtableAPI` is built on pyairtable, which uses blocking `requests` calls, so
+calling it from an `async def` endpoint stalls the event loop for every other
+request while we wait on Airtable. `AsyncAirtableAPI` implements the same
+records surface on a single process-wide `httpx.AsyncClient`, so connections
+(and HTTP/2 streams) are reused across requests and the loop never blocks on
+upstream I/O.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator
+from urllib.parse import quote
+
+import httpx
+from fastapi import HTTPException
+
+from server.api.airtable_api import (
+    BatchRecordResult,
+    PartialRecord,
+    Record,
+    RecordUpdate,
+    RecordsPage,
+    SearchOptions,
+    build_modified_since_formula,
+    build_record_ids_formula,
+    build_search_formula,
+    raise_for_airtable_error,
+)
+from server.api.airtable_cache import airtable_cache
+from server.api.airtable_rate_limit import airtable_rate_limiter
+from server.api.single_flight import AsyncSingleFlight, token_fingerprint
+from server.models.data_store_setting.airtable_config import AirtableConfig
+
+logger = logging.getLogger("airtable_api")
+
+AIRTABLE_API_URL = "https://api.airtable.com/v0"
+
+# how many record ids we look up per request. This matches Airtable's maximum
+# page size, so each chunk is answered in a single page.
+RECORD_IDS_PER_REQUEST = 100
+
+# Airtable creates or updates at most 10 records per request
+RECORDS_PER_BATCH = 10
+
+# concurrent identical calls to Airtable share a single upstream request
+_fetch_record_flight = AsyncSingleFlight("airtable.async.fetch_record")
+_search_records_flight = AsyncSingleFlight("airtable.async.search_records")
+_search_records_page_flight = AsyncSingleFlight("airtable.async.search_records_page")
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the process-wide HTTP client that all async Airtable traffic goes
+    through. It is created on first use.
+    """
+    global _http_client  # pylint: disable=global-statement
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=60.0,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the process-wide HTTP client (e.g. on server shutdown)"""
+    global _http_client  # pylint: disable=global-statement
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _forward_airtable_error(
+    error: httpx.HTTPStatusError, func_name: str, args: tuple, kwargs: dict
+) -> None:
+    logger.error(
+        "Received error from Airtable when calling %s(args=%s, kwargs=%s): %s",
+        func_name,
+        args,
+        kwargs,
+        error,
+    )
+    raise_for_airtable_error(
+        error,
+        error.response.status_code,
+        error.response.reason_phrase,
+        error.response.content,
+        str(error.request.url),
+        error.response.headers,
+    )
+
+
+def async_airtable_errors_wrapped(func):
+    """
+    The async equivalent of `airtable_errors_wrapped`: forwards errors from
+    Airtable as HTTPExceptions with the proper error codes instead of
+    letting them turn into a 500.
+    """
+
+    async def wrapped(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except httpx.HTTPStatusError as e:
+            _forward_airtable_error(e, func.__name__, args, kwargs)
+            raise
+
+    return wrapped
+
+
+class AsyncAirtableAPI:
+    """
+    An async client to query an Airtable base.
+    """
+
+    def __init__(self, airtable_config: AirtableConfig):
+        self.access_token = airtable_config.authSettings.accessToken
+        if not self.access_token:
+            logger.warning(
+                "**No Airtable access token set. Airtable endpoints will not function.**"
+            )
+
+    @staticmethod
+    def _table_url(base_id: str, table_name: str) -> str:
+        return f"{AIRTABLE_API_URL}/{base_id}/{quote(table_name, safe='')}"
+
+    async def _request(
+        self,
+        base_id: str,
+        method: str,
+        url: str,
+        params: dict | None = None,
+        json: dict | None = None,
+    ) -> dict:
+        """Make a request to Airtable, paced by the rate limiter bucket of
+        the base"""
+        response = await airtable_rate_limiter.send_async(
+            base_id,
+            lambda: get_http_client().request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def _iterate(
+        self, base_id: str, table_name: str, params: dict
+    ) -> AsyncIterator[list[Record]]:
+        """Iterate over the pages of a list records request"""
+        table_url = self._table_url(base_id, table_name)
+        page_params = dict(params)
+        while True:
+            data = await self._request(base_id, "GET", table_url, params=page_params)
+            yield data.get("records", [])
+            offset = data.get("offset")
+            if not offset:
+                break
+            page_params["offset"] = offset
+
+    async def _all(
+        self,
+        base_id: str,
+        table_name: str,
+        formula: str | None = None,
+        options: SearchOptions | None = None,
+    ) -> list[Record]:
+        params = options.to_params() if options else {}
+        if formula:
+            params["filterByFormula"] = formula
+        records = []
+        async for page in self._iterate(base_id, table_name, params):
+            records.extend(page)
+        return records
+
+    @async_airtable_errors_wrapped
+    async def fetch_record(self, base_id: str, table_name: str, id: str) -> Record:
+        """
+        Fetch a record with a particular id from a table on Airtable.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - id: The id of the record to be returned
+
+        Returns: An Airtable record
+        """
+        cached_record = airtable_cache.get_record(self.access_token, base_id, id)
+        if cached_record is not None:
+            return cached_record
+
+        async def fetch() -> Record:
+            logger.debug("Fetching record %s in %s", id, table_name)
+            record = await self._request(
+                base_id, "GET", f"{self._table_url(base_id, table_name)}/{id}"
+            )
+            airtable_cache.set_record(self.access_token, base_id, record)
+            return record
+
+        return await _fetch_record_flight.do(
+            (token_fingerprint(self.access_token), base_id, id), fetch
+        )
+
+    @async_airtable_errors_wrapped
+    async def fetch_records_by_ids(
+        self, base_id: str, table_name: str, ids: list[str]
+    ) -> dict[str, Record | None]:
+        """
+        Fetch several records by id from a table on Airtable. Records that are
+        not cached are looked up with one request per RECORD_IDS_PER_REQUEST
+        ids, instead of one request per record.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - ids: The ids of the records to be returned
+
+        Returns: A map from each id to its record, or None if there is no
+        record with that id in the table
+        """
+        records: dict[str, Record | None] = {}
+        missing_ids = []
+        for record_id in dict.fromkeys(ids):
+            records[record_id] = airtable_cache.get_record(
+                self.access_token, base_id, record_id
+            )
+            if records[record_id] is None:
+                missing_ids.append(record_id)
+
+        logger.debug(
+            "Fetching %s records in base: %s table: %s",
+            len(missing_ids),
+            base_id,
+            table_name,
+        )
+        chunks = await asyncio.gather(
+            *[
+                self._all(
+                    base_id,
+                    table_name,
+                    formula=build_record_ids_formula(
+                        missing_ids[i : i + RECORD_IDS_PER_REQUEST]
+                    ),
+                )
+                for i in range(0, len(missing_ids), RECORD_IDS_PER_REQUEST)
+            ]
+        )
+        for chunk in chunks:
+            for record in chunk:
+                airtable_cache.set_record(self.access_token, base_id, record)
+                records[record["id"]] = record
+        return records
+
+    @async_airtable_errors_wrapped
+    async def search_records(
+        self,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        options: SearchOptions | None = None,
+    ) -> list[Record]:
+        """
+        Fetch all records from a table on Airtable that partially match a
+        particular query. If query is empty, all the records in the table are
+        returned.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - query: a dictionary from query keys to query terms
+            - expects any quotes in field_names to be properly escaped
+        - options: fields, view, sort and maxRecords to push down to Airtable
+
+        Returns: A list of records matching that query
+        """
+        logger.debug(
+            "Fetching records in base: %s table: %s",
+            base_id,
+            table_name,
+        )
+        if query:
+            logger.debug("With %s", query)
+
+        options = options or SearchOptions()
+        cache_key = airtable_cache.search_key(
+            self.access_token, base_id, table_name, query, options.cache_key()
+        )
+        cached_results = airtable_cache.get_search(cache_key)
+        if cached_results is not None:
+            return cached_results
+
+        async def search() -> list[Record]:
+            results = await self._all(
+                base_id,
+                table_name,
+                formula=build_search_formula(query),
+                options=options,
+            )
+            airtable_cache.set_search(cache_key, results)
+            return results
+
+        # the cache key starts with the access token's fingerprint, so searches
+        # made with different credentials are never coalesced
+        return await _search_records_flight.do(cache_key, search)
+
+    @async_airtable_errors_wrapped
+    async def search_records_page(
+        self,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        page_size: int | None = None,
+        offset: str | None = None,
+        options: SearchOptions | None = None,
+    ) -> RecordsPage:
+        """
+        Fetch a single page of the records that `search_records` would return.
+        This maps directly onto Airtable's own paging.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - query: a dictionary from query keys to query terms
+        - page_size: the number of records per page (Airtable allows up to 100)
+        - offset: the cursor returned with the previous page, if any
+        - options: fields, view, sort and maxRecords to push down to Airtable
+
+        Returns: A page of records and the cursor to the next page
+        """
+        options = options or SearchOptions()
+        params: dict[str, Any] = {
+            **options.to_params(),
+            "filterByFormula": build_search_formula(query),
+        }
+        if page_size:
+            params["pageSize"] = page_size
+        if offset:
+            params["offset"] = offset
+
+        async def fetch() -> RecordsPage:
+            data = await self._request(
+                base_id, "GET", self._table_url(base_id, table_name), params=params
+            )
+            return {"records": data.get("records", []), "offset": data.get("offset")}
+
+        # like the search key, the page key starts with the access token's
+        # fingerprint
+        return await _search_records_page_flight.do(
+            (
+                airtable_cache.search_key(
+                    self.access_token, base_id, table_name, query, options.cache_key()
+                ),
+                page_size,
+                offset,
+            ),
+            fetch,
+        )
+
+    async def iterate_search_records(
+        self,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        page_size: int | None = None,
+        options: SearchOptions | None = None,
+    ) -> AsyncIterator[list[Record]]:
+        """
+        Iterate over the pages of records that `search_records` would return,
+        yielding each page as soon as Airtable sends it.
+        """
+        params: dict[str, Any] = {
+            **(options.to_params() if options else {}),
+            "filterByFormula": build_search_formula(query),
+        }
+        if page_size:
+            params["pageSize"] = page_size
+        try:
+            async for page in self._iterate(base_id, table_name, params):
+                yield page
+        except httpx.HTTPStatusError as e:
+            _forward_airtable_error(
+                e, "iterate_search_records", (base_id, table_name, query), {}
+            )
+            raise
+
+    @async_airtable_errors_wrapped
+    async def fetch_records_modified_since(
+        self, base_id: str, table_name: str, since: datetime | None = None
+    ) -> list[Record]:
+        """
+        Fetch all records from a table on Airtable that were created or
+        modified after a given time. If `since` is None, all the records in
+        the table are returned.
+
+        Arguments:
+        - table_name: The name of the table to be queried
+        - since: a naive UTC datetime
+
+        Returns: A list of records
+        """
+        logger.debug(
+            "Fetching records in base: %s table: %s modified since %s",
+            base_id,
+            table_name,
+            since,
+        )
+        return await self._all(
+            base_id, table_name, formula=build_modified_since_formula(since)
+        )
+
+    @async_airtable_errors_wrapped
+    async def create_record(
+        self, base_id: str, table_name: str, record: Record
+    ) -> Record:
+        """
+        Create a record in an airtable table
+
+        Arguments:
+        - table_name: The name of the table to insert the record into
+        - record: The record to insert into the table
+
+        Returns: The new record
+        """
+        logger.debug(
+            "Creating new record in base: %s table: %s: %s",
+            base_id,
+            table_name,
+            record,
+        )
+        new_record = await self._request(
+            base_id,
+            "POST",
+            self._table_url(base_id, table_name),
+            json={"fields": record, "typecast": True},
+        )
+        airtable_cache.record_written(self.access_token, base_id, new_record)
+        return new_record
+
+    @async_airtable_errors_wrapped
+    async def update_record(
+        self, base_id: str, table_name: str, id: str, update: PartialRecord
+    ) -> Record:
+        """
+        Update a record with a specific id in an airtable table
+
+        Arguments:
+        - table_name: The name of the table to update the record in
+        - id: The id of the record to update
+        - update: The fields in the record to update. All other fields will remain unmodified
+
+        Returns:
+        - The updated response
+        """
+        logger.debug(
+            "Updating record %s in base: %s table: %s: %s",
+            id,
+            base_id,
+            table_name,
+            update,
+        )
+        updated_record = await self._request(
+            base_id,
+            "PATCH",
+            f"{self._table_url(base_id, table_name)}/{id}",
+            json={"fields": update, "typecast": True},
+        )
+        airtable_cache.record_written(self.access_token, base_id, updated_record)
+        return updated_record
+
+    async def batch_create_records(
+        self, base_id: str, table_name: str, records: list[Record]
+    ) -> list[BatchRecordResult]:
+        """
+        Create several records in an airtable table, RECORDS_PER_BATCH records
+        per request.
+
+        Arguments:
+        - table_name: The name of the table to insert the records into
+        - records: The records to insert into the table
+
+        Returns: The result for each record, in the same order as `records`.
+        Airtable applies each batch as a whole, so if a batch fails then all
+        of its records fail with the same error.
+        """
+        logger.debug(
+            "Creating %s records in base: %s table: %s",
+            len(records),
+            base_id,
+            table_name,
+        )
+        return await self._batch_write(
+            base_id, table_name, "POST", [{"fields": record} for record in records]
+        )
+
+    async def batch_update_records(
+        self, base_id: str, table_name: str, updates: list[RecordUpdate]
+    ) -> list[BatchRecordResult]:
+        """
+        Update several records in an airtable table, RECORDS_PER_BATCH records
+        per request.
+
+        Arguments:
+        - table_name: The name of the table to update the records in
+        - updates: The id of each record to update along with the fields to
+          update. All other fields will remain unmodified
+
+        Returns: The result for each update, in the same order as `updates`
+        """
+        logger.debug(
+            "Updating %s records in base: %s table: %s",
+            len(updates),
+            base_id,
+            table_name,
+        )
+        return await self._batch_write(
+            base_id,
+            table_name,
+            "PATCH",
+            [{"id": update.id, "fields": update.fields} for update in updates],
+        )
+
+    async def batch_upsert_records(
+        self,
+        base_id: str,
+        table_name: str,
+        records: list[PartialRecord],
+        fields_to_merge_on: list[str],
+    ) -> list[BatchRecordResult]:
+        """
+        Create or update several records in an airtable table, RECORDS_PER_BATCH
+        records per request. A record is updated if there is already a record
+        with the same values in `fields_to_merge_on`, and created otherwise, so
+        a keyed write doesn't need to look up the record id first.
+
+        Arguments:
+        - table_name: The name of the table to upsert the records into
+        - records: The fields of each record to upsert
+        - fields_to_merge_on: The fields (1 to 3) that identify a record
+
+        Returns: The result for each record, in the same order as `records`
+        """
+        logger.debug(
+            "Upserting %s records in base: %s table: %s",
+            len(records),
+            base_id,
+            table_name,
+        )
+        merge_keys = [
+            tuple(str(record.get(field)) for field in fields_to_merge_on)
+            for record in records
+        ]
+        return await self._batch_write(
+            base_id,
+            table_name,
+            "PATCH",
+            [{"fields": record} for record in records],
+            options={"performUpsert": {"fieldsToMergeOn": fields_to_merge_on}},
+            # if two batches upsert the same key at the same time then both
+            # can end up creating a record, so only send them concurrently
+            # when every key is different
+            concurrent=len(set(merge_keys)) == len(merge_keys),
+        )
+
+    async def _batch_write(
+        self,
+        base_id: str,
+        table_name: str,
+        method: str,
+        records: list[dict],
+        options: dict | None = None,
+        concurrent: bool = True,
+    ) -> list[BatchRecordResult]:
+        batches = [
+            records[i : i + RECORDS_PER_BATCH]
+            for i in range(0, len(records), RECORDS_PER_BATCH)
+        ]
+        if concurrent:
+            batch_results = await asyncio.gather(
+                *[
+                    self._write_batch(base_id, table_name, method, batch, options)
+                    for batch in batches
+                ]
+            )
+        else:
+            batch_results = [
+                await self._write_batch(base_id, table_name, method, batch, options)
+                for batch in batches
+            ]
+        return [result for results in batch_results for result in results]
+
+    async def _write_batch(
+        self,
+        base_id: str,
+        table_name: str,
+        method: str,
+        batch: list[dict],
+        options: dict | None = None,
+    ) -> list[BatchRecordResult]:
+        try:
+            try:
+                data = await self._request(
+                    base_id,
+                    method,
+                    self._table_url(base_id, table_name),
+                    json={"records": batch, "typecast": True, **(options or {})},
+                )
+            except httpx.HTTPStatusError as e:
+                _forward_airtable_error(e, "_write_batch", (base_id, table_name), {})
+                raise HTTPException(
+                    status_code=e.response.status_code,
+                    detail=e.response.reason_phrase,
+                ) from e
+        except HTTPException as e:
+            return [
+                BatchRecordResult(error=e.detail, statusCode=e.status_code)
+                for _ in batch
+            ]
+        except httpx.TransportError as e:
+            # e.g. a timeout. The other batches may have been written, so
+            # this one fails on its own instead of failing the whole request.
+            # A batch that timed out may still have been written by Airtable.
+            logger.error(
+                "Failed to send a batch to Airtable (base: %s table: %s): %r",
+                base_id,
+                table_name,
+                e,
+            )
+            status_code = 504 if isinstance(e, httpx.TimeoutException) else 502
+            return [
+                BatchRecordResult(error=repr(e), statusCode=status_code) for _ in batch
+            ]
+
+        for record in data["records"]:
+            airtable_cache.record_written(self.access_token, base_id, record)
+        return [BatchRecordResult(record=record) for record in data["records"]]
@@ -1,15 +1,24 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Any
+from urllib.parse import quote
 
 import gspread
-import pandas as pd
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from gspread.utils import ValueRenderOption
+from gspread.exceptions import APIError
+from gspread.urls import (DRIVE_FILES_API_V3_URL, SPREADSHEET_VALUES_APPEND_URL,
+                          SPREADSHEET_VALUES_URL)
+from gspread.utils import (ValueInputOption, ValueRenderOption,
+                           a1_to_rowcol, absolute_range_name)
 
+from server.api.single_flight import SingleFlight, token_fingerprint
 from server.env import get_env
 from server.models.data_store_setting.google_sheets_config import (
-    GoogleSheetsConfig, GoogleSheetsSpreadsheet, GoogleSheetsWorksheet)
+    GoogleSheetsAuthConfig, GoogleSheetsConfig, GoogleSheetsSpreadsheet,
+    GoogleSheetsWorksheet)
 
 logger = logging.getLogger("google_sheets_api")
 logger.setLevel(logging.INFO)
@@ -27,6 +36,133 @@ CREDENTIALS = {
 
 SCOPES = [get_env("REACT_APP_GOOGLE_SHEETS_SCOPE") or ""]
 
+# how many spreadsheets are fetched at the same time when refreshing the
+# schema. Google's quota is per minute, so keep this small.
+GOOGLE_SHEETS_SCHEMA_FETCH_WORKERS = int(
+    get_env("GOOGLE_SHEETS_SCHEMA_FETCH_WORKERS") or 4
+)
+
+# how many authorized gspread clients are kept around to be reused, and how
+# long an unused one is kept
+GOOGLE_SHEETS_CLIENT_POOL_SIZE = int(get_env("GOOGLE_SHEETS_CLIENT_POOL_SIZE") or 64)
+GOOGLE_SHEETS_CLIENT_IDLE_SECONDS = float(
+    get_env("GOOGLE_SHEETS_CLIENT_IDLE_SECONDS") or 600
+)
+
+# concurrent identical calls to Google Sheets share a single upstream request
+_fetch_spreadsheet_schema_flight = SingleFlight(
+    "google_sheets.fetch_spreadsheet_schema"
+)
+
+
+def _authorize(oauth: GoogleSheetsAuthConfig) -> gspread.Client:
+    """Build a gspread client, with its own HTTP session, for a data store's
+    OAuth tokens"""
+    api, _ = gspread.oauth_from_dict(
+        credentials={"web": CREDENTIALS},
+        authorized_user_info={
+            "token": oauth.accessToken,
+            "refresh_token": oauth.refreshToken,
+            "auth_uri": CREDENTIALS["auth_uri"],
+            "token_uri": CREDENTIALS["token_uri"],
+            "client_id": CREDENTIALS["client_id"],
+            "client_secret": CREDENTIALS["client_secret"],
+            "expiry": datetime.fromtimestamp(
+                oauth.accessTokenExpires / 1000
+            ).isoformat()
+            if oauth.accessTokenExpires
+            else None,
+        },
+        scopes=SCOPES,
+    )
+    return api
+
+
+class _PooledClient:
+    def __init__(self, client: gspread.Client, access_token_fingerprint: str):
+        self.client = client
+        self.access_token_fingerprint = access_token_fingerprint
+        self.last_used = time.monotonic()
+
+
+class GoogleSheetsClientPool:
+    """
+    A bounded pool of authorized gspread clients, so that requests made with
+    the same credentials reuse the same OAuth credentials and keep-alive
+    HTTP session.
+
+    Clients are keyed by the fingerprint of the data store's refresh token,
+    which stays the same for as long as the data store is connected. When the
+    access token is rotated, the old client is replaced. Clients that weren't
+    used for `idle_seconds`, or that are the least recently used when the
+    pool is full, are dropped.
+    """
+
+    def __init__(self, max_size: int, idle_seconds: float):
+        self.max_size = max(max_size, 1)
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._clients: OrderedDict[str, _PooledClient] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+        self.evictions = 0
+
+    def get(self, oauth: GoogleSheetsAuthConfig) -> gspread.Client:
+        key = token_fingerprint(oauth.refreshToken or oauth.accessToken)
+        access_token_fingerprint = token_fingerprint(oauth.accessToken)
+        with self._lock:
+            self._evict_idle()
+            pooled = self._clients.get(key)
+            if pooled is not None:
+                if pooled.access_token_fingerprint == access_token_fingerprint:
+                    pooled.last_used = time.monotonic()
+                    self._clients.move_to_end(key)
+                    self.hits += 1
+                    return pooled.client
+                # the tokens were refreshed, so the client's are out of date
+                del self._clients[key]
+                self.rotations += 1
+            self.misses += 1
+
+        # dropped clients may still be in use by other requests, so their
+        # sessions are left to be closed when they're garbage collected
+        client = _authorize(oauth)
+        with self._lock:
+            self._clients[key] = _PooledClient(client, access_token_fingerprint)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        return client
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        for key in [
+            key
+            for key, pooled in self._clients.items()
+            if now - pooled.last_used >= self.idle_seconds
+        ]:
+            del self._clients[key]
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "rotations": self.rotations,
+                "evictions": self.evictions,
+                "size": len(self._clients),
+                "maxSize": self.max_size,
+            }
+
+
+google_sheets_client_pool = GoogleSheetsClientPool(
+    max_size=GOOGLE_SHEETS_CLIENT_POOL_SIZE,
+    idle_seconds=GOOGLE_SHEETS_CLIENT_IDLE_SECONDS,
+)
+
 
 class GoogleSheetsAPI:
     """
@@ -36,55 +172,208 @@ class GoogleSheetsAPI:
     def __init__(self, gsheets_config: GoogleSheetsConfig):
         if gsheets_config.authSettings.accessToken:
             oauth = gsheets_config.authSettings
-            api, _ = gspread.oauth_from_dict(
-                credentials={"web": CREDENTIALS},
-                authorized_user_info={
-                    "token": oauth.accessToken,
-                    "refresh_token": oauth.refreshToken,
-                    "auth_uri": CREDENTIALS["auth_uri"],
-                    "token_uri": CREDENTIALS["token_uri"],
-                    "client_id": CREDENTIALS["client_id"],
-                    "client_secret": CREDENTIALS["client_secret"],
-                    "expiry": datetime.fromtimestamp(
-                        oauth.accessTokenExpires / 1000
-                    ).isoformat()
-                    if oauth.accessTokenExpires
-                    else None,
-                },
-                scopes=SCOPES,
-            )
-            self.api = api
+            self.api = google_sheets_client_pool.get(oauth)
+            self.access_token = oauth.accessToken
         else:
             logger.warning(
                 "**No Google Sheets access token set. Google Sheets endpoints will not function.**"
             )
 
-    def fetch_schema(self, spreadsheet_ids: list[str]) -> list[GoogleSheetsSpreadsheet]:
-        spreadsheet_models = []
+    def fetch_schema(
+        self,
+        spreadsheet_ids: list[str],
+        old_spreadsheets: list[GoogleSheetsSpreadsheet] | None = None,
+    ) -> list[GoogleSheetsSpreadsheet]:
+        """
+        Fetch the schemas of the given spreadsheets, a few at a time.
+
+        Arguments:
+        - old_spreadsheets: The schemas we already have. The schema of a
+          spreadsheet whose revision hasn't changed is reused as it is
+          instead of being fetched again.
+        """
+        old_by_id = {
+            spreadsheet.id: spreadsheet for spreadsheet in old_spreadsheets or []
+        }
+        with ThreadPoolExecutor(
+            max_workers=max(
+                min(GOOGLE_SHEETS_SCHEMA_FETCH_WORKERS, len(spreadsheet_ids)), 1
+            )
+        ) as executor:
+            return list(
+                executor.map(
+                    lambda spreadsheet_id: self._fetch_spreadsheet_schema(
+                        spreadsheet_id, old_by_id.get(spreadsheet_id)
+                    ),
+                    spreadsheet_ids,
+                )
+            )
+
+    def _fetch_spreadsheet_schema(
+        self,
+        spreadsheet_id: str,
+        old_spreadsheet: GoogleSheetsSpreadsheet | None = None,
+    ) -> GoogleSheetsSpreadsheet:
+        """
+        Fetch the schema of a single spreadsheet (i.e. the columns of each of
+        its worksheets). The header rows of all worksheets are fetched with a
+        single batchGet request, unless the spreadsheet's revision shows that
+        `old_spreadsheet` is still up to date.
+        """
+        def fetch() -> GoogleSheetsSpreadsheet:
+            # get the revision first, so that changes made while we fetch the
+            # schema make it look out of date next time
+            revision = self.fetch_revision(spreadsheet_id)
+            if (
+                revision is not None
+                and old_spreadsheet is not None
+                and old_spreadsheet.revision == revision
+            ):
+                return old_spreadsheet
 
-        for spreadsheet_id in spreadsheet_ids:
             spreadsheet = self.api.open_by_key(spreadsheet_id)
+            worksheets = spreadsheet.worksheets()
+            if not worksheets:
+                value_ranges = []
+            else:
+                # get the first row of every worksheet to extract the headers
+                # TODO: this assumes that the sheets are formatted
+                # appropriately, like a CSV. We need to add validation for
+                # this.
+                value_ranges = spreadsheet.values_batch_get(
+                    [
+                        absolute_range_name(worksheet.title, "1:1")
+                        for worksheet in worksheets
+                    ],
+                    params={
+                        "valueRenderOption": ValueRenderOption.unformatted,
+                        "majorDimension": "ROWS",
+                    },
+                )["valueRanges"]
 
             worksheet_models = []
-            for worksheet in spreadsheet.worksheets():
-                # get the first row to extract the header
-                # TODO: this assumes that the sheet is formatted appropriately, like
-                # a CSV. We need to add validation for this.
-                header_row = [
-                    str(val)
-                    for val in worksheet.get_values(
-                        "1:1", value_render_option=ValueRenderOption.unformatted
-                    )[0]
-                ]
+            for worksheet, value_range in zip(worksheets, value_ranges):
+                # an empty header row has no `values` at all
+                rows = value_range.get("values") or [[]]
                 worksheet_models.append(
-                    GoogleSheetsWorksheet(title=worksheet.title, columns=header_row)
+                    GoogleSheetsWorksheet(
+                        title=worksheet.title, columns=[str(val) for val in rows[0]]
+                    )
                 )
 
-            spreadsheet_models.append(
-                GoogleSheetsSpreadsheet(
-                    title=spreadsheet.title,
-                    id=spreadsheet.id,
-                    worksheets=worksheet_models,
-                )
+            return GoogleSheetsSpreadsheet(
+                title=spreadsheet.title,
+                id=spreadsheet.id,
+                worksheets=worksheet_models,
+                revision=revision,
+            )
+
+        return _fetch_spreadsheet_schema_flight.do(
+            (
+                token_fingerprint(self.access_token),
+                spreadsheet_id,
+                old_spreadsheet.revision if old_spreadsheet else None,
+            ),
+            fetch,
+        )
+
+    def fetch_worksheet_values(
+        self, spreadsheet_id: str, worksheet_title: str
+    ) -> list[list[str]]:
+        """
+        Fetch all the values of a worksheet, as they are displayed in the
+        sheet, with a single request. The first row is the header.
+        """
+        return self.fetch_range_values(
+            spreadsheet_id, absolute_range_name(worksheet_title)
+        )
+
+    def fetch_range_values(
+        self, spreadsheet_id: str, range_name: str
+    ) -> list[list[str]]:
+        """
+        Fetch the values of a range (in A1 notation, including the worksheet
+        title) as they are displayed in the sheet. Trailing empty rows and
+        cells are left out.
+        """
+        url = SPREADSHEET_VALUES_URL % (spreadsheet_id, quote(range_name))
+        value_range = self.api.request(
+            "get",
+            url,
+            params={
+                "valueRenderOption": ValueRenderOption.formatted,
+                "majorDimension": "ROWS",
+            },
+        ).json()
+        return value_range.get("values", [])
+
+    def update_range_values(
+        self, spreadsheet_id: str, range_name: str, rows: list[list[Any]]
+    ) -> None:
+        """
+        Overwrite the values of a range (in A1 notation, including the
+        worksheet title) with a single values.update request. Like appends,
+        values are stored RAW. Cells whose value is None are left as they are.
+        """
+        url = SPREADSHEET_VALUES_URL % (spreadsheet_id, quote(range_name))
+        self.api.request(
+            "put",
+            url,
+            params={"valueInputOption": ValueInputOption.raw},
+            json={"majorDimension": "ROWS", "values": rows},
+        )
+
+    def fetch_revision(self, spreadsheet_id: str) -> str | None:
+        """
+        Fetch the current revision of a spreadsheet, with a single lightweight
+        request to Google Drive. The revision changes whenever the
+        spreadsheet does, so it can tell us whether anything we have cached
+        from the spreadsheet is still up to date without reading it again.
+
+        Returns: The revision, or None if Drive didn't give it to us (e.g. the
+        token has no access to Drive metadata). Callers treat None as
+        "changed", and fall back to reading the spreadsheet.
+        """
+        try:
+            response = self.api.request(
+                "get",
+                f"{DRIVE_FILES_API_V3_URL}/{spreadsheet_id}",
+                params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+            ).json()
+            # `version` goes up with every change to the file, while
+            # `modifiedTime` only has millisecond precision
+            return response.get("version") or response["modifiedTime"]
+        except (APIError, KeyError) as e:
+            logger.warning(
+                "Could not fetch the revision of spreadsheet %s: %s", spreadsheet_id, e
             )
-        return spreadsheet_models
+            return None
+
+    def append_rows(
+        self, spreadsheet_id: str, worksheet_title: str, rows: list[list[Any]]
+    ) -> int:
+        """
+        Append rows after the last row of a worksheet with a single
+        values.append request. The values are stored as they are given
+        (RAW), so that submitted text is never interpreted as a formula.
+
+        Returns: The row number of the first appended row
+        """
+        url = SPREADSHEET_VALUES_APPEND_URL % (
+            spreadsheet_id,
+            quote(absolute_range_name(worksheet_title)),
+        )
+        response = self.api.request(
+            "post",
+            url,
+            params={
+                "valueInputOption": ValueInputOption.raw,
+                "insertDataOption": "INSERT_ROWS",
+            },
+            json={"majorDimension": "ROWS", "values": rows},
+        ).json()
+        # e.g. "'Sheet 1'!A5:C7"
+        updated_range = response["updates"]["updatedRange"]
+        first_cell = updated_range.rsplit("!", 1)[-1].split(":")[0]
+        first_row, _ = a1_to_rowcol(first_cell)
+        return first_row
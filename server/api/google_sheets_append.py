@@ -0,0 +1,146 @@
+"""Batching of row appends to Google Sheets worksheets.
+
+Google Sheets has a low per-minute write quota, so appending one row per
+submission falls over as soon as a popular interview goes live. Instead, the
+rows appended to a worksheet are buffered for a short window and written with
+a single values.append request, and every caller that is waiting on the batch
+gets the result for its own rows.
+
+Like the other Google Sheets and Airtable helpers, the batcher is process-wide
+because the API clients are created per request.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from gspread.exceptions import APIError
+
+from server.api.google_sheets_api import GoogleSheetsAPI
+from server.api.google_sheets_models import AppendRowResult
+from server.api.single_flight import token_fingerprint
+from server.env import get_env
+
+LOG = logging.getLogger(__name__)
+
+# how long rows are buffered before they are written
+GOOGLE_SHEETS_APPEND_WINDOW_SECONDS = float(
+    get_env("GOOGLE_SHEETS_APPEND_WINDOW_SECONDS") or 0.25
+)
+# a batch is written right away once it has this many rows
+GOOGLE_SHEETS_APPEND_MAX_ROWS = int(get_env("GOOGLE_SHEETS_APPEND_MAX_ROWS") or 500)
+
+# (access token fingerprint, spreadsheet id, worksheet title). Rows appended
+# with different credentials are never written together.
+AppendKey = tuple[str, str, str]
+
+
+@dataclass
+class _PendingBatch:
+    client: GoogleSheetsAPI
+    rows: list[list[Any]] = field(default_factory=list)
+    # the future of each caller, and the slice of `rows` that are its rows
+    waiters: list[tuple[asyncio.Future, int, int]] = field(default_factory=list)
+
+
+class GoogleSheetsAppendBatcher:
+    """Buffers the rows appended to each worksheet and writes them together"""
+
+    def __init__(self, window_seconds: float, max_rows: int):
+        self.window_seconds = window_seconds
+        self.max_rows = max(max_rows, 1)
+        self._pending: dict[AppendKey, _PendingBatch] = {}
+        # keep a reference to the running flushes so they aren't garbage
+        # collected before they're done
+        self._flushes: set[asyncio.Task] = set()
+        self.requests = 0
+        self.rows = 0
+        self.failed_rows = 0
+
+    async def append(
+        self,
+        client: GoogleSheetsAPI,
+        spreadsheet_id: str,
+        worksheet_title: str,
+        rows: list[list[Any]],
+    ) -> list[AppendRowResult]:
+        """
+        Append rows to a worksheet, along with the rows of any other callers
+        that append to it within the batching window.
+
+        Returns: The result for each row, in the same order as `rows`
+        """
+        if not rows:
+            return []
+
+        loop = asyncio.get_running_loop()
+        key = (token_fingerprint(client.access_token), spreadsheet_id, worksheet_title)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _PendingBatch(client)
+            self._pending[key] = batch
+            loop.call_later(self.window_seconds, self._start_flush, key, batch)
+
+        future = loop.create_future()
+        batch.waiters.append((future, len(batch.rows), len(rows)))
+        batch.rows.extend(rows)
+        if len(batch.rows) >= self.max_rows:
+            self._start_flush(key, batch)
+
+        # shield the future so that a caller that goes away doesn't cancel it
+        # for the flush that sets its result
+        return await asyncio.shield(future)
+
+    def _start_flush(self, key: AppendKey, batch: _PendingBatch) -> None:
+        if self._pending.get(key) is not batch:
+            # the batch was already flushed because it was full
+            return
+        del self._pending[key]
+        task = asyncio.create_task(self._flush(key, batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: AppendKey, batch: _PendingBatch) -> None:
+        _, spreadsheet_id, worksheet_title = key
+        self.requests += 1
+        self.rows += len(batch.rows)
+        try:
+            first_row = await run_in_threadpool(
+                batch.client.append_rows, spreadsheet_id, worksheet_title, batch.rows
+            )
+            results = [
+                AppendRowResult(rowNumber=first_row + position)
+                for position in range(len(batch.rows))
+            ]
+        except APIError as e:
+            self.failed_rows += len(batch.rows)
+            results = [
+                AppendRowResult(error=str(e), statusCode=e.response.status_code)
+                for _ in batch.rows
+            ]
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. a timeout. Every caller in the batch still gets an answer.
+            LOG.exception("Failed to append rows to Google Sheets")
+            self.failed_rows += len(batch.rows)
+            results = [
+                AppendRowResult(error=repr(e), statusCode=500) for _ in batch.rows
+            ]
+
+        for future, start, count in batch.waiters:
+            if not future.done():
+                future.set_result(results[start : start + count])
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "failedRows": self.failed_rows,
+            "pendingWorksheets": len(self._pending),
+        }
+
+
+google_sheets_append_batcher = GoogleSheetsAppendBatcher(
+    window_seconds=GOOGLE_SHEETS_APPEND_WINDOW_SECONDS,
+    max_rows=GOOGLE_SHEETS_APPEND_MAX_ROWS,
+)
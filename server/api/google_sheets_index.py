@@ -0,0 +1,275 @@
+"""An in-process, column-oriented index of Google Sheets worksheets.
+
+Google Sheets has no search API, so looking up a row means downloading the
+whole worksheet. Instead of doing that on every keystroke, a worksheet is
+loaded once into a pandas DataFrame and searched locally until it expires.
+The lowercased values of a searched column, and a token index for prefix
+searches, are built the first time the column is searched.
+
+The index is process-wide (like the Airtable cache) and bounded by a memory
+budget: when it is exceeded, the least recently used worksheets are dropped.
+When a worksheet expires, it is only downloaded again if the spreadsheet's
+Drive revision changed. Worksheets are keyed by the credentials they were
+downloaded with, so they are only searched on behalf of callers that can
+read them.
+"""
+import bisect
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from server.api.google_sheets_models import MatchMode
+from server.api.single_flight import SingleFlight
+from server.env import get_env
+
+# how long a worksheet is searched locally before it is downloaded again
+GOOGLE_SHEETS_INDEX_TTL_SECONDS = float(
+    get_env("GOOGLE_SHEETS_INDEX_TTL_SECONDS") or 300
+)
+# how much memory the indexed worksheets can take up, in total
+GOOGLE_SHEETS_INDEX_MAX_MB = float(get_env("GOOGLE_SHEETS_INDEX_MAX_MB") or 256)
+
+Record = dict[str, str]
+# (access token fingerprint, spreadsheet id, worksheet title)
+WorksheetKey = tuple[str, str, str]
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# concurrent loads of the same worksheet share a single download
+_load_worksheet_flight = SingleFlight("google_sheets.load_worksheet")
+
+
+class _TokenIndex:
+    """The sorted distinct words of a column, and the rows each word is in"""
+
+    def __init__(self, lowered: pd.Series):
+        rows_by_token: dict[str, list[int]] = {}
+        for position, value in enumerate(lowered):
+            for token in set(_TOKEN_PATTERN.findall(value)):
+                rows_by_token.setdefault(token, []).append(position)
+        self.tokens = sorted(rows_by_token)
+        self.rows = [
+            np.array(rows_by_token[token], dtype=np.int32) for token in self.tokens
+        ]
+
+    def prefix_rows(self, prefix: str) -> np.ndarray:
+        """Get the rows that have a word starting with `prefix`"""
+        start = bisect.bisect_left(self.tokens, prefix)
+        # every string that starts with `prefix` sorts before this one
+        end = bisect.bisect_left(self.tokens, prefix + "\U0010ffff", lo=start)
+        if start == end:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(self.rows[start:end]))
+
+    def memory_usage(self) -> int:
+        return sum(sys.getsizeof(token) for token in self.tokens) + sum(
+            rows.nbytes for rows in self.rows
+        )
+
+
+class WorksheetIndex:
+    """The values of a worksheet, one column per header, as strings"""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.loaded_at = time.monotonic()
+        # the Drive revision of the spreadsheet the values were loaded from
+        self.revision: str | None = None
+        self._lock = threading.Lock()
+        self._lowered: dict[str, pd.Series] = {}
+        self._tokens: dict[str, _TokenIndex] = {}
+        self.size = int(frame.memory_usage(deep=True).sum())
+
+    @classmethod
+    def from_values(cls, values: list[list[str]]) -> "WorksheetIndex":
+        """
+        Build the index from the values of a worksheet. The first row is
+        the header. Columns without a header are dropped, and only the first
+        of several columns with the same header is kept.
+        """
+        header = [str(val) for val in values[0]] if values else []
+        width = len(header)
+        rows = [
+            [str(val) for val in row[:width]] + [""] * (width - len(row))
+            for row in values[1:]
+        ]
+        frame = pd.DataFrame(rows, columns=header, dtype=object)
+        frame = frame.loc[:, (frame.columns != "") & ~frame.columns.duplicated()]
+        return cls(frame.reset_index(drop=True))
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.frame.columns)
+
+    def _get_lowered(self, column: str) -> pd.Series:
+        with self._lock:
+            if column not in self._lowered:
+                self._lowered[column] = self.frame[column].str.lower()
+                self.size += int(self._lowered[column].memory_usage(deep=True))
+            return self._lowered[column]
+
+    def _get_tokens(self, column: str) -> _TokenIndex:
+        lowered = self._get_lowered(column)
+        with self._lock:
+            if column not in self._tokens:
+                self._tokens[column] = _TokenIndex(lowered)
+                self.size += self._tokens[column].memory_usage()
+            return self._tokens[column]
+
+    def _matches(self, column: str, query_val: str, match: MatchMode) -> np.ndarray:
+        """Get a boolean mask of the rows where `column` matches the query"""
+        lowered = self._get_lowered(column)
+        query_val = query_val.lower()
+        if match == MatchMode.SUBSTRING:
+            return lowered.str.contains(query_val, regex=False).to_numpy(dtype=bool)
+
+        if _TOKEN_PATTERN.fullmatch(query_val):
+            # a single word can be answered from the token index
+            mask = np.zeros(len(lowered), dtype=bool)
+            mask[self._get_tokens(column).prefix_rows(query_val)] = True
+        else:
+            # the query spans several words, so check where words start
+            mask = (
+                lowered.str.startswith(query_val)
+                | lowered.str.contains(r"\W" + re.escape(query_val), regex=True)
+            ).to_numpy(dtype=bool)
+        return mask
+
+    def search(
+        self,
+        query: dict[str, str],
+        match: MatchMode = MatchMode.SUBSTRING,
+        max_records: int | None = None,
+    ) -> list[Record]:
+        """
+        Search the worksheet. Like Airtable searches, the search is
+        case-insensitive and the rows that match any of the query terms are
+        returned, in the order they are in the worksheet. An empty query
+        returns every row.
+        """
+        if query:
+            mask = np.zeros(len(self.frame), dtype=bool)
+            for column, query_val in query.items():
+                mask |= self._matches(column, query_val, match)
+            frame = self.frame[mask]
+        else:
+            frame = self.frame
+        if max_records is not None:
+            frame = frame.head(max_records)
+        return frame.to_dict(orient="records")
+
+
+class GoogleSheetsIndex:
+    """
+    A bounded TTL + LRU store of worksheet indexes, keyed by
+    (access token fingerprint, spreadsheet id, worksheet title).
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.enabled = max_bytes > 0 and ttl_seconds > 0
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._worksheets: OrderedDict[WorksheetKey, WorksheetIndex] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # expired worksheets that were kept because they hadn't changed
+        self.revalidations = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        key: WorksheetKey,
+        load: Callable[[], list[list[str]]],
+        fetch_revision: Callable[[], str | None] | None = None,
+    ) -> WorksheetIndex:
+        """
+        Get the index of a worksheet, calling `load` to get the worksheet's
+        values if it isn't indexed yet or its index has expired.
+
+        If `fetch_revision` is given, an expired index is only reloaded if the
+        spreadsheet's revision changed since it was loaded (or the revision
+        can't be fetched). Otherwise it is kept for another TTL.
+        """
+        if not self.enabled:
+            return WorksheetIndex.from_values(load())
+
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+            if (
+                worksheet is not None
+                and time.monotonic() - worksheet.loaded_at < self.ttl_seconds
+            ):
+                self._worksheets.move_to_end(key)
+                self.hits += 1
+                return worksheet
+
+        # get the revision before loading, so that changes made while we load
+        # the worksheet make the index look out of date next time
+        revision = fetch_revision() if fetch_revision is not None else None
+        if worksheet is not None and revision is not None:
+            if worksheet.revision == revision:
+                with self._lock:
+                    worksheet.loaded_at = time.monotonic()
+                    self.revalidations += 1
+                return worksheet
+
+        def build() -> WorksheetIndex:
+            index = WorksheetIndex.from_values(load())
+            index.revision = revision
+            return index
+
+        with self._lock:
+            self.misses += 1
+        worksheet = _load_worksheet_flight.do(key, build)
+        with self._lock:
+            self._worksheets[key] = worksheet
+            self._worksheets.move_to_end(key)
+        self.enforce_budget()
+        return worksheet
+
+    def enforce_budget(self) -> None:
+        """Drop the least recently used worksheets until we're within budget.
+        The column indexes grow as columns are searched, so this is also
+        called after searches."""
+        with self._lock:
+            total = sum(worksheet.size for worksheet in self._worksheets.values())
+            while total > self.max_bytes and self._worksheets:
+                _, worksheet = self._worksheets.popitem(last=False)
+                total -= worksheet.size
+                self.evictions += 1
+
+    def invalidate(self, spreadsheet_id: str, worksheet_title: str) -> None:
+        """Drop a worksheet, whichever credentials it was loaded with"""
+        with self._lock:
+            for key in list(self._worksheets.keys()):
+                if key[1:] == (spreadsheet_id, worksheet_title):
+                    del self._worksheets[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._worksheets.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "worksheets": len(self._worksheets),
+                "bytes": sum(worksheet.size for worksheet in self._worksheets.values()),
+                "maxBytes": self.max_bytes,
+            }
+
+
+google_sheets_index = GoogleSheetsIndex(
+    max_bytes=int(GOOGLE_SHEETS_INDEX_MAX_MB * 1024 * 1024),
+    ttl_seconds=GOOGLE_SHEETS_INDEX_TTL_SECONDS,
+)
@@ -0,0 +1,26 @@
+"""Models used by the Google Sheets endpoints. They are kept apart from the
+Google Sheets client so that the endpoints can be declared without importing
+gspread, the Google auth libraries or pandas, which are only loaded once an
+interview actually uses Google Sheets.
+"""
+from enum import Enum
+
+from pydantic import BaseModel
+
+
+class AppendRowResult(BaseModel):
+    """The result of appending a single row to a worksheet. If the append
+    failed, `rowNumber` is None and `error` and `statusCode` say why."""
+
+    rowNumber: int | None = None
+    error: str | None = None
+    statusCode: int = 200
+
+
+class MatchMode(str, Enum):
+    """How a Google Sheets search term is matched against the values"""
+
+    # the value contains the query anywhere
+    SUBSTRING = "substring"
+    # the value, or one of its words, starts with the query
+    PREFIX = "prefix"
@@ -0,0 +1,288 @@
+"""An in-process index from primary key to row number for Google Sheets
+worksheets, so that a row can be edited without reading the whole worksheet.
+
+The index of a worksheet is built the first time one of its rows is edited,
+and is rebuilt when the spreadsheet's Drive revision shows that it was
+modified by someone else. Our own appends and edits are applied to the index
+directly. Rows can still move in between checks (e.g. someone sorts the
+sheet), so before a row is written, its primary key cell is read back to make
+sure it's the right one.
+
+Indexes are keyed by the credentials they were built with, so a caller never
+gets the rows (or the permission errors) of a worksheet read with someone
+else's credentials.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from cachetools import LRUCache
+from fastapi import HTTPException
+from gspread.utils import absolute_range_name, rowcol_to_a1
+
+from server.api.google_sheets_api import GoogleSheetsAPI
+from server.api.single_flight import SingleFlight, token_fingerprint
+from server.env import get_env
+
+# how often we check the Drive revision of a spreadsheet to see if it changed
+GOOGLE_SHEETS_ROW_LOCATOR_CHECK_SECONDS = float(
+    get_env("GOOGLE_SHEETS_ROW_LOCATOR_CHECK_SECONDS") or 10
+)
+# how many (worksheet, primary key column) indexes are kept in memory
+GOOGLE_SHEETS_ROW_LOCATOR_MAX_WORKSHEETS = int(
+    get_env("GOOGLE_SHEETS_ROW_LOCATOR_MAX_WORKSHEETS") or 256
+)
+
+Record = dict[str, Any]
+# (access token fingerprint, spreadsheet id, worksheet title, primary key
+# column)
+LocatorKey = tuple[str, str, str, str]
+
+# concurrent builds of the same index share a single worksheet read
+_build_flight = SingleFlight("google_sheets.build_row_locator")
+
+
+@dataclass
+class _Locator:
+    header: list[str]
+    key_position: int
+    # the row number of each primary key. If a key is in several rows, the
+    # first one wins.
+    rows: dict[str, int]
+    # the spreadsheet's Drive revision when the index was last in sync
+    revision: str | None
+    checked_at: float
+    # whether we wrote to the worksheet since the revision was checked
+    own_writes: bool = False
+
+
+class GoogleSheetsRowLocator:
+    """Finds and edits the rows of worksheets by their primary key"""
+
+    def __init__(self, max_worksheets: int, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._locators: LRUCache = LRUCache(maxsize=max(max_worksheets, 1))
+        self.builds = 0
+        self.hits = 0
+        self.row_shifts = 0
+
+    def _build(self, client: GoogleSheetsAPI, key: LocatorKey) -> _Locator:
+        _, spreadsheet_id, worksheet_title, key_column = key
+
+        def build() -> _Locator:
+            # get the revision first, so that changes made while we read
+            # the worksheet make the index look out of date
+            revision = client.fetch_revision(spreadsheet_id)
+            values = client.fetch_worksheet_values(spreadsheet_id, worksheet_title)
+            header = [str(val) for val in values[0]] if values else []
+            if key_column not in header:
+                raise HTTPException(
+                    status_code=422, detail=f"Unknown column: {key_column}"
+                )
+            key_position = header.index(key_column)
+            rows: dict[str, int] = {}
+            # row numbers start at 1, and the first row is the header
+            for row_number, row in enumerate(values[1:], start=2):
+                if key_position < len(row) and row[key_position] != "":
+                    rows.setdefault(str(row[key_position]), row_number)
+            return _Locator(
+                header=header,
+                key_position=key_position,
+                rows=rows,
+                revision=revision,
+                checked_at=time.monotonic(),
+            )
+
+        locator = _build_flight.do(key, build)
+        with self._lock:
+            self.builds += 1
+            self._locators[key] = locator
+        return locator
+
+    def _get(self, client: GoogleSheetsAPI, key: LocatorKey) -> tuple[_Locator, bool]:
+        """
+        Get the index for a worksheet and primary key column, building it if
+        it doesn't exist or the spreadsheet was modified by someone else.
+
+        Returns: The index, and whether it was just built
+        """
+        with self._lock:
+            locator = self._locators.get(key)
+        if locator is None:
+            return self._build(client, key), True
+
+        if time.monotonic() - locator.checked_at >= self.check_seconds:
+            revision = client.fetch_revision(key[1])
+            with self._lock:
+                locator.checked_at = time.monotonic()
+                if (
+                    revision is not None
+                    and revision != locator.revision
+                    and locator.own_writes
+                ):
+                    # our own writes changed the revision. We can't tell
+                    # if someone else's did too, but the row check before
+                    # every write catches any rows that moved.
+                    locator.revision = revision
+                    locator.own_writes = False
+            # without a revision we can't tell, so assume it changed
+            if revision is None or revision != locator.revision:
+                return self._build(client, key), True
+
+        with self._lock:
+            self.hits += 1
+        return locator, False
+
+    def update_row(
+        self,
+        client: GoogleSheetsAPI,
+        spreadsheet_id: str,
+        worksheet_title: str,
+        key_column: str,
+        key_value: str,
+        fields: Record,
+    ) -> Record:
+        """
+        Update the row whose `key_column` is `key_value` with a single
+        values.update request, which only covers the updated columns.
+
+        Returns: The updated row, keyed by column name
+        """
+        key = (
+            token_fingerprint(client.access_token),
+            spreadsheet_id,
+            worksheet_title,
+            key_column,
+        )
+        for _ in range(2):
+            locator, is_new = self._get(client, key)
+            unknown_columns = [
+                column for column in fields if column not in locator.header
+            ]
+            if unknown_columns:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Unknown columns: {', '.join(unknown_columns)}",
+                )
+
+            row_number = locator.rows.get(key_value)
+            if row_number is None:
+                if is_new:
+                    raise HTTPException(status_code=404, detail="Row not found")
+                # the row may have been added since the index was built
+                self.forget(spreadsheet_id, worksheet_title)
+                continue
+
+            # make sure the row didn't move since the index was built
+            row_values = client.fetch_range_values(
+                spreadsheet_id,
+                absolute_range_name(worksheet_title, f"{row_number}:{row_number}"),
+            )
+            row = [str(val) for val in row_values[0]] if row_values else []
+            if (
+                locator.key_position < len(row)
+                and row[locator.key_position] == key_value
+            ):
+                break
+            with self._lock:
+                self.row_shifts += 1
+            self.forget(spreadsheet_id, worksheet_title)
+        else:
+            raise HTTPException(
+                status_code=409,
+                detail="The worksheet changed while the row was being updated",
+            )
+
+        if fields:
+            positions = {
+                locator.header.index(column): val for column, val in fields.items()
+            }
+            first, last = min(positions), max(positions)
+            # None leaves a cell as it is, so the columns in between the ones
+            # being updated (and any formulas in them) aren't touched
+            values = [
+                None
+                if position not in positions
+                else ("" if positions[position] is None else positions[position])
+                for position in range(first, last + 1)
+            ]
+            client.update_range_values(
+                spreadsheet_id,
+                absolute_range_name(
+                    worksheet_title,
+                    f"{rowcol_to_a1(row_number, first + 1)}:"
+                    f"{rowcol_to_a1(row_number, last + 1)}",
+                ),
+                [values],
+            )
+            self._row_written(spreadsheet_id, worksheet_title, row_number, fields)
+
+        record = dict(
+            zip(locator.header, row + [""] * (len(locator.header) - len(row)))
+        )
+        record.update(fields)
+        return record
+
+    def rows_appended(
+        self, spreadsheet_id: str, worksheet_title: str, rows: list[tuple[int, Record]]
+    ) -> None:
+        """Add rows that we appended to the worksheet's indexes. Each row is
+        given as (row number, record keyed by column name)."""
+        with self._lock:
+            for (_, locator_spreadsheet_id, title, key_column), locator in list(
+                self._locators.items()
+            ):
+                if (locator_spreadsheet_id, title) != (spreadsheet_id, worksheet_title):
+                    continue
+                for row_number, record in rows:
+                    if record.get(key_column) not in (None, ""):
+                        locator.rows.setdefault(str(record[key_column]), row_number)
+                locator.own_writes = True
+
+    def _row_written(
+        self, spreadsheet_id: str, worksheet_title: str, row_number: int, fields: Record
+    ) -> None:
+        """Update the worksheet's indexes after we wrote to one of its rows"""
+        with self._lock:
+            for (_, locator_spreadsheet_id, title, key_column), locator in list(
+                self._locators.items()
+            ):
+                if (locator_spreadsheet_id, title) != (spreadsheet_id, worksheet_title):
+                    continue
+                locator.own_writes = True
+                if key_column not in fields:
+                    continue
+                # the row's primary key changed
+                for key_value in [
+                    key_value
+                    for key_value, number in locator.rows.items()
+                    if number == row_number
+                ]:
+                    del locator.rows[key_value]
+                if fields[key_column] not in (None, ""):
+                    locator.rows.setdefault(str(fields[key_column]), row_number)
+
+    def forget(self, spreadsheet_id: str, worksheet_title: str) -> None:
+        """Drop the indexes of a worksheet, so they're rebuilt when needed"""
+        with self._lock:
+            for key in list(self._locators.keys()):
+                if key[1:3] == (spreadsheet_id, worksheet_title):
+                    del self._locators[key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "hits": self.hits,
+                "rowShifts": self.row_shifts,
+                "worksheets": len(self._locators),
+                "maxWorksheets": int(self._locators.maxsize),
+            }
+
+
+google_sheets_row_locator = GoogleSheetsRowLocator(
+    max_worksheets=GOOGLE_SHEETS_ROW_LOCATOR_MAX_WORKSHEETS,
+    check_seconds=GOOGLE_SHEETS_ROW_LOCATOR_CHECK_SECONDS,
+)
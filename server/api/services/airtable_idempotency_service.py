@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from typing import Any
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from server.api.airtable_config import (
+    AIRTABLE_IDEMPOTENCY_CLAIM_SECONDS,
+    AIRTABLE_IDEMPOTENCY_MAX_KEYS,
+    AIRTABLE_IDEMPOTENCY_TTL_SECONDS,
+)
+from server.api.services.base_service import BaseService
+from server.models.airtable_idempotency_key import (
+    PENDING_STATUS_CODE,
+    AirtableIdempotencyKey,
+)
+
+
+class AirtableIdempotencyService(BaseService):
+    """Stores the results of Airtable writes by their idempotency key."""
+
+    def __init__(self, db: Session):
+        super(AirtableIdempotencyService, self).__init__(db)
+
+    def claim(
+        self, interview_id: str, key: str, request_hash: str
+    ) -> AirtableIdempotencyKey | None:
+        """
+        Claim a key for a write that is about to be made, so that no other
+        server process makes the same write at the same time. The claim is
+        stored before returning, so it is seen by every process.
+
+        Returns: None if the key was claimed, otherwise the stored result of
+        the write that was already made with it. Raises a 409 if that write is
+        still in progress, and a 422 if the key was already used for a
+        different request.
+        """
+        now = datetime.utcnow()
+        # an expired result, or a claim that was left behind by a write that
+        # never finished, can be claimed again
+        self.db.execute(
+            delete(AirtableIdempotencyKey)
+            .where(AirtableIdempotencyKey.interview_id == interview_id)
+            .where(AirtableIdempotencyKey.key == key)
+            .where(AirtableIdempotencyKey.expires_at <= now)  # type: ignore
+        )
+        claimed = self.db.execute(
+            insert(AirtableIdempotencyKey)
+            .values(
+                interview_id=interview_id,
+                key=key,
+                request_hash=request_hash,
+                status_code=PENDING_STATUS_CODE,
+                created_at=now,
+                expires_at=now + timedelta(seconds=AIRTABLE_IDEMPOTENCY_CLAIM_SECONDS),
+            )
+            .on_conflict_do_nothing(index_elements=["interview_id", "key"])
+        ).rowcount
+        self.commit()
+        if claimed:
+            return None
+
+        stored = self.db.get(AirtableIdempotencyKey, (interview_id, key))
+        if stored is not None and stored.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency key was already used for a different request",
+            )
+        # the claim can have just been released, but the write that held it
+        # might still be retried by whoever made it
+        if stored is None or stored.status_code == PENDING_STATUS_CODE:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this idempotency key is still in progress",
+            )
+        return stored
+
+    def release(self, interview_id: str, key: str) -> None:
+        """Drop the claim on a key whose write didn't succeed, so that the
+        write can be retried with the same key."""
+        self.db.execute(
+            delete(AirtableIdempotencyKey)
+            .where(AirtableIdempotencyKey.interview_id == interview_id)
+            .where(AirtableIdempotencyKey.key == key)
+            .where(AirtableIdempotencyKey.status_code == PENDING_STATUS_CODE)
+        )
+        self.commit()
+
+    def save_result(
+        self,
+        interview_id: str,
+        key: str,
+        request_hash: str,
+        status_code: int,
+        response: Any,
+    ) -> None:
+        """
+        Store the result of a write in place of its claim, and drop expired
+        results and the oldest results over AIRTABLE_IDEMPOTENCY_MAX_KEYS.
+        """
+        now = datetime.utcnow()
+        self.db.merge(
+            AirtableIdempotencyKey(
+                interview_id=interview_id,
+                key=key,
+                request_hash=request_hash,
+                status_code=status_code,
+                response=response,
+                created_at=now,
+                expires_at=now + timedelta(seconds=AIRTABLE_IDEMPOTENCY_TTL_SECONDS),
+            )
+        )
+        self.db.execute(
+            delete(AirtableIdempotencyKey).where(
+                AirtableIdempotencyKey.expires_at <= now  # type: ignore
+            )
+        )
+        num_keys = self.db.exec(
+            select(func.count()).select_from(AirtableIdempotencyKey)
+        ).one()
+        if num_keys > AIRTABLE_IDEMPOTENCY_MAX_KEYS:
+            oldest_keys = self.db.exec(
+                select(AirtableIdempotencyKey)
+                .order_by(AirtableIdempotencyKey.created_at)
+                .limit(num_keys - AIRTABLE_IDEMPOTENCY_MAX_KEYS)
+            ).all()
+            for oldest_key in oldest_keys:
+                self.db.delete(oldest_key)
+        self.commit()
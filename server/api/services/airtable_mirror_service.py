@@ -0,0 +1,545 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator
+
+from sqlalchemy import and_, delete, func, or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from server.api.airtable_api import (
+    PartialRecord,
+    Record,
+    RecordsPage,
+    SearchOptions,
+)
+from server.api.airtable_config import (
+    AIRTABLE_MIRROR_FULL_SYNC_SECONDS,
+    AIRTABLE_MIRROR_MAX_STALENESS_SECONDS,
+    AIRTABLE_MIRROR_STALE_GRACE_SECONDS,
+)
+from server.api.async_airtable_api import AsyncAirtableAPI
+from server.api.services.base_service import BaseService
+from server.api.single_flight import AsyncSingleFlight
+from server.models.airtable_mirror import AirtableMirrorRecord, AirtableMirrorTable
+from server.models.data_store_setting.data_store_setting import DataStoreSetting
+from server.models.data_store_setting.data_store_type import DataStoreType
+from server.models.interview import Interview
+from server.models.interview_screen import InterviewScreen
+from server.models.interview_screen_entry import InterviewScreenEntry
+
+LOG = logging.getLogger(__name__)
+
+# Incremental syncs re-pull anything modified slightly before the last sync,
+# to cover clock skew between us and Airtable.
+MIRROR_SYNC_OVERLAP_SECONDS = 60
+# how many records are written with each statement
+MIRROR_UPSERT_BATCH_SIZE = 100
+
+# (data store setting id, base id, table name)
+MirrorKey = tuple[uuid.UUID, str, str]
+
+# Syncs of a mirrored table, shared by the lookups that wait for one: lookups of
+# a table that was never synced, or that is too stale to be served.
+_sync_flight = AsyncSingleFlight("airtable.mirror.sync")
+# The stale tables that are being synced in the background, so that each table
+# is only synced once at a time (and the tasks aren't garbage collected before
+# they're done).
+_background_syncs: dict[MirrorKey, asyncio.Task] = {}
+
+
+def _json_path(field_name: str) -> str:
+    """Get the SQLite JSON path to a field in a mirrored record"""
+    escaped_name = field_name.replace('"', '\\"')
+    return f'$."{escaped_name}"'
+
+
+def get_airtable_tables(interview: Interview) -> set[tuple[str, str]]:
+    """Get the (base_id, table_name) pairs that an interview's entries look up
+    records from.
+    """
+    tables = set()
+    for screen in interview.screens:
+        for entry in screen.entries:
+            options: dict[str, Any] = entry.response_type_options or {}  # type: ignore
+            # single select entries can pull their options from an airtable field
+            airtable_options = options.get("airtableConfig") or options
+            if airtable_options.get("selectedBase") and airtable_options.get(
+                "selectedTable"
+            ):
+                tables.add(
+                    (
+                        airtable_options["selectedBase"],
+                        airtable_options["selectedTable"],
+                    )
+                )
+    return tables
+
+
+class AirtableMirrorService(BaseService):
+    """Keeps a local copy of the Airtable tables that interviews look up
+    records from, so lookups don't have to go to Airtable.
+
+    The async methods read and write the database in a thread, so that the
+    event loop keeps serving requests meanwhile. The sync methods block, so
+    call them with `asyncio.to_thread` from async code.
+    """
+
+    def __init__(self, db: Session):
+        super(AirtableMirrorService, self).__init__(db)
+
+    def get_mirror_setting_id(
+        self, interview_id: str, base_id: str, table_name: str
+    ) -> uuid.UUID | None:
+        """
+        Get the id of the interview's Airtable data store setting, if the table
+        is referenced by one of the interview's entries, which is what makes it
+        eligible for mirroring. Every setting has its own mirror, synced with
+        its own credentials, so this is what lookups are answered from.
+
+        This runs on every lookup, so it's a single query on the entries'
+        options (with the same logic as `get_airtable_tables`) rather than
+        loading the interview.
+        """
+        options = InterviewScreenEntry.response_type_options
+
+        def selects(prefix: str):
+            return and_(
+                func.json_extract(options, f"{prefix}.selectedBase") == base_id,
+                func.json_extract(options, f"{prefix}.selectedTable") == table_name,
+            )
+
+        is_referenced = (
+            select(InterviewScreenEntry.id)
+            .join(InterviewScreen)
+            .where(InterviewScreen.interview_id == interview_id)
+            .where(
+                or_(
+                    selects("$.airtableConfig"),
+                    and_(
+                        func.json_extract(options, "$.airtableConfig").is_(None),
+                        selects("$"),
+                    ),
+                )
+            )
+            .exists()
+        )
+        return self.db.exec(
+            select(DataStoreSetting.id)
+            .where(DataStoreSetting.interview_id == interview_id)
+            .where(DataStoreSetting.type == DataStoreType.AIRTABLE)
+            .where(is_referenced)
+        ).first()
+
+    @staticmethod
+    def supports_options(options: SearchOptions) -> bool:
+        """Check if a search with these options can be answered from the
+        mirror. Views are defined in Airtable, so we can't apply them locally.
+        """
+        return options.view is None
+
+    async def fetch_records_by_ids(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        ids: list[str],
+    ) -> dict[str, Record | None]:
+        """Look up several records of a mirrored table by id, with the same
+        semantics as `AsyncAirtableAPI.fetch_records_by_ids`.
+        """
+        await self._sync_if_stale(airtable_client, setting_id, base_id, table_name)
+        records: dict[str, Record | None] = dict.fromkeys(ids)
+        for record in await asyncio.to_thread(
+            self._get_records,
+            select(AirtableMirrorRecord)
+            .where(AirtableMirrorRecord.data_store_setting_id == setting_id)
+            .where(AirtableMirrorRecord.base_id == base_id)
+            .where(AirtableMirrorRecord.table_name == table_name)
+            .where(AirtableMirrorRecord.record_id.in_(ids)),  # type: ignore
+        ):
+            records[record["id"]] = record
+        return records
+
+    async def search_records(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        options: SearchOptions | None = None,
+    ) -> list[Record]:
+        """
+        Search a mirrored table with the same semantics as
+        `AirtableAPI.search_records`: a record matches if any queried field
+        contains its query term, case-insensitive. The table is synced first
+        if it is older than the staleness bound.
+        """
+        options = options or SearchOptions()
+        await self._sync_if_stale(airtable_client, setting_id, base_id, table_name)
+        statement = self._search_statement(
+            setting_id, base_id, table_name, query, options
+        )
+        if options.maxRecords:
+            statement = statement.limit(options.maxRecords)
+        return await asyncio.to_thread(self._get_records, statement, options.fields)
+
+    async def search_records_page(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        page_size: int,
+        offset: str | None = None,
+        options: SearchOptions | None = None,
+    ) -> RecordsPage:
+        """
+        Get a single page of the records that `search_records` would return.
+        Like Airtable's, the offset is an opaque cursor: here it is the
+        position of the first record of the page.
+        """
+        options = options or SearchOptions()
+        await self._sync_if_stale(airtable_client, setting_id, base_id, table_name)
+        start = int(offset) if offset and offset.isdigit() else 0
+        # fetch one extra record to find out if there is a next page
+        records = await asyncio.to_thread(
+            self._get_records,
+            self._search_statement(setting_id, base_id, table_name, query, options)
+            .offset(start)
+            .limit(page_size + 1),
+            options.fields,
+        )
+        end = start + page_size
+        if options.maxRecords and end >= options.maxRecords:
+            # like Airtable, stop paging once maxRecords have been returned
+            records = records[: max(options.maxRecords - start, 0)]
+            end = options.maxRecords
+        return {
+            "records": records[:page_size],
+            "offset": str(end) if len(records) > page_size else None,
+        }
+
+    async def iterate_search_records(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        page_size: int,
+        options: SearchOptions | None = None,
+    ) -> AsyncIterator[list[Record]]:
+        """Iterate over the pages of records that `search_records` would
+        return.
+        """
+        offset = None
+        while True:
+            page = await self.search_records_page(
+                airtable_client,
+                setting_id,
+                base_id,
+                table_name,
+                query,
+                page_size,
+                offset,
+                options,
+            )
+            yield page["records"]
+            offset = page["offset"]
+            if not offset:
+                break
+
+    async def _sync_if_stale(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+    ) -> None:
+        """
+        Make sure a table is mirrored and not older than the staleness bound.
+
+        - A table that was never synced is synced before the lookup.
+        - A table that is past the staleness bound by less than
+          AIRTABLE_MIRROR_STALE_GRACE_SECONDS is synced in the background,
+          and lookups are answered from the stale records until that's done,
+          so that they don't all wait for a sync of the whole table.
+        - A table that is even older (e.g. because its background syncs keep
+          failing) is synced before the lookup, so that records are never
+          served past the grace window.
+
+        Lookups that wait share a single sync per table.
+        """
+        key = (setting_id, base_id, table_name)
+        state = await asyncio.to_thread(self.db.get, AirtableMirrorTable, key)
+        if state is not None and state.last_synced_at is not None:
+            age = datetime.utcnow() - state.last_synced_at
+            if age <= timedelta(seconds=AIRTABLE_MIRROR_MAX_STALENESS_SECONDS):
+                return
+            if age <= timedelta(
+                seconds=AIRTABLE_MIRROR_MAX_STALENESS_SECONDS
+                + AIRTABLE_MIRROR_STALE_GRACE_SECONDS
+            ):
+                if key not in _background_syncs:
+                    task = asyncio.create_task(
+                        self._sync_in_background(airtable_client, key)
+                    )
+                    _background_syncs[key] = task
+                    task.add_done_callback(lambda _: _background_syncs.pop(key, None))
+                return
+
+        await _sync_flight.do(key, lambda: self.sync_table(airtable_client, *key))
+
+    async def _sync_in_background(
+        self, airtable_client: AsyncAirtableAPI, key: MirrorKey
+    ) -> None:
+        try:
+            # the request's session is closed once the response is sent
+            with Session(self.db.get_bind()) as session:
+                await _sync_flight.do(
+                    key,
+                    lambda: AirtableMirrorService(session).sync_table(
+                        airtable_client, *key
+                    ),
+                )
+        except Exception:  # pylint: disable=broad-except
+            # the stale records are served until the grace window is over,
+            # and the next lookup retries
+            LOG.exception("Failed to sync mirrored table %s/%s", key[1], key[2])
+
+    @staticmethod
+    def _search_statement(
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        query: PartialRecord,
+        options: SearchOptions | None = None,
+    ):
+        statement = (
+            select(AirtableMirrorRecord)
+            .where(AirtableMirrorRecord.data_store_setting_id == setting_id)
+            .where(AirtableMirrorRecord.base_id == base_id)
+            .where(AirtableMirrorRecord.table_name == table_name)
+        )
+        if query:
+            statement = statement.where(
+                or_(
+                    *[
+                        func.instr(
+                            func.lower(
+                                func.json_extract(
+                                    AirtableMirrorRecord.fields, _json_path(field_name)
+                                )
+                            ),
+                            str(query_val).lower(),
+                        )
+                        > 0
+                        for field_name, query_val in query.items()
+                    ]
+                )
+            )
+        sort_columns = []
+        for sort_field in (options.sort if options else None) or []:
+            column = func.json_extract(
+                AirtableMirrorRecord.fields, _json_path(sort_field.lstrip("-"))
+            )
+            sort_columns.append(
+                column.desc() if sort_field.startswith("-") else column.asc()
+            )
+        return statement.order_by(
+            *sort_columns,
+            AirtableMirrorRecord.created_time,
+            AirtableMirrorRecord.record_id,
+        )
+
+    async def sync_table(
+        self,
+        airtable_client: AsyncAirtableAPI,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+    ) -> AirtableMirrorTable:
+        """
+        Pull the changes to a table since its last sync into the mirror of a
+        data store setting. `airtable_client` must use that setting's
+        credentials. If the table has never been synced, or its last full sync
+        is older than AIRTABLE_MIRROR_FULL_SYNC_SECONDS, the whole table is
+        pulled instead.
+        """
+        key = (setting_id, base_id, table_name)
+        state = await asyncio.to_thread(
+            self.db.get, AirtableMirrorTable, key
+        ) or AirtableMirrorTable(
+            data_store_setting_id=setting_id, base_id=base_id, table_name=table_name
+        )
+
+        # take the timestamp before fetching so that any record modified while
+        # we're fetching gets picked up by the next sync
+        now = datetime.utcnow()
+        is_full_sync = (
+            state.last_synced_at is None
+            or state.last_full_sync_at is None
+            or now - state.last_full_sync_at
+            > timedelta(seconds=AIRTABLE_MIRROR_FULL_SYNC_SECONDS)
+        )
+        since = (
+            None
+            if is_full_sync or state.last_synced_at is None
+            else state.last_synced_at - timedelta(seconds=MIRROR_SYNC_OVERLAP_SECONDS)
+        )
+        records = await airtable_client.fetch_records_modified_since(
+            base_id, table_name, since
+        )
+        return await asyncio.to_thread(
+            self._save_synced_records, key, records, now, is_full_sync
+        )
+
+    def _save_synced_records(
+        self,
+        key: MirrorKey,
+        records: list[Record],
+        synced_at: datetime,
+        is_full_sync: bool,
+    ) -> AirtableMirrorTable:
+        setting_id, base_id, table_name = key
+        if is_full_sync:
+            self.db.execute(
+                delete(AirtableMirrorRecord)
+                .where(
+                    AirtableMirrorRecord.data_store_setting_id  # type: ignore
+                    == setting_id
+                )
+                .where(AirtableMirrorRecord.base_id == base_id)  # type: ignore
+                .where(AirtableMirrorRecord.table_name == table_name)  # type: ignore
+            )
+        # other server processes can sync the same table at the same time, so
+        # every write is an upsert
+        self._upsert_mirror_records(setting_id, base_id, table_name, records)
+        sync_times = {"last_synced_at": synced_at}
+        if is_full_sync:
+            sync_times["last_full_sync_at"] = synced_at
+        self.db.execute(
+            insert(AirtableMirrorTable)
+            .values(
+                data_store_setting_id=setting_id,
+                base_id=base_id,
+                table_name=table_name,
+                **sync_times,
+            )
+            .on_conflict_do_update(
+                index_elements=["data_store_setting_id", "base_id", "table_name"],
+                set_=sync_times,
+            )
+        )
+        self.commit()
+        return self.db.get(AirtableMirrorTable, key)
+
+    async def sync_interview_tables(
+        self, airtable_client: AsyncAirtableAPI, interview: Interview
+    ) -> None:
+        """Sync every table that an interview looks up records from, with the
+        interview's Airtable client"""
+        setting_id = next(
+            (
+                setting.id
+                for setting in interview.data_store_settings
+                if setting.type == DataStoreType.AIRTABLE
+            ),
+            None,
+        )
+        if setting_id is None:
+            return
+        for base_id, table_name in get_airtable_tables(interview):
+            await self.sync_table(airtable_client, setting_id, base_id, table_name)
+
+    def upsert_records(
+        self, interview_id: str, base_id: str, table_name: str, records: list[Record]
+    ) -> None:
+        """Write records we just created or updated in Airtable through to the
+        interview's mirror, so they can be looked up without waiting for the
+        next sync.
+        """
+        setting_id = self.db.exec(
+            select(AirtableMirrorTable.data_store_setting_id)
+            .join(
+                DataStoreSetting,
+                DataStoreSetting.id == AirtableMirrorTable.data_store_setting_id,
+            )
+            .where(DataStoreSetting.interview_id == interview_id)
+            .where(AirtableMirrorTable.base_id == base_id)
+            .where(AirtableMirrorTable.table_name == table_name)
+        ).first()
+        if setting_id is None:
+            # this table isn't mirrored, nothing to do
+            return
+        self._upsert_mirror_records(setting_id, base_id, table_name, records)
+        self.commit()
+
+    def _upsert_mirror_records(
+        self,
+        setting_id: uuid.UUID,
+        base_id: str,
+        table_name: str,
+        records: list[Record],
+    ) -> None:
+        rows = [
+            {
+                "data_store_setting_id": setting_id,
+                "base_id": base_id,
+                "table_name": table_name,
+                "record_id": record["id"],
+                "created_time": record.get("createdTime"),
+                "fields": record.get("fields", {}),
+                "synced_at": datetime.utcnow(),
+            }
+            for record in records
+        ]
+        # stay well under SQLite's limit on the number of bound parameters
+        for i in range(0, len(rows), MIRROR_UPSERT_BATCH_SIZE):
+            statement = insert(AirtableMirrorRecord).values(
+                rows[i : i + MIRROR_UPSERT_BATCH_SIZE]
+            )
+            self.db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[
+                        "data_store_setting_id",
+                        "base_id",
+                        "table_name",
+                        "record_id",
+                    ],
+                    set_={
+                        "created_time": statement.excluded.created_time,
+                        "fields": statement.excluded.fields,
+                        "synced_at": statement.excluded.synced_at,
+                    },
+                )
+            )
+
+    def _get_records(self, statement, fields: list[str] | None = None) -> list[Record]:
+        return [
+            self._to_record(mirror_record, fields)
+            for mirror_record in self.db.exec(statement)
+        ]
+
+    @staticmethod
+    def _to_record(
+        mirror_record: AirtableMirrorRecord, fields: list[str] | None = None
+    ) -> Record:
+        return {
+            "id": mirror_record.record_id,
+            "createdTime": mirror_record.created_time,
+            "fields": (
+                mirror_record.fields
+                if fields is None
+                else {
+                    field_name: value
+                    for field_name, value in mirror_record.fields.items()
+                    if field_name in fields
+                }
+            ),
+        }
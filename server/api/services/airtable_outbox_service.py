@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from server.api.airtable_api import BatchRecordResult, PartialRecord, RecordUpdate
+from server.api.airtable_auth import get_fresh_airtable_config
+from server.api.airtable_config import (
+    AIRTABLE_MIRROR_ENABLED,
+    AIRTABLE_OUTBOX_BATCH_SIZE,
+    AIRTABLE_OUTBOX_CLIENT_KEY_FIELD,
+    AIRTABLE_OUTBOX_MAX_ATTEMPTS,
+)
+from server.api.async_airtable_api import AsyncAirtableAPI
+from server.api.services.airtable_mirror_service import AirtableMirrorService
+from server.api.services.base_service import BaseService
+from server.api.services.interview_service import InterviewService
+from server.models.airtable_outbox import (
+    AirtableOutboxEntry,
+    AirtableOutboxOperation,
+    AirtableOutboxStatus,
+)
+
+LOG = logging.getLogger(__name__)
+
+# how long a worker has to deliver the entries it claimed before another
+# worker can claim them again
+OUTBOX_CLAIM_SECONDS = 300
+
+# backoff (in seconds) between delivery attempts of an entry
+OUTBOX_RETRY_BASE_DELAY_SECONDS = 5
+OUTBOX_RETRY_MAX_DELAY_SECONDS = 900
+
+# errors from Airtable that won't go away if we try again
+PERMANENT_ERROR_STATUS_CODES = {400, 404, 422}
+
+
+def _parse_uuid(value: str, not_found_detail: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(value)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=not_found_detail) from e
+
+
+class AirtableOutboxService(BaseService):
+    """
+    Stores record writes for Airtable in the outbox and delivers them.
+
+    Delivery is at least once. A write whose outcome is unknown, e.g. because
+    the request to Airtable timed out, is tried again, so a create can end up
+    creating the record twice unless AIRTABLE_OUTBOX_CLIENT_KEY_FIELD is set.
+    Updates are safe to apply twice.
+
+    The delivery worker reads and writes the database in a thread, so that
+    the event loop keeps serving requests meanwhile. The other methods block,
+    so call them with `asyncio.to_thread` from async code.
+    """
+
+    def __init__(self, db: Session):
+        super(AirtableOutboxService, self).__init__(db)
+        self.interview_service = InterviewService(db)
+        self.mirror_service = AirtableMirrorService(db)
+
+    def enqueue(
+        self,
+        interview_id: str,
+        base_id: str,
+        table_name: str,
+        operation: AirtableOutboxOperation,
+        writes: list[tuple[str | None, PartialRecord]],
+    ) -> list[AirtableOutboxEntry]:
+        """
+        Store record writes in the outbox to be delivered later.
+
+        Arguments:
+        - operation: whether to create or update the records
+        - writes: the (record id, fields) of each write. The record id is
+          None for creates.
+
+        Returns: The new outbox entries, in the same order as `writes`
+        """
+        interview_uuid = _parse_uuid(interview_id, "Interview not found")
+        # the writes are acknowledged before anything is sent to Airtable, so
+        # this is the only chance to tell the caller that the interview is
+        # unknown
+        self.interview_service.get_interview_by_id(interview_id)
+        entries = [
+            AirtableOutboxEntry(
+                interview_id=interview_uuid,
+                base_id=base_id,
+                table_name=table_name,
+                operation=operation,
+                record_id=record_id,
+                fields=fields,
+            )
+            for record_id, fields in writes
+        ]
+        self.commit(add_models=entries, refresh_models=True)
+        return entries
+
+    def get_entry(self, interview_id: str, entry_id: str) -> AirtableOutboxEntry:
+        """Get an outbox entry of an interview by its id"""
+        entry = self.db.get(
+            AirtableOutboxEntry, _parse_uuid(entry_id, "Outbox entry not found")
+        )
+        if entry is None or str(entry.interview_id) != interview_id:
+            raise HTTPException(status_code=404, detail="Outbox entry not found")
+        return entry
+
+    def _claim_due_entries(self, limit: int) -> dict[tuple, list[AirtableOutboxEntry]]:
+        """
+        Claim pending entries that are due for delivery, so that no other
+        worker delivers them at the same time. A claim pushes the entry's
+        next attempt back by OUTBOX_CLAIM_SECONDS, so if we crash before
+        delivering it then it is picked up again after that.
+
+        Returns: The claimed entries, grouped by interview, table and
+        operation
+        """
+        now = datetime.utcnow()
+        due_entries = self.db.exec(
+            select(AirtableOutboxEntry)
+            .where(AirtableOutboxEntry.status == AirtableOutboxStatus.PENDING)
+            .where(AirtableOutboxEntry.next_attempt_at <= now)
+            .order_by(AirtableOutboxEntry.created_at)
+            .limit(limit)
+        ).all()
+
+        claimed_entries = []
+        for entry in due_entries:
+            result = self.db.execute(
+                update(AirtableOutboxEntry)
+                .where(AirtableOutboxEntry.id == entry.id)  # type: ignore
+                .where(
+                    AirtableOutboxEntry.next_attempt_at  # type: ignore
+                    == entry.next_attempt_at
+                )
+                .values(next_attempt_at=now + timedelta(seconds=OUTBOX_CLAIM_SECONDS))
+            )
+            if result.rowcount == 1:
+                claimed_entries.append(entry)
+        self.commit()
+
+        # the commit expired the entries, so they are loaded again here rather
+        # than by the caller
+        groups: dict[tuple, list[AirtableOutboxEntry]] = {}
+        for entry in claimed_entries:
+            groups.setdefault(
+                (entry.interview_id, entry.base_id, entry.table_name, entry.operation),
+                [],
+            ).append(entry)
+        return groups
+
+    async def deliver_due_entries(self) -> int:
+        """
+        Deliver up to AIRTABLE_OUTBOX_BATCH_SIZE entries that are due, using a
+        single batch write per interview, table and operation.
+
+        Returns: The number of entries that delivery was attempted for
+        """
+        groups = await asyncio.to_thread(
+            self._claim_due_entries, AIRTABLE_OUTBOX_BATCH_SIZE
+        )
+        for (interview_id, base_id, table_name, operation), group in groups.items():
+            results = await self._deliver(
+                str(interview_id), base_id, table_name, operation, group
+            )
+            if len(group) > 1 and any(
+                result.statusCode in PERMANENT_ERROR_STATUS_CODES for result in results
+            ):
+                # Airtable rejects a whole batch if any record in it is
+                # invalid, so deliver those records one at a time to find out
+                # which ones are actually to blame
+                results = [
+                    (
+                        await self._deliver(
+                            str(interview_id), base_id, table_name, operation, [entry]
+                        )
+                    )[0]
+                    if result.statusCode in PERMANENT_ERROR_STATUS_CODES
+                    else result
+                    for entry, result in zip(group, results)
+                ]
+            await asyncio.to_thread(
+                self._record_results, base_id, table_name, group, results
+            )
+        return sum(len(group) for group in groups.values())
+
+    async def _deliver(
+        self,
+        interview_id: str,
+        base_id: str,
+        table_name: str,
+        operation: AirtableOutboxOperation,
+        entries: list[AirtableOutboxEntry],
+    ) -> list[BatchRecordResult]:
+        """Write the entries to Airtable and get the result for each one"""
+        try:
+            # entries are expired by the commit of the previous group
+            writes = await asyncio.to_thread(
+                lambda: [(entry.id, entry.record_id, entry.fields) for entry in entries]
+            )
+            airtable_config = await get_fresh_airtable_config(
+                self.interview_service, interview_id
+            )
+            airtable_client = AsyncAirtableAPI(airtable_config)
+            if operation == AirtableOutboxOperation.CREATE:
+                if AIRTABLE_OUTBOX_CLIENT_KEY_FIELD:
+                    # a retry of a create that did reach Airtable finds the
+                    # record by its entry id and updates it, instead of
+                    # creating another
+                    return await airtable_client.batch_upsert_records(
+                        base_id,
+                        table_name,
+                        [
+                            {**fields, AIRTABLE_OUTBOX_CLIENT_KEY_FIELD: str(entry_id)}
+                            for entry_id, _, fields in writes
+                        ],
+                        [AIRTABLE_OUTBOX_CLIENT_KEY_FIELD],
+                    )
+                return await airtable_client.batch_create_records(
+                    base_id, table_name, [fields for _, _, fields in writes]
+                )
+            return await airtable_client.batch_update_records(
+                base_id,
+                table_name,
+                [
+                    RecordUpdate(id=record_id, fields=fields)
+                    for _, record_id, fields in writes
+                ],
+            )
+        except HTTPException as e:
+            return [
+                BatchRecordResult(error=str(e.detail), statusCode=e.status_code)
+                for _ in entries
+            ]
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. a timeout. Keep going so the other entries get delivered.
+            LOG.exception("Failed to deliver Airtable outbox entries")
+            return [BatchRecordResult(error=repr(e), statusCode=500) for _ in entries]
+
+    def _record_results(
+        self,
+        base_id: str,
+        table_name: str,
+        entries: list[AirtableOutboxEntry],
+        results: list[BatchRecordResult],
+    ) -> None:
+        now = datetime.utcnow()
+        delivered_records = []
+        for entry, result in zip(entries, results):
+            entry.attempts += 1
+            if result.record is not None:
+                entry.status = AirtableOutboxStatus.DELIVERED
+                entry.record_id = result.record["id"]
+                entry.delivered_at = now
+                entry.last_error = None
+                delivered_records.append(result.record)
+                continue
+
+            entry.last_error = result.error
+            if (
+                entry.attempts >= AIRTABLE_OUTBOX_MAX_ATTEMPTS
+                or result.statusCode in PERMANENT_ERROR_STATUS_CODES
+            ):
+                LOG.error(
+                    "Giving up on Airtable outbox entry %s: %s", entry.id, result.error
+                )
+                entry.status = AirtableOutboxStatus.DEAD
+            else:
+                delay = min(
+                    OUTBOX_RETRY_BASE_DELAY_SECONDS * 2 ** (entry.attempts - 1),
+                    OUTBOX_RETRY_MAX_DELAY_SECONDS,
+                )
+                # add jitter so entries that failed together don't all retry
+                # together
+                entry.next_attempt_at = now + timedelta(
+                    seconds=random.uniform(delay / 2, delay)
+                )
+        self.commit(add_models=entries)
+
+        if AIRTABLE_MIRROR_ENABLED and delivered_records:
+            self.mirror_service.upsert_records(
+                str(entries[0].interview_id), base_id, table_name, delivered_records
+            )
@@ -0,0 +1,480 @@
+import json
+import threading
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from hashlib import sha256
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+from pydantic import parse_raw_as
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, SQLModel, select
+
+from server.api.airtable_config import AIRTABLE_SCHEMA_REUSE_SECONDS
+from server.api.services.base_service import BaseService
+from server.models.airtable_schema import (
+    AirtableSchemaBase,
+    AirtableSchemaBlob,
+    AirtableSchemaSource,
+    AirtableSchemaTable,
+)
+from server.models.data_store_setting.airtable_config import (
+    AirtableBase,
+    AirtableField,
+    AirtableTable,
+)
+from server.models.data_store_setting.data_store_setting import DataStoreSetting
+from server.models.data_store_setting.data_store_type import DataStoreType
+from server.models.interview import Interview, InterviewReadWithScreensAndActions
+
+# how many blobs are inserted with each statement
+BLOB_INSERT_BATCH_SIZE = 100
+
+# When the schema of each setting was last fetched and found unchanged.
+# Storing this in the database would make every periodic refresh write, so it
+# is only kept in memory, for as long as it can be used to skip a refresh.
+_unchanged_at_lock = threading.Lock()
+_unchanged_at: TTLCache = TTLCache(
+    maxsize=10000, ttl=max(AIRTABLE_SCHEMA_REUSE_SECONDS, 1)
+)
+
+
+class AirtableSchemaService(BaseService):
+    """
+    Stores the Airtable schema of a data store setting in its own tables
+    (rather than in the setting's `config`), and loads it back as a whole, per
+    base or per table.
+
+    The fields of each table are stored in a blob that is shared by every
+    setting with the same table schema.
+    """
+
+    def __init__(self, db: Session):
+        super(AirtableSchemaService, self).__init__(db)
+
+    def get_setting_id(self, interview_id: str) -> uuid.UUID:
+        """Get the id of the Airtable data store setting of an interview,
+        without loading the setting itself"""
+        setting_id = self.db.exec(
+            select(DataStoreSetting.id)
+            .where(DataStoreSetting.interview_id == interview_id)
+            .where(DataStoreSetting.type == DataStoreType.AIRTABLE)
+        ).first()
+        if setting_id is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Airtable setting not found for interview {interview_id}",
+            )
+        return setting_id
+
+    def get_bases(
+        self, setting_id: uuid.UUID, base_ids: list[str] | None = None
+    ) -> list[AirtableBase]:
+        """Load the schema of a data store setting, or only some of its bases"""
+        base_query = select(AirtableSchemaBase).where(
+            AirtableSchemaBase.data_store_setting_id == setting_id
+        )
+        table_query = select(AirtableSchemaTable).where(
+            AirtableSchemaTable.data_store_setting_id == setting_id
+        )
+        if base_ids is not None:
+            base_query = base_query.where(
+                AirtableSchemaBase.base_id.in_(base_ids)  # type: ignore
+            )
+            table_query = table_query.where(
+                AirtableSchemaTable.base_id.in_(base_ids)  # type: ignore
+            )
+
+        tables = self.db.exec(table_query.order_by(AirtableSchemaTable.position)).all()
+        fields_by_hash = self._load_fields({table.blob_hash for table in tables})
+        tables_by_base: dict[str, list[AirtableTable]] = defaultdict(list)
+        for table in tables:
+            tables_by_base[table.base_id].append(
+                AirtableTable(
+                    id=table.table_id,
+                    name=table.name,
+                    description=table.description,
+                    fields=fields_by_hash[table.blob_hash],
+                )
+            )
+
+        return [
+            AirtableBase(
+                id=base.base_id,
+                name=base.name,
+                fingerprint=base.fingerprint,
+                tables=tables_by_base[base.base_id],
+            )
+            for base in self.db.exec(base_query.order_by(AirtableSchemaBase.position))
+        ]
+
+    def get_table(
+        self, setting_id: uuid.UUID, base_id: str, table_id: str
+    ) -> AirtableTable:
+        """Load the schema of a single table"""
+        table = self.db.get(AirtableSchemaTable, (setting_id, base_id, table_id))
+        if table is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Table {table_id} not found in the schema of base {base_id}",
+            )
+        return AirtableTable(
+            id=table.table_id,
+            name=table.name,
+            description=table.description,
+            fields=self._load_fields({table.blob_hash})[table.blob_hash],
+        )
+
+    def _load_fields(self, blob_hashes: set[str]) -> dict[str, list[AirtableField]]:
+        """Load and decompress the blobs with the given hashes"""
+        if not blob_hashes:
+            return {}
+        blobs = self.db.exec(
+            select(AirtableSchemaBlob).where(
+                AirtableSchemaBlob.hash.in_(blob_hashes)  # type: ignore
+            )
+        )
+        return {
+            blob.hash: parse_raw_as(list[AirtableField], zlib.decompress(blob.data))
+            for blob in blobs
+        }
+
+    def get_source(self, setting_id: uuid.UUID) -> AirtableSchemaSource | None:
+        """Get where and when the schema of a setting was last fetched"""
+        return self.db.get(AirtableSchemaSource, setting_id)
+
+    def get_refreshed_at(self, setting_id: uuid.UUID) -> datetime | None:
+        """Get when the schema of a setting was last fetched, whether or not
+        it changed"""
+        source = self.get_source(setting_id)
+        with _unchanged_at_lock:
+            unchanged_at = _unchanged_at.get(setting_id)
+        times = [
+            time
+            for time in (source and source.refreshed_at, unchanged_at)
+            if time is not None
+        ]
+        return max(times, default=None)
+
+    def save_bases(
+        self,
+        setting_id: uuid.UUID,
+        bases: list[AirtableBase],
+        account_id: str | None = None,
+    ) -> None:
+        """
+        Store the schema of a data store setting. Only the bases whose
+        fingerprint changed are written again, and bases that are no longer in
+        the schema are removed.
+
+        Arguments:
+        - account_id: The id of the Airtable user the schema was fetched as
+        """
+        unused_blob_hashes = self._stage_bases(setting_id, bases, account_id)
+        self.commit()
+        self.delete_unused_blobs(unused_blob_hashes)
+
+    def share_bases(
+        self,
+        setting_id: uuid.UUID,
+        bases: list[AirtableBase],
+        account_id: str | None,
+        base_ids: set[str],
+    ) -> list[uuid.UUID]:
+        """
+        Store a schema that was just fetched for one setting as the schema of
+        every other setting that is connected to the same Airtable account and
+        has the same bases, so that they don't have to fetch it themselves.
+        Their tables point to the blobs that were stored for the first
+        setting, so this only writes the list of bases and tables.
+
+        Arguments:
+        - base_ids: The ids of the bases the setting had before this schema
+          was fetched. Settings with those bases, or with the bases of the new
+          schema, are the ones that share it. (An account can grant each
+          connection access to different bases.)
+
+        Returns: The ids of the settings that the schema was stored for
+        """
+        shared_setting_ids = list(
+            self._find_sharing_settings(setting_id, bases, account_id, base_ids)
+        )
+        self._store_shared_bases(shared_setting_ids, bases, account_id)
+        return shared_setting_ids
+
+    def mark_unchanged(
+        self,
+        setting_id: uuid.UUID,
+        bases: list[AirtableBase],
+        account_id: str,
+        base_ids: set[str],
+    ) -> list[uuid.UUID]:
+        """
+        Record that the schema of a setting was just fetched and hadn't
+        changed, without writing to the database. The settings that share the
+        schema (see `share_bases`) are marked as refreshed too if their stored
+        schema is the same, and get the schema stored otherwise.
+
+        Returns: The ids of the settings that share the schema
+        """
+        fingerprints = {base.id: base.fingerprint for base in bases}
+        sharing_settings = self._find_sharing_settings(
+            setting_id, bases, account_id, base_ids
+        )
+        up_to_date_setting_ids = [setting_id] + [
+            other_setting_id
+            for other_setting_id, stored_fingerprints in sharing_settings.items()
+            if stored_fingerprints == fingerprints and None not in fingerprints.values()
+        ]
+        now = datetime.utcnow()
+        with _unchanged_at_lock:
+            for up_to_date_setting_id in up_to_date_setting_ids:
+                _unchanged_at[up_to_date_setting_id] = now
+        self._store_shared_bases(
+            [
+                other_setting_id
+                for other_setting_id in sharing_settings
+                if other_setting_id not in up_to_date_setting_ids
+            ],
+            bases,
+            account_id,
+        )
+        return list(sharing_settings)
+
+    def _find_sharing_settings(
+        self,
+        setting_id: uuid.UUID,
+        bases: list[AirtableBase],
+        account_id: str | None,
+        base_ids: set[str],
+    ) -> dict[uuid.UUID, dict[str, str | None]]:
+        """
+        Find the other settings that share the schema of a setting (see
+        `share_bases`).
+
+        Returns: The fingerprint of each stored base of each of those settings
+        """
+        if account_id is None or not base_ids:
+            return {}
+        other_setting_ids = self.db.exec(
+            select(AirtableSchemaSource.data_store_setting_id)
+            .where(AirtableSchemaSource.account_id == account_id)
+            .where(AirtableSchemaSource.data_store_setting_id != setting_id)
+        ).all()
+        if not other_setting_ids:
+            return {}
+        fingerprints_by_setting: dict[uuid.UUID, dict[str, str | None]] = defaultdict(
+            dict
+        )
+        for other_setting_id, base_id, fingerprint in self.db.exec(
+            select(
+                AirtableSchemaBase.data_store_setting_id,
+                AirtableSchemaBase.base_id,
+                AirtableSchemaBase.fingerprint,
+            ).where(
+                AirtableSchemaBase.data_store_setting_id.in_(  # type: ignore
+                    other_setting_ids
+                )
+            )
+        ):
+            fingerprints_by_setting[other_setting_id][base_id] = fingerprint
+
+        return {
+            other_setting_id: fingerprints_by_setting[other_setting_id]
+            for other_setting_id in other_setting_ids
+            if set(fingerprints_by_setting[other_setting_id])
+            in (base_ids, {base.id for base in bases})
+        }
+
+    def _store_shared_bases(
+        self,
+        setting_ids: list[uuid.UUID],
+        bases: list[AirtableBase],
+        account_id: str | None,
+    ) -> None:
+        if not setting_ids:
+            return
+        unused_blob_hashes: set[str] = set()
+        for other_setting_id in setting_ids:
+            unused_blob_hashes |= self._stage_bases(other_setting_id, bases, account_id)
+        self.commit()
+        self.delete_unused_blobs(unused_blob_hashes)
+
+    def _stage_bases(
+        self,
+        setting_id: uuid.UUID,
+        bases: list[AirtableBase],
+        account_id: str | None,
+    ) -> set[str]:
+        """
+        Add the changes that store the schema of a setting to the session,
+        without committing them.
+
+        Returns: The hashes of the blobs that the setting no longer uses
+        """
+        stored_bases = {
+            base.base_id: base
+            for base in self.db.exec(
+                select(AirtableSchemaBase).where(
+                    AirtableSchemaBase.data_store_setting_id == setting_id
+                )
+            )
+        }
+        models_to_add: list[SQLModel] = []
+        stale_base_ids = []
+        new_tables: list[tuple[AirtableSchemaTable, bytes]] = []
+        for position, base in enumerate(bases):
+            stored_base = stored_bases.pop(base.id, None)
+            if stored_base is None:
+                stored_base = AirtableSchemaBase(
+                    data_store_setting_id=setting_id,
+                    base_id=base.id,
+                    position=position,
+                )
+            elif (
+                base.fingerprint is not None
+                and stored_base.fingerprint == base.fingerprint
+            ):
+                stored_base.position = position
+                models_to_add.append(stored_base)
+                continue
+            else:
+                stale_base_ids.append(base.id)
+
+            stored_base.name = base.name
+            stored_base.fingerprint = base.fingerprint
+            stored_base.position = position
+            models_to_add.append(stored_base)
+            for table_position, table in enumerate(base.tables):
+                # the blob is addressed by the hash of its canonical JSON, so
+                # identical tables end up with the same blob
+                fields_json = json.dumps(
+                    [field.dict(exclude_none=True) for field in table.fields],
+                    sort_keys=True,
+                    separators=(",", ":"),
+                ).encode()
+                new_tables.append(
+                    (
+                        AirtableSchemaTable(
+                            data_store_setting_id=setting_id,
+                            base_id=base.id,
+                            table_id=table.id,
+                            name=table.name,
+                            description=table.description,
+                            position=table_position,
+                            blob_hash=sha256(fields_json).hexdigest(),
+                        ),
+                        fields_json,
+                    )
+                )
+
+        # Only store the blobs that we don't have yet. Checking which blobs
+        # exist and then skipping them would race with `delete_unused_blobs`
+        # in another session, which can delete a blob that no table points
+        # to yet. Instead, every blob is inserted (or ignored if it exists)
+        # in the same transaction as the tables that point to it.
+        blobs = {
+            table.blob_hash: {
+                "hash": table.blob_hash,
+                "data": zlib.compress(fields_json, 9),
+                "size": len(fields_json),
+                "created_at": datetime.utcnow(),
+            }
+            for table, fields_json in new_tables
+        }
+        blob_rows = list(blobs.values())
+        # stay well under SQLite's limit on the number of bound parameters
+        for i in range(0, len(blob_rows), BLOB_INSERT_BATCH_SIZE):
+            self.db.execute(
+                insert(AirtableSchemaBlob)
+                .values(blob_rows[i : i + BLOB_INSERT_BATCH_SIZE])
+                .on_conflict_do_nothing(index_elements=["hash"])
+            )
+        models_to_add.extend(table for table, _ in new_tables)
+
+        stale_base_ids.extend(stored_bases)
+        unused_blob_hashes = self._delete_tables(setting_id, stale_base_ids)
+        for stored_base in stored_bases.values():
+            self.db.delete(stored_base)
+
+        source = self.get_source(setting_id) or AirtableSchemaSource(
+            data_store_setting_id=setting_id
+        )
+        if account_id is not None:
+            source.account_id = account_id
+        source.refreshed_at = datetime.utcnow()
+        models_to_add.append(source)
+
+        self.db.add_all(models_to_add)
+        return unused_blob_hashes - {table.blob_hash for table, _ in new_tables}
+
+    def _delete_tables(self, setting_id: uuid.UUID, base_ids: list[str]) -> set[str]:
+        """
+        Delete the tables of some bases of a setting's schema.
+
+        Returns: The hashes of the blobs the deleted tables pointed to
+        """
+        if not base_ids:
+            return set()
+        tables_query = (
+            select(AirtableSchemaTable.blob_hash)
+            .where(AirtableSchemaTable.data_store_setting_id == setting_id)
+            .where(AirtableSchemaTable.base_id.in_(base_ids))  # type: ignore
+        )
+        blob_hashes = set(self.db.exec(tables_query).all())
+        self.db.execute(
+            delete(AirtableSchemaTable)
+            .where(
+                AirtableSchemaTable.data_store_setting_id == setting_id  # type: ignore
+            )
+            .where(AirtableSchemaTable.base_id.in_(base_ids))  # type: ignore
+        )
+        return blob_hashes
+
+    def delete_unused_blobs(self, blob_hashes: set[str] | None = None) -> int:
+        """
+        Delete the blobs that no table points to anymore, e.g. because the
+        interviews that used them were deleted.
+
+        Arguments:
+        - blob_hashes: Only look at the blobs with these hashes. All blobs are
+          looked at by default.
+
+        Returns: How many blobs were deleted
+        """
+        if blob_hashes is not None and not blob_hashes:
+            return 0
+        unused_blobs = delete(AirtableSchemaBlob).where(
+            ~select(AirtableSchemaTable.blob_hash)
+            .where(AirtableSchemaTable.blob_hash == AirtableSchemaBlob.hash)
+            .exists()
+        )
+        if blob_hashes is not None:
+            unused_blobs = unused_blobs.where(
+                AirtableSchemaBlob.hash.in_(blob_hashes)  # type: ignore
+            )
+        result = self.db.execute(
+            unused_blobs.execution_options(synchronize_session=False)
+        )
+        self.commit()
+        return result.rowcount
+
+    def add_schemas_to_interview(
+        self, interview: Interview
+    ) -> InterviewReadWithScreensAndActions:
+        """
+        Get the API model of an interview with the stored schemas filled into
+        the configs of its Airtable data store settings.
+        """
+        interview_read = InterviewReadWithScreensAndActions.from_orm(interview)
+        for setting in interview_read.data_store_settings:
+            if setting.type == DataStoreType.AIRTABLE:
+                # `config` was turned into a dict when the setting was
+                # validated, so the bases go in as dicts too
+                setting.config["bases"] = [  # type: ignore
+                    base.dict(exclude_none=True) for base in self.get_bases(setting.id)
+                ]
+        return interview_read
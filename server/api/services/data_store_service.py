@@ -1,13 +1,18 @@
-from typing import Any
+from datetime import datetime, timedelta
+from typing import Any, Literal
 
 from fastapi import HTTPException
 from pydantic import BaseModel
 from sqlmodel import Session
 
-from server.api.airtable_api import AirtableAPI
-from server.api.google_sheets_api import GoogleSheetsAPI
+from server.api.airtable_api import AirtableAPI, airtable_schema_fingerprint
+from server.api.services.airtable_schema_service import AirtableSchemaService
 from server.api.services.base_service import BaseService
 from server.api.services.interview_service import InterviewService
+from server.models.data_store_setting.airtable_config import AirtableBase
+from server.models.data_store_setting.google_sheets_config import (
+    GoogleSheetsSpreadsheet,
+)
 from server.models.data_store_setting.data_store_type import DataStoreType
 from server.models.interview import Interview
 
@@ -16,39 +21,189 @@ class GoogleSheetsUpdateSchemaOptions(BaseModel):
     spreadsheetIds: list[str]
 
 
+class DataStoreSchema(BaseModel):
+    """The schema of a data store: a list of bases for airtable, or a list of
+    spreadsheets for google sheets"""
+
+    bases: list[AirtableBase] | None = None
+    spreadsheets: list[GoogleSheetsSpreadsheet] | None = None
+
+
+class AirtableBaseChange(BaseModel):
+    """How a single base changed in an Airtable schema refresh"""
+
+    id: str
+    name: str | None
+    change: Literal["added", "changed", "removed"]
+    # the ids of the tables that were added or changed, and of the tables
+    # that were removed
+    changedTables: list[str] = []
+    removedTables: list[str] = []
+
+
+class AirtableSchemaChanges(BaseModel):
+    """The result of an Airtable schema refresh"""
+
+    # whether the schema changed at all
+    changed: bool
+    bases: list[AirtableBaseChange]
+    # whether the refresh was skipped because the schema was refreshed
+    # recently, e.g. for another interview connected to the same bases
+    reused: bool = False
+    # how many other interviews connected to the same Airtable account and
+    # bases got the refreshed schema too
+    sharedSettings: int = 0
+
+
+def diff_airtable_bases(
+    old_bases: list[AirtableBase], new_bases: list[AirtableBase]
+) -> list[AirtableBaseChange]:
+    """Find the bases and tables that were added, changed or removed"""
+    old_bases_by_id = {base.id: base for base in old_bases}
+    new_base_ids = {base.id for base in new_bases}
+    changes = []
+    for new_base in new_bases:
+        old_base = old_bases_by_id.get(new_base.id)
+        if old_base is None:
+            changes.append(
+                AirtableBaseChange(
+                    id=new_base.id,
+                    name=new_base.name,
+                    change="added",
+                    changedTables=[table.id for table in new_base.tables],
+                )
+            )
+        elif old_base.fingerprint != new_base.fingerprint:
+            old_tables_by_id = {table.id: table for table in old_base.tables}
+            new_table_ids = {table.id for table in new_base.tables}
+            changes.append(
+                AirtableBaseChange(
+                    id=new_base.id,
+                    name=new_base.name,
+                    change="changed",
+                    changedTables=[
+                        table.id
+                        for table in new_base.tables
+                        if old_tables_by_id.get(table.id) != table
+                    ],
+                    removedTables=[
+                        table_id
+                        for table_id in old_tables_by_id
+                        if table_id not in new_table_ids
+                    ],
+                )
+            )
+    for old_base in old_bases:
+        if old_base.id not in new_base_ids:
+            changes.append(
+                AirtableBaseChange(
+                    id=old_base.id,
+                    name=old_base.name,
+                    change="removed",
+                    removedTables=[table.id for table in old_base.tables],
+                )
+            )
+    return changes
+
+
 class DataStoreService(BaseService):
     def __init__(self, db: Session):
         super(DataStoreService, self).__init__(db)
         self.interview_service = InterviewService(db)
+        self.airtable_schema_service = AirtableSchemaService(db)
+
+    def get_schema(
+        self, data_store_type: DataStoreType, interview_id: str
+    ) -> DataStoreSchema:
+        """Get the stored data store schema of a given data store type for the
+        given interview id."""
+        if data_store_type == DataStoreType.AIRTABLE:
+            setting_id = self.airtable_schema_service.get_setting_id(interview_id)
+            return DataStoreSchema(
+                bases=self.airtable_schema_service.get_bases(setting_id)
+            )
+        elif data_store_type == DataStoreType.GOOGLE_SHEETS:
+            gsheets_config = self.interview_service.get_google_sheets_config(
+                interview_id
+            )
+            return DataStoreSchema(spreadsheets=gsheets_config.spreadsheets or [])
+        raise HTTPException(500, detail="Invalid data store type received")
 
     def update_schema(
         self,
         data_store_type: DataStoreType,
         interview_id: str,
         options: GoogleSheetsUpdateSchemaOptions | None = None,
-    ) -> Interview:
+        reuse_within_seconds: float | None = None,
+    ) -> Interview | AirtableSchemaChanges:
         """
         Fetch the updated data store schema for a given data store type (e.g.
         airtable or google sheets) and store the updated schema for the given
         interview id.
+
+        For airtable, only the bases that changed are converted again, and
+        what changed is returned. The new schema is also stored for the other
+        interviews that are connected to the same Airtable account and bases,
+        so they don't have to fetch it again.
+
+        Arguments:
+        - reuse_within_seconds: For airtable, don't fetch the schema if it was
+          refreshed within this many seconds (e.g. because another interview
+          with the same bases was just refreshed)
         """
         if data_store_type == DataStoreType.AIRTABLE:
+            setting_id = self.airtable_schema_service.get_setting_id(interview_id)
+            refreshed_at = self.airtable_schema_service.get_refreshed_at(setting_id)
+            if (
+                reuse_within_seconds is not None
+                and refreshed_at is not None
+                and datetime.utcnow() - refreshed_at
+                < timedelta(seconds=reuse_within_seconds)
+            ):
+                return AirtableSchemaChanges(changed=False, bases=[], reused=True)
+
             airtable_config = self.interview_service.get_airtable_config(interview_id)
-            airtable_config.bases = AirtableAPI(airtable_config).fetch_schema()
-            return self.interview_service.update_data_store_config(
-                interview_id, airtable_config
+            airtable_client = AirtableAPI(airtable_config)
+            old_bases = self.airtable_schema_service.get_bases(setting_id)
+            old_base_ids = {base.id for base in old_bases}
+            old_fingerprint = airtable_schema_fingerprint(old_bases)
+            new_bases = airtable_client.fetch_schema(old_bases)
+            changed = airtable_schema_fingerprint(new_bases) != old_fingerprint
+            source = self.airtable_schema_service.get_source(setting_id)
+            if not changed and source is not None and source.account_id is not None:
+                # nothing to write, and we already know whose schema it is
+                shared_setting_ids = self.airtable_schema_service.mark_unchanged(
+                    setting_id, new_bases, source.account_id, old_base_ids
+                )
+                return AirtableSchemaChanges(
+                    changed=False, bases=[], sharedSettings=len(shared_setting_ids)
+                )
+
+            account_id = airtable_client.fetch_user_id()
+            self.airtable_schema_service.save_bases(setting_id, new_bases, account_id)
+            shared_setting_ids = self.airtable_schema_service.share_bases(
+                setting_id, new_bases, account_id, old_base_ids
+            )
+            return AirtableSchemaChanges(
+                changed=changed,
+                bases=diff_airtable_bases(old_bases, new_bases),
+                sharedSettings=len(shared_setting_ids),
             )
         elif data_store_type == DataStoreType.GOOGLE_SHEETS and options:
+            # gspread and the Google auth libraries are only loaded for
+            # interviews that use Google Sheets
+            from server.api.google_sheets_api import GoogleSheetsAPI
+
             gsheets_config = self.interview_service.get_google_sheets_config(
                 interview_id
             )
-            gsheets_config.spreadsheets = GoogleSheetsAPI(gsheets_config).fetch_schema(
-                options.spreadsheetIds
+            new_spreadsheets = GoogleSheetsAPI(gsheets_config).fetch_schema(
+                options.spreadsheetIds, gsheets_config.spreadsheets
             )
-            print("config to write")
-            print(gsheets_config)
-            print("as dict")
-            print(gsheets_config.dict(exclude_none=True))
+            if new_spreadsheets == gsheets_config.spreadsheets:
+                # nothing to write
+                return self.interview_service.get_interview_by_id(interview_id)
+            gsheets_config.spreadsheets = new_spreadsheets
             return self.interview_service.update_data_store_config(
                 interview_id, gsheets_config
             )
@@ -1,4 +1,7 @@
+from datetime import datetime
+
 from fastapi import HTTPException
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlmodel import Session, select
 
@@ -9,6 +12,7 @@ from server.api.services.util import (
     reset_object_order,
     update_model_diff,
 )
+from server.models.airtable_token_use import AirtableTokenUse
 from server.models.data_store_setting.airtable_config import AirtableConfig
 from server.models.data_store_setting.data_store_setting import (
     DataStoreConfig,
@@ -101,7 +105,7 @@ class InterviewService(BaseService):
                 # to update the config in the db, we need to force this to write as a
                 # dict so it can serialize to a JSON
                 data_store_setting.config = new_data_store_config.dict(  # type: ignore
-                    exclude_none=True
+                    exclude_none=True, exclude={"bases"}
                 )
                 new_interview.data_store_settings[idx] = data_store_setting
                 break
@@ -109,6 +113,54 @@ class InterviewService(BaseService):
         # now actually update the interview in the db
         return self.update_interview(interview_id, new_interview)
 
+    def save_refreshed_airtable_auth(
+        self,
+        interview_id: str,
+        used_refresh_token: str,
+        refreshed_config: AirtableConfig,
+    ) -> bool:
+        """
+        Store the tokens of a refreshed Airtable config, unless the tokens
+        were refreshed by someone else (e.g. another server process) since
+        `used_refresh_token` was read. Airtable refresh tokens can only be used
+        once, so the tokens that are already stored are the ones to keep.
+
+        Returns: whether the refreshed tokens were stored
+        """
+        setting = self._get_interview_setting_by_interview_id_and_type(
+            interview_id, DataStoreType.AIRTABLE
+        )
+        # the session may hold an old copy of the setting
+        self.db.refresh(setting)
+        stored_config = AirtableConfig.parse_obj(setting.config)
+        if stored_config.authSettings.refreshToken != used_refresh_token:
+            return False
+
+        setting.config = refreshed_config.dict(  # type: ignore
+            exclude_none=True, exclude={"bases"}
+        )
+        self.commit(add_models=[setting])
+        return True
+
+    def record_airtable_token_use(self, interview_id: str) -> None:
+        """
+        Note that the Airtable tokens of an interview were just used, so that
+        the token refresher keeps renewing them.
+        """
+        setting = self._get_interview_setting_by_interview_id_and_type(
+            interview_id, DataStoreType.AIRTABLE
+        )
+        now = datetime.utcnow()
+        self.db.execute(
+            insert(AirtableTokenUse)
+            .values(data_store_setting_id=setting.id, last_used_at=now)
+            .on_conflict_do_update(
+                index_elements=["data_store_setting_id"],
+                set_={"last_used_at": now},
+            )
+        )
+        self.commit()
+
     def get_airtable_config(self, interview_id: str) -> AirtableConfig:
         data_store_setting = self._get_interview_setting_by_interview_id_and_type(
             interview_id, DataStoreType.AIRTABLE
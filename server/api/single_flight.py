@@ -0,0 +1,147 @@
+"""Coalescing of concurrent identical upstream calls.
+
+When a published interview goes out to a lot of respondents at once, many
+identical requests to Airtable or Google Sheets can be in flight at the same
+time. A `SingleFlight` group lets the first caller for a key make the upstream
+call while every other caller with the same key waits for, and shares, its
+result (or its exception).
+"""
+import asyncio
+import threading
+from hashlib import sha256
+from typing import Any, Awaitable, Callable, Hashable, TypeVar, Union
+
+T = TypeVar("T")
+
+# every group that was created, so their counters can be reported together
+_groups: dict[str, Union["SingleFlight", "AsyncSingleFlight"]] = {}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """A group of calls, keyed by a hashable key, that are coalesced while
+    they are in flight. Nothing is cached once the call completes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.collapsed = 0
+        _groups[name] = self
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        """Call `func`, unless a call with the same key is already in flight,
+        in which case wait for that call and return its result instead.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+                is_leader = True
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "inFlight": len(self._calls),
+            }
+
+
+class AsyncSingleFlight:
+    """The asyncio version of `SingleFlight`, for coroutines that run on the
+    event loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.collapsed = 0
+        _groups[name] = self
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Await `func()`, unless a call with the same key is already in
+        flight, in which case wait for that call and return its result instead.
+        """
+        future = self._calls.get(key)
+        while future is not None:
+            self.collapsed += 1
+            try:
+                # shield the shared future so that a cancelled waiter doesn't
+                # cancel the call for everyone else
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the caller that was making the call was cancelled, which
+                # says nothing about this caller, so make the call again
+                future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.calls += 1
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark the exception as retrieved, so asyncio doesn't log a warning
+            # when there were no other callers waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+            "inFlight": len(self._calls),
+        }
+
+
+def single_flight_stats() -> dict[str, dict[str, int]]:
+    """Get the counters of every single-flight group, keyed by group name"""
+    return {name: group.stats() for name, group in _groups.items()}
+
+
+def token_fingerprint(token: str | None) -> str:
+    """Get a short, non-reversible fingerprint of an access token, so that calls
+    made with different credentials are never coalesced with each other.
+    """
+    return sha256((token or "").encode()).hexdigest()[:16]
@@ -1,45 +1,75 @@
 import base64
+import json
 import logging
+import asyncio
+import sys
 import time
 import uuid
 from datetime import datetime, timedelta
 from hashlib import sha256
-from typing import Any, Union
+from typing import Any, AsyncIterator, Awaitable, Callable, Union
 from urllib.parse import urlencode
 
-import httpx
 from Crypto.Random import get_random_bytes  # pylint: disable=import-error
-from fastapi import (Body, Depends, FastAPI, HTTPException, Request, Response,
-                     Security)
+from fastapi import (Body, Depends, FastAPI, Header, HTTPException, Query,
+                     Request, Response, Security)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import (HTMLResponse, JSONResponse, RedirectResponse,
+                               StreamingResponse)
 from fastapi.routing import APIRoute
 from fastapi_azure_auth import B2CMultiTenantAuthorizationCodeBearer
 from fastapi_azure_auth.user import User as AzureUser
-from google_auth_oauthlib.flow import Flow  # pylint: disable=import-error
 from pydantic import AnyHttpUrl, BaseModel, BaseSettings, Field
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlmodel import Session, select
 
-from server.api.airtable_api import AirtableAPI, PartialRecord, Record
+from server.api.airtable_api import (AirtableAPI, BatchRecordResult,
+                                     PartialRecord, Record, RecordsPage,
+                                     RecordUpdate, RecordUpsert,
+                                     SearchOptions)
+from server.api.airtable_auth import (get_fresh_airtable_config,
+                                      is_airtable_refresh_token_expired,
+                                      refresh_and_save_airtable_auth)
+from server.api.airtable_cache import airtable_cache
+from server.api.airtable_rate_limit import OAUTH_BUCKET, airtable_rate_limiter
+from server.api.async_airtable_api import (AsyncAirtableAPI,
+                                          close_http_client, get_http_client)
 from server.api.airtable_config import (AIRTABLE_AUTH_URL, AIRTABLE_CLIENT_ID,
-                                        AIRTABLE_CLIENT_SECRET, AIRTABLE_SCOPE,
+                                        AIRTABLE_CLIENT_SECRET,
+                                        AIRTABLE_MIRROR_ENABLED,
+                                        AIRTABLE_OUTBOX_ENABLED, AIRTABLE_SCOPE,
                                         AIRTABLE_TOKEN_URL,
                                         REACT_APP_CLIENT_URI,
                                         REACT_APP_SERVER_URI)
 from server.api.exceptions import InvalidOrder
+from server.api.google_sheets_models import AppendRowResult, MatchMode
+from server.api.services.airtable_idempotency_service import \
+    AirtableIdempotencyService
+from server.api.services.airtable_mirror_service import AirtableMirrorService
+from server.api.services.airtable_outbox_service import AirtableOutboxService
+from server.api.services.airtable_schema_service import AirtableSchemaService
 from server.api.services.data_store_service import (
-    DataStoreService, GoogleSheetsUpdateSchemaOptions)
+    DataStoreSchema, DataStoreService, GoogleSheetsUpdateSchemaOptions)
 from server.api.services.interview_screen_service import InterviewScreenService
 from server.api.services.interview_service import InterviewService
 from server.api.services.util import (diff_model_lists, reset_object_order,
                                       update_model_diff)
+from server.api.single_flight import (AsyncSingleFlight, single_flight_stats,
+                                      token_fingerprint)
 from server.db import SQLITE_DB_PATH
 from server.engine import create_fk_constraint_engine
+from server.jobs.airtable_outbox_worker import run_outbox_worker
+from server.jobs.airtable_token_refresher import run_token_refresher
+from server.jobs.jobs_config import AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS
+from server.jobs.schema_refresh_scheduler import SchemaRefreshScheduler
 from server.env import get_env
+from server.models.airtable_outbox import (AirtableOutboxEntryRead,
+                                          AirtableOutboxOperation)
 from server.models.conditional_action import ConditionalAction
 from server.models.data_store_setting.airtable_config import (
-    AirtableAuthConfig, AirtableConfig)
+    AirtableAuthConfig, AirtableBase, AirtableConfig, AirtableTable)
 from server.models.data_store_setting.data_store_setting import (
     DataStoreSetting, DataStoreSettingCreate, DataStoreType)
 from server.models.data_store_setting.google_sheets_config import (
@@ -65,7 +95,18 @@ logging.basicConfig(
     datefmt="%Y-%m-%d %H:%M:%S",
 )
 
-AIRTABLE_AUTH_TIMEOUT_BUFFER_MS = 600000
+# Query parameters of the airtable-records search that control paging,
+# streaming and what is returned start with this prefix, so they can't be
+# mistaken for a field with the same name. Every other query parameter is a
+# field to search on.
+AIRTABLE_RECORDS_OPTION_PREFIX = "_"
+AIRTABLE_MAX_PAGE_SIZE = 100
+# the most records that can be fetched by id in a single request
+AIRTABLE_MAX_BATCH_RECORD_IDS = 500
+# Query parameters of the google-sheets-records search that aren't columns
+GOOGLE_SHEETS_RECORDS_RESERVED_PARAMS = {"match", "maxRecords"}
+# the most records that can be created or updated in a single request
+AIRTABLE_MAX_BATCH_WRITE_RECORDS = 100
 
 class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: list[Union[str, AnyHttpUrl]] = ["http://localhost:3000"]
@@ -136,6 +177,16 @@ engine = create_fk_constraint_engine(SQLITE_DB_PATH)
 
 oauth_cache = {}
 
+# the background task that delivers the Airtable outbox, if it is enabled
+outbox_worker_task: asyncio.Task | None = None
+
+# refreshes data store schemas in the background
+schema_refresh_scheduler = SchemaRefreshScheduler(engine)
+schema_refresh_task: asyncio.Task | None = None
+
+# renews Airtable access tokens before they expire, if it is enabled
+token_refresher_task: asyncio.Task | None = None
+
 def get_session():
     with Session(engine) as session:
         yield session
@@ -171,6 +222,26 @@ def get_interview_service(session: Session = Depends(get_session)) -> InterviewS
 def get_data_store_service(session: Session = Depends(get_session)) -> DataStoreService:
     return DataStoreService(db=session)
 
+def get_airtable_mirror_service(
+    session: Session = Depends(get_session),
+) -> AirtableMirrorService:
+    return AirtableMirrorService(db=session)
+
+def get_airtable_outbox_service(
+    session: Session = Depends(get_session),
+) -> AirtableOutboxService:
+    return AirtableOutboxService(db=session)
+
+def get_airtable_idempotency_service(
+    session: Session = Depends(get_session),
+) -> AirtableIdempotencyService:
+    return AirtableIdempotencyService(db=session)
+
+def get_airtable_schema_service(
+    session: Session = Depends(get_session),
+) -> AirtableSchemaService:
+    return AirtableSchemaService(db=session)
+
 def get_interview_screen_service(
     session: Session = Depends(get_session),
 ) -> InterviewScreenService:
@@ -199,6 +270,43 @@ async def load_config() -> None:
     await azure_scheme.openid_config.load_config()
 
 
+@app.on_event("startup")
+async def start_outbox_worker() -> None:
+    """Start delivering the Airtable outbox in the background, if enabled."""
+    global outbox_worker_task  # pylint: disable=global-statement
+    if AIRTABLE_OUTBOX_ENABLED:
+        outbox_worker_task = asyncio.create_task(run_outbox_worker(engine))
+
+
+@app.on_event("startup")
+async def start_schema_refresh_scheduler() -> None:
+    """Start refreshing data store schemas in the background."""
+    global schema_refresh_task  # pylint: disable=global-statement
+    schema_refresh_task = asyncio.create_task(schema_refresh_scheduler.run())
+
+
+@app.on_event("startup")
+async def start_token_refresher() -> None:
+    """Start renewing Airtable access tokens in the background, if enabled."""
+    global token_refresher_task  # pylint: disable=global-statement
+    if AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS > 0:
+        token_refresher_task = asyncio.create_task(run_token_refresher(engine))
+
+
+@app.on_event("shutdown")
+async def close_upstream_clients() -> None:
+    """Stop the background workers and close the pooled upstream HTTP
+    connections on shutdown. Undelivered outbox entries are picked up on the
+    next start."""
+    if outbox_worker_task is not None:
+        outbox_worker_task.cancel()
+    if schema_refresh_task is not None:
+        schema_refresh_task.cancel()
+    if token_refresher_task is not None:
+        token_refresher_task.cancel()
+    await close_http_client()
+
+
 @app.get("/auth", dependencies=[Security(azure_scheme)])
 def test_auth():
     return {"message": "auth success!"}
@@ -238,8 +346,13 @@ def get_interview(
     *,
     interview_id: str,
     interview_service: InterviewService = Depends(get_interview_service),
-) -> Interview:
-    return interview_service.get_interview_by_id(interview_id)
+    airtable_schema_service: AirtableSchemaService = Depends(
+        get_airtable_schema_service
+    ),
+) -> InterviewReadWithScreensAndActions:
+    return airtable_schema_service.add_schemas_to_interview(
+        interview_service.get_interview_by_id(interview_id)
+    )
 
 
 @app.get(
@@ -251,9 +364,14 @@ def get_interview_by_vanity_url(
     *,
     vanity_url: str,
     interview_service: InterviewService = Depends(get_interview_service),
-) -> Interview:
+    airtable_schema_service: AirtableSchemaService = Depends(
+        get_airtable_schema_service
+    ),
+) -> InterviewReadWithScreensAndActions:
     """Get a published Interview by its vanity url"""
-    return interview_service.get_interview_by_vanity_url(vanity_url)
+    return airtable_schema_service.add_schemas_to_interview(
+        interview_service.get_interview_by_vanity_url(vanity_url)
+    )
 
 
 @app.get(
@@ -348,9 +466,12 @@ def update_interview_screens_order(
     *,
     session: Session = Depends(get_session),
     interview_service: InterviewService = Depends(get_interview_service),
+    airtable_schema_service: AirtableSchemaService = Depends(
+        get_airtable_schema_service
+    ),
     interview_id: str,
     new_screen_order: list[str],
-) -> Interview:
+) -> InterviewReadWithScreensAndActions:
     db_screens = sorted(
         session.exec(
             select(InterviewScreen).where(InterviewScreen.interview_id == interview_id)
@@ -401,7 +522,7 @@ def update_interview_screens_order(
 
     # get the updated interview now
     db_interview = interview_service.get_interview_by_id(interview_id)
-    return db_interview
+    return airtable_schema_service.add_schemas_to_interview(db_interview)
 
 
 @app.post(
@@ -412,9 +533,12 @@ def update_interview_screens_order(
 def update_interview_starting_state(
     *,
     session: Session = Depends(get_session),
+    airtable_schema_service: AirtableSchemaService = Depends(
+        get_airtable_schema_service
+    ),
     interview_id: str,
     starting_state: list[str],
-) -> Interview:
+) -> InterviewReadWithScreensAndActions:
     db_screens = session.exec(
         select(InterviewScreen).where(InterviewScreen.interview_id == interview_id)
     ).all()
@@ -445,7 +569,7 @@ def update_interview_starting_state(
         raise HTTPException(
             status_code=404, detail=f"Interview with id {interview_id} not found"
         )
-    return db_interview
+    return airtable_schema_service.add_schemas_to_interview(db_interview)
 
 
 @app.get(
@@ -653,77 +777,716 @@ async def get_airtable_records(
     table_name,
     request: Request,
     interview_id: str,
+    page_size: int | None = Query(
+        default=None, alias="_pageSize", ge=1, le=AIRTABLE_MAX_PAGE_SIZE
+    ),
+    offset: str | None = Query(default=None, alias="_offset"),
+    stream: bool = Query(default=False, alias="_stream"),
+    fields: list[str] | None = Query(default=None, alias="_fields"),
+    view: str | None = Query(default=None, alias="_view"),
+    sort: list[str] | None = Query(default=None, alias="_sort"),
+    max_records: int | None = Query(default=None, alias="_maxRecords", ge=1),
     interview_service: InterviewService = Depends(get_interview_service),
-    session: Session = Depends(get_session),
-) -> list[Record]:
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+) -> list[Record] | RecordsPage | StreamingResponse:
     """
     Fetch records from an airtable table. Filtering can be performed
-    by adding query parameters to the URL, keyed by column name.
+    by adding query parameters to the URL, keyed by column name. The options
+    below start with an underscore, so that they never clash with a column.
+
+    - If `_pageSize` or `_offset` is given, a single page of records is
+      returned along with the `offset` to pass back to get the next page.
+    - If `_stream` is true, all the matching records are streamed as NDJSON
+      (one record per line), and each page is sent as soon as it arrives.
+
+    The search can be narrowed down with `_fields` (repeated, the fields to
+    return for each record), `_view`, `_sort` (repeated, prefix a field with
+    '-' to sort in descending order) and `_maxRecords`. These are pushed down
+    to Airtable, so it only sends us what the caller needs.
+
+    If AIRTABLE_MIRROR_ENABLED is set and the table is used by one of the
+    interview's entries, the records are searched in the local mirror instead
+    (unless a `_view` is given, since views only exist in Airtable).
     """
-    airtable_config = interview_service.get_airtable_config(interview_id)
+    # the token refresher normally renews the access token ahead of time, so
+    # this only refreshes it if that didn't happen
+    airtable_config = await get_fresh_airtable_config(interview_service, interview_id)
+
+    airtable_client = AsyncAirtableAPI(airtable_config)
+    query = {
+        key: val
+        for key, val in request.query_params.items()
+        if not key.startswith(AIRTABLE_RECORDS_OPTION_PREFIX)
+    }
+    options = SearchOptions(
+        fields=fields, view=view, sort=sort, maxRecords=max_records
+    )
+    # the interview's own mirror, which was synced with its own credentials
+    mirror_setting_id = (
+        await asyncio.to_thread(
+            mirror_service.get_mirror_setting_id, interview_id, base_id, table_name
+        )
+        if AIRTABLE_MIRROR_ENABLED and mirror_service.supports_options(options)
+        else None
+    )
+    use_mirror = mirror_setting_id is not None
+
+    if stream:
+        if use_mirror:
+            pages = mirror_service.iterate_search_records(
+                airtable_client,
+                mirror_setting_id,
+                base_id,
+                table_name,
+                query,
+                page_size or AIRTABLE_MAX_PAGE_SIZE,
+                options,
+            )
+        else:
+            pages = airtable_client.iterate_search_records(
+                base_id, table_name, query, page_size, options
+            )
+        # wait for the first page before we start the response, so that errors
+        # from Airtable are still returned with the right status code
+        first_page = await anext(pages, [])
+        return StreamingResponse(
+            _to_ndjson(first_page, pages), media_type="application/x-ndjson"
+        )
 
-    if is_airtable_access_token_expired(airtable_config):
-        await refresh_and_update_airtable_auth(interview_id, interview_service, session)
+    if page_size or offset:
+        if use_mirror:
+            return await mirror_service.search_records_page(
+                airtable_client,
+                mirror_setting_id,
+                base_id,
+                table_name,
+                query,
+                page_size or AIRTABLE_MAX_PAGE_SIZE,
+                offset,
+                options,
+            )
+        return await airtable_client.search_records_page(
+            base_id, table_name, query, page_size, offset, options
+        )
 
-    airtable_client = AirtableAPI(airtable_config)
     start_time = time.time()
-    query = dict(request.query_params)
-    results = airtable_client.search_records(base_id, table_name, query)
+    if use_mirror:
+        results = await mirror_service.search_records(
+            airtable_client, mirror_setting_id, base_id, table_name, query, options
+        )
+    else:
+        results = await airtable_client.search_records(
+            base_id, table_name, query, options
+        )
     end_time = time.time()
 
-    search_term = list(query.values())[0]
+    search_term = list(query.values())[0] if query else ""
     LOG.info(
         "Completed airtable search for '%s' in %s seconds", search_term, round(end_time - start_time, 3)
     )
     return results
 
 
+async def _to_ndjson(
+    first_page: list[Record], pages: AsyncIterator[list[Record]]
+) -> AsyncIterator[str]:
+    """Serialize pages of records as NDJSON, one page at a time."""
+    yield "".join(json.dumps(record) + "\n" for record in first_page)
+    try:
+        async for page in pages:
+            yield "".join(json.dumps(record) + "\n" for record in page)
+    except HTTPException as e:
+        # the response has already started so we can't change its status
+        # anymore, all we can do is end the stream early
+        LOG.error("Airtable records stream ended early: %s", e.detail)
+
+
 @app.get("/api/airtable-records/{interview_id}/{base_id}/{table_name}/{record_id}", tags=["airtable"])
-def get_airtable_record(
+async def get_airtable_record(
     base_id: str,
     table_name: str,
     record_id: str,
     interview_id: str,
     interview_service: InterviewService = Depends(get_interview_service),
-    session: Session = Depends(get_session),
 ) -> Record:
     """
     Fetch record with a particular id from a table in airtable.
     """
-    airtable_config = interview_service.get_airtable_config(interview_id)
-    airtable_client = AirtableAPI(airtable_config)
-    return airtable_client.fetch_record(base_id, table_name, record_id)
+    airtable_config = await get_fresh_airtable_config(interview_service, interview_id)
+    airtable_client = AsyncAirtableAPI(airtable_config)
+    return await airtable_client.fetch_record(base_id, table_name, record_id)
 
-@app.post('/api/data-store/{data_store_type}/update-schema/{interview_id}', tags=['dataStores'])
-def update_data_store_schema(
+
+@app.get("/api/airtable-records-by-id/{interview_id}/{base_id}/{table_name}", tags=["airtable"])
+async def get_airtable_records_by_id(
+    base_id: str,
+    table_name: str,
+    interview_id: str,
+    ids: list[str] = Query(),
+    interview_service: InterviewService = Depends(get_interview_service),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+) -> dict[str, Record | None]:
+    """
+    Fetch several records from a table in airtable by their ids (pass each
+    one as an `ids` query parameter). This takes a lot fewer requests to
+    Airtable than fetching the records one at a time.
+
+    Returns a map from each id to its record, or null if the table has no
+    record with that id.
+    """
+    if len(ids) > AIRTABLE_MAX_BATCH_RECORD_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot fetch more than {AIRTABLE_MAX_BATCH_RECORD_IDS} records at once",
+        )
+
+    airtable_config = await get_fresh_airtable_config(interview_service, interview_id)
+
+    airtable_client = AsyncAirtableAPI(airtable_config)
+    mirror_setting_id = (
+        await asyncio.to_thread(
+            mirror_service.get_mirror_setting_id, interview_id, base_id, table_name
+        )
+        if AIRTABLE_MIRROR_ENABLED
+        else None
+    )
+    if mirror_setting_id is not None:
+        return await mirror_service.fetch_records_by_ids(
+            airtable_client, mirror_setting_id, base_id, table_name, ids
+        )
+    return await airtable_client.fetch_records_by_ids(base_id, table_name, ids)
+
+@app.get(
+    "/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}",
+    tags=["googleSheets"],
+)
+def get_google_sheets_records(
+    interview_id: str,
+    spreadsheet_id: str,
+    worksheet_title: str,
+    request: Request,
+    match: MatchMode = MatchMode.SUBSTRING,
+    max_records: int | None = Query(default=None, alias="maxRecords", ge=1),
+    interview_service: InterviewService = Depends(get_interview_service),
+) -> list[dict[str, str]]:
+    """
+    Search the rows of a Google Sheets worksheet. Filtering can be performed
+    by adding query parameters to the URL, keyed by column name. The search
+    is case-insensitive and returns the rows that match any of the terms.
+
+    - `match` is `substring` (the default) to match the term anywhere in a
+      value, or `prefix` to match values where the value or one of its words
+      starts with the term.
+    - `maxRecords` limits how many rows are returned.
+
+    The worksheet is downloaded once and then searched in memory until
+    GOOGLE_SHEETS_INDEX_TTL_SECONDS have passed, after which it is only
+    downloaded again if the spreadsheet changed.
+    """
+    # the Google Sheets integration is only loaded once it's used
+    from server.api.google_sheets_api import GoogleSheetsAPI
+    from server.api.google_sheets_index import google_sheets_index
+
+    gsheets_config = interview_service.get_google_sheets_config(interview_id)
+    if not any(
+        spreadsheet.id == spreadsheet_id
+        for spreadsheet in gsheets_config.spreadsheets or []
+    ):
+        raise HTTPException(
+            status_code=404, detail="Spreadsheet not found in the data store schema"
+        )
+    query = {
+        key: val
+        for key, val in request.query_params.items()
+        if key not in GOOGLE_SHEETS_RECORDS_RESERVED_PARAMS
+    }
+
+    start_time = time.time()
+    gsheets_client = GoogleSheetsAPI(gsheets_config)
+    # the index is keyed by the credentials the worksheet is read with
+    worksheet = google_sheets_index.get(
+        (
+            token_fingerprint(gsheets_client.access_token),
+            spreadsheet_id,
+            worksheet_title,
+        ),
+        lambda: gsheets_client.fetch_worksheet_values(spreadsheet_id, worksheet_title),
+        lambda: gsheets_client.fetch_revision(spreadsheet_id),
+    )
+    unknown_columns = [column for column in query if column not in worksheet.columns]
+    if unknown_columns:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown columns: {', '.join(unknown_columns)}",
+        )
+    results = worksheet.search(query, match, max_records)
+    # searching builds column indexes, which take up memory too
+    google_sheets_index.enforce_budget()
+    end_time = time.time()
+
+    LOG.info(
+        "Completed google sheets search in %s seconds", round(end_time - start_time, 3)
+    )
+    return results
+
+
+@app.post(
+    "/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}",
+    tags=["googleSheets"],
+    response_model=list[AppendRowResult],
+)
+async def append_google_sheets_records(
+    interview_id: str,
+    spreadsheet_id: str,
+    worksheet_title: str,
+    interview_service: InterviewService = Depends(get_interview_service),
+    records: list[dict[str, Any]] = Body(...),
+) -> list[AppendRowResult]:
+    """
+    Append rows to a Google Sheets worksheet. Each record is keyed by column
+    name, and its values are put under the matching columns of the
+    worksheet's schema.
+
+    Rows appended to the same worksheet within
+    GOOGLE_SHEETS_APPEND_WINDOW_SECONDS of each other are written together
+    with a single request. Returns the result for each record in the same
+    order they were given, with the row number it was written to.
+    """
+    from server.api.google_sheets_api import GoogleSheetsAPI
+    from server.api.google_sheets_append import google_sheets_append_batcher
+    from server.api.google_sheets_index import google_sheets_index
+    from server.api.google_sheets_row_locator import google_sheets_row_locator
+
+    gsheets_config = interview_service.get_google_sheets_config(interview_id)
+    worksheet = next(
+        (
+            worksheet
+            for spreadsheet in gsheets_config.spreadsheets or []
+            if spreadsheet.id == spreadsheet_id
+            for worksheet in spreadsheet.worksheets
+            if worksheet.title == worksheet_title
+        ),
+        None,
+    )
+    if worksheet is None:
+        raise HTTPException(
+            status_code=404, detail="Worksheet not found in the data store schema"
+        )
+
+    results: list[AppendRowResult | None] = []
+    rows = []
+    for record in records:
+        unknown_columns = [
+            column for column in record if column not in worksheet.columns
+        ]
+        if unknown_columns:
+            results.append(
+                AppendRowResult(
+                    error=f"Unknown columns: {', '.join(unknown_columns)}",
+                    statusCode=422,
+                )
+            )
+            continue
+        results.append(None)
+        rows.append(
+            [
+                "" if record.get(column) is None else record[column]
+                for column in worksheet.columns
+            ]
+        )
+
+    appended = iter(
+        await google_sheets_append_batcher.append(
+            GoogleSheetsAPI(gsheets_config), spreadsheet_id, worksheet_title, rows
+        )
+    )
+    results = [result or next(appended) for result in results]
+    google_sheets_row_locator.rows_appended(
+        spreadsheet_id,
+        worksheet_title,
+        [
+            (result.rowNumber, record)
+            for result, record in zip(results, records)
+            if result.rowNumber is not None
+        ],
+    )
+    if any(result.rowNumber is not None for result in results):
+        # the indexed copy of the worksheet doesn't have the new rows
+        google_sheets_index.invalidate(spreadsheet_id, worksheet_title)
+    return results
+
+
+@app.patch(
+    "/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}/{primary_key}",
+    tags=["googleSheets"],
+)
+def update_google_sheets_record(
+    interview_id: str,
+    spreadsheet_id: str,
+    worksheet_title: str,
+    primary_key: str,
+    primary_key_column: str = Query(alias="primaryKeyColumn"),
+    interview_service: InterviewService = Depends(get_interview_service),
+    fields: dict[str, Any] = Body(...),
+) -> dict[str, Any]:
+    """
+    Update the row of a Google Sheets worksheet whose `primaryKeyColumn` is
+    `primary_key`. The body is keyed by column name, and only those columns
+    are written.
+
+    The row is found through an in-memory index of the worksheet's primary
+    keys, so the worksheet is only read in full when it was changed by
+    someone else. Returns the updated row, keyed by column name.
+    """
+    from gspread.exceptions import APIError
+
+    from server.api.google_sheets_api import GoogleSheetsAPI
+    from server.api.google_sheets_index import google_sheets_index
+    from server.api.google_sheets_row_locator import google_sheets_row_locator
+
+    gsheets_config = interview_service.get_google_sheets_config(interview_id)
+    if not any(
+        spreadsheet.id == spreadsheet_id
+        for spreadsheet in gsheets_config.spreadsheets or []
+    ):
+        raise HTTPException(
+            status_code=404, detail="Spreadsheet not found in the data store schema"
+        )
+    try:
+        record = google_sheets_row_locator.update_row(
+            GoogleSheetsAPI(gsheets_config),
+            spreadsheet_id,
+            worksheet_title,
+            primary_key_column,
+            primary_key,
+            fields,
+        )
+    except APIError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=str(e)) from e
+    # the indexed copy of the worksheet has the old values
+    google_sheets_index.invalidate(spreadsheet_id, worksheet_title)
+    return record
+
+
+@app.get("/api/metrics/airtable-cache", tags=["metrics"])
+def get_airtable_cache_metrics() -> dict[str, dict[str, int]]:
+    """
+    Get the hit, miss and eviction counters of the Airtable search and record
+    caches, along with their current and maximum sizes.
+    """
+    return airtable_cache.stats()
+
+
+def _lazy_integration_stats(module_name: str, attribute: str) -> dict[str, int]:
+    """Get the stats of an integration that is loaded on first use. Asking
+    for metrics shouldn't load it, so if nothing used it yet there are no
+    stats."""
+    module = sys.modules.get(module_name)
+    if module is None:
+        return {}
+    return getattr(module, attribute).stats()
+
+
+@app.get("/api/metrics/google-sheets-index", tags=["metrics"])
+def get_google_sheets_index_metrics() -> dict[str, int]:
+    """
+    Get the hit, miss and eviction counters of the in-memory Google Sheets
+    worksheet index, along with how much memory it uses and its budget.
+    """
+    return _lazy_integration_stats(
+        "server.api.google_sheets_index", "google_sheets_index"
+    )
+
+
+@app.get("/api/metrics/google-sheets-append", tags=["metrics"])
+def get_google_sheets_append_metrics() -> dict[str, int]:
+    """
+    Get how many append requests were made to Google Sheets, how many rows
+    they wrote (and failed to write), and how many worksheets have rows
+    waiting to be written.
+    """
+    return _lazy_integration_stats(
+        "server.api.google_sheets_append", "google_sheets_append_batcher"
+    )
+
+
+@app.get("/api/metrics/google-sheets-row-locator", tags=["metrics"])
+def get_google_sheets_row_locator_metrics() -> dict[str, int]:
+    """
+    Get how many primary key indexes of Google Sheets worksheets were built,
+    how many edits found their row in an existing index, and how many rows
+    had moved by the time they were written.
+    """
+    return _lazy_integration_stats(
+        "server.api.google_sheets_row_locator", "google_sheets_row_locator"
+    )
+
+
+@app.get("/api/metrics/google-sheets-clients", tags=["metrics"])
+def get_google_sheets_client_pool_metrics() -> dict[str, int]:
+    """
+    Get how often a pooled Google Sheets client was reused, how many had to
+    be created (and how many of those replaced a client whose tokens were
+    rotated), and how many were dropped for being idle or to make room.
+    """
+    return _lazy_integration_stats(
+        "server.api.google_sheets_api", "google_sheets_client_pool"
+    )
+
+
+@app.get("/api/metrics/single-flight", tags=["metrics"])
+def get_single_flight_metrics() -> dict[str, dict[str, int]]:
+    """
+    Get, for each kind of coalesced upstream call, how many upstream calls
+    were made and how many concurrent identical calls were collapsed into them.
+    """
+    return single_flight_stats()
+
+
+@app.get("/api/metrics/airtable-rate-limiter", tags=["metrics"])
+def get_airtable_rate_limiter_metrics() -> dict[str, dict[str, float]]:
+    """
+    Get, for each Airtable base (and the 'meta' and 'oauth' buckets), the
+    current and maximum queue depth, how long requests waited for their turn,
+    and how many were rejected, rate limited by Airtable or retried.
+    """
+    return airtable_rate_limiter.stats()
+
+@app.post(
+    '/api/data-store/{data_store_type}/update-schema/{interview_id}',
+    tags=['dataStores'],
+    response_model=DataStoreSchema,
+    response_model_exclude_none=True,
+    status_code=202,
+)
+async def update_data_store_schema(
         data_store_type: DataStoreType,
         interview_id: str,
+        response: Response,
         options: GoogleSheetsUpdateSchemaOptions | None = None,
         data_store_service: DataStoreService = Depends(get_data_store_service),
         session: Session = Depends(get_session)
-) -> Interview:
+) -> DataStoreSchema:
+    """
+    Queue a refresh of the data store schema for a given data store type (e.g.
+    airtable or google sheets) of the given interview, and return the schema
+    we have stored right now. The refresh runs in the background, so the new
+    schema shows up once it is done.
+
+    For google sheets, `spreadsheetIds` picks the spreadsheets to fetch.
+    Without it, the spreadsheets that are already in the schema are
+    refreshed. If any of them isn't in the schema yet, there is nothing to
+    return for it, so the schema is fetched right away instead (and returned
+    with a 200).
+    """
+    schema = data_store_service.get_schema(data_store_type, interview_id)
+    if (
+        data_store_type == DataStoreType.GOOGLE_SHEETS
+        and options
+        and not {
+            spreadsheet.id for spreadsheet in schema.spreadsheets or []
+        }.issuperset(options.spreadsheetIds)
+    ):
+        # the schemas are fetched with blocking clients
+        await asyncio.to_thread(
+            data_store_service.update_schema, data_store_type, interview_id, options
+        )
+        response.status_code = 200
+        return data_store_service.get_schema(data_store_type, interview_id)
+
+    schema_refresh_scheduler.enqueue(
+        interview_id,
+        data_store_type,
+        options.spreadsheetIds if options else None,
+    )
+    return schema
+
+
+@app.get(
+    '/api/data-store/airtable/schema/{interview_id}/{base_id}',
+    tags=['dataStores'],
+    response_model=AirtableBase,
+    response_model_exclude_none=True,
+)
+def get_airtable_base_schema(
+        interview_id: str,
+        base_id: str,
+        airtable_schema_service: AirtableSchemaService = Depends(
+            get_airtable_schema_service
+        ),
+) -> AirtableBase:
+    """Get the stored schema of a single base of an interview's Airtable
+    data store."""
+    setting_id = airtable_schema_service.get_setting_id(interview_id)
+    bases = airtable_schema_service.get_bases(setting_id, [base_id])
+    if not bases:
+        raise HTTPException(
+            status_code=404, detail=f"Base {base_id} not found in the schema"
+        )
+    return bases[0]
+
+
+@app.get(
+    '/api/data-store/airtable/schema/{interview_id}/{base_id}/{table_id}',
+    tags=['dataStores'],
+    response_model=AirtableTable,
+    response_model_exclude_none=True,
+)
+def get_airtable_table_schema(
+        interview_id: str,
+        base_id: str,
+        table_id: str,
+        airtable_schema_service: AirtableSchemaService = Depends(
+            get_airtable_schema_service
+        ),
+) -> AirtableTable:
+    """Get the stored schema of a single table of an interview's Airtable
+    data store."""
+    setting_id = airtable_schema_service.get_setting_id(interview_id)
+    return airtable_schema_service.get_table(setting_id, base_id, table_id)
+
+# concurrent writes with the same idempotency key wait for the first one
+_idempotent_write_flight = AsyncSingleFlight("airtable.idempotent_write")
+
+
+async def _idempotent_write(
+    idempotency_service: AirtableIdempotencyService,
+    interview_id: str,
+    idempotency_key: str | None,
+    request: Request,
+    payload: Any,
+    write: Callable[[], Awaitable[Any]],
+) -> Any:
     """
-    Fetch the updated data store schema for a given data store type (e.g.
-    airtable or google sheets) and store the updated schema for the given
-    interview id.
+    Make a write to Airtable at most once per idempotency key.
+
+    The key is claimed in the database before writing, and the result of a
+    successful write is stored in place of the claim. A retry with the same
+    key gets the stored result back without calling Airtable again. A retry
+    that arrives while the first write is still in flight waits for it if it
+    is in the same server process, and gets a 409 otherwise. The claim is
+    dropped if the write fails, or if any record of a batch write fails, so
+    the write can be retried with the same key.
     """
-    return data_store_service.update_schema(data_store_type, interview_id, options)
+    if idempotency_key is None:
+        return await write()
+
+    request_hash = sha256(
+        json.dumps(
+            [request.method, request.url.path, jsonable_encoder(payload)],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+
+    async def write_once() -> tuple[str, int, Any]:
+        # the database is read and written in a thread, so that the event
+        # loop keeps serving requests meanwhile
+        stored = await asyncio.to_thread(
+            idempotency_service.claim, interview_id, idempotency_key, request_hash
+        )
+        if stored is not None:
+            return stored.request_hash, stored.status_code, stored.response
+
+        try:
+            result = await write()
+        except BaseException:
+            await asyncio.to_thread(
+                idempotency_service.release, interview_id, idempotency_key
+            )
+            raise
+        if isinstance(result, JSONResponse):
+            status_code, content = result.status_code, json.loads(result.body)
+        else:
+            status_code, content = 200, jsonable_encoder(result)
+        if status_code >= 400 or (
+            isinstance(result, list)
+            and any(
+                isinstance(record_result, BatchRecordResult) and record_result.error
+                for record_result in result
+            )
+        ):
+            await asyncio.to_thread(
+                idempotency_service.release, interview_id, idempotency_key
+            )
+        else:
+            await asyncio.to_thread(
+                idempotency_service.save_result,
+                interview_id,
+                idempotency_key,
+                request_hash,
+                status_code,
+                content,
+            )
+        return request_hash, status_code, content
+
+    write_hash, status_code, content = await _idempotent_write_flight.do(
+        (interview_id, idempotency_key), write_once
+    )
+    if write_hash != request_hash:
+        # we waited on a different request that was made with the same key
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency key was already used for a different request",
+        )
+    return JSONResponse(status_code=status_code, content=content)
+
 
 @app.post("/api/airtable-records/{interview_id}/{base_id}/{table_name}", tags=["airtable"])
 async def create_airtable_record(
+    request: Request,
     base_id: str,
     table_name: str,
     interview_id: str,
     interview_service: InterviewService = Depends(get_interview_service),
-    session: Session = Depends(get_session),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+    outbox_service: AirtableOutboxService = Depends(get_airtable_outbox_service),
+    idempotency_service: AirtableIdempotencyService = Depends(
+        get_airtable_idempotency_service
+    ),
+    idempotency_key: str | None = Header(default=None),
     record: Record = Body(...),
-) -> Record:
+) -> Record | JSONResponse:
     """
     Create an airtable record in a table.
+
+    If AIRTABLE_OUTBOX_ENABLED is set, the record is stored in the outbox to
+    be created later, and its outbox entry is returned with a 202.
+
+    If an `Idempotency-Key` header is given, retrying the request with the
+    same key returns the same result instead of creating another record.
     """
-    airtable_config = interview_service.get_airtable_config(interview_id)
-    airtable_client = AirtableAPI(airtable_config)
-    return airtable_client.create_record(base_id, table_name, record)
+    async def create() -> Record | JSONResponse:
+        if AIRTABLE_OUTBOX_ENABLED:
+            [entry] = await asyncio.to_thread(
+                outbox_service.enqueue,
+                interview_id,
+                base_id,
+                table_name,
+                AirtableOutboxOperation.CREATE,
+                [(None, record)],
+            )
+            return _accepted(AirtableOutboxEntryRead.from_orm(entry))
+
+        airtable_config = await get_fresh_airtable_config(
+            interview_service, interview_id
+        )
+        airtable_client = AsyncAirtableAPI(airtable_config)
+        new_record = await airtable_client.create_record(
+            base_id, table_name, record
+        )
+        if AIRTABLE_MIRROR_ENABLED:
+            await asyncio.to_thread(
+                mirror_service.upsert_records,
+                interview_id,
+                base_id,
+                table_name,
+                [new_record],
+            )
+        return new_record
+
+    return await _idempotent_write(
+        idempotency_service, interview_id, idempotency_key, request, record, create
+    )
 
 
 @app.put(
@@ -731,20 +1494,316 @@ async def create_airtable_record(
     tags=["airtable"]
 )
 async def update_airtable_record(
+    request: Request,
     base_id: str,
     table_name: str,
     record_id: str,
     interview_id: str,
     interview_service: InterviewService = Depends(get_interview_service),
-    session: Session = Depends(get_session),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+    outbox_service: AirtableOutboxService = Depends(get_airtable_outbox_service),
+    idempotency_service: AirtableIdempotencyService = Depends(
+        get_airtable_idempotency_service
+    ),
+    idempotency_key: str | None = Header(default=None),
     update: PartialRecord = Body(...),
-) -> Record:
+) -> Record | JSONResponse:
     """
     Update an airtable record in a table.
+
+    If AIRTABLE_OUTBOX_ENABLED is set, the update is stored in the outbox to
+    be applied later, and its outbox entry is returned with a 202.
+
+    If an `Idempotency-Key` header is given, retrying the request with the
+    same key returns the same result instead of updating the record again.
     """
-    airtable_config = interview_service.get_airtable_config(interview_id)
-    airtable_client = AirtableAPI(airtable_config)
-    return airtable_client.update_record(base_id, table_name, record_id, update)
+    async def apply_update() -> Record | JSONResponse:
+        if AIRTABLE_OUTBOX_ENABLED:
+            [entry] = await asyncio.to_thread(
+                outbox_service.enqueue,
+                interview_id,
+                base_id,
+                table_name,
+                AirtableOutboxOperation.UPDATE,
+                [(record_id, update)],
+            )
+            return _accepted(AirtableOutboxEntryRead.from_orm(entry))
+
+        airtable_config = await get_fresh_airtable_config(
+            interview_service, interview_id
+        )
+        airtable_client = AsyncAirtableAPI(airtable_config)
+        updated_record = await airtable_client.update_record(
+            base_id, table_name, record_id, update
+        )
+        if AIRTABLE_MIRROR_ENABLED:
+            await asyncio.to_thread(
+                mirror_service.upsert_records,
+                interview_id,
+                base_id,
+                table_name,
+                [updated_record],
+            )
+        return updated_record
+
+    return await _idempotent_write(
+        idempotency_service,
+        interview_id,
+        idempotency_key,
+        request,
+        update,
+        apply_update,
+    )
+
+
+def _accepted(content: Any) -> JSONResponse:
+    """Respond with a 202, for writes that were stored in the outbox"""
+    return JSONResponse(status_code=202, content=jsonable_encoder(content))
+
+
+def _validate_batch_size(records: list) -> None:
+    if len(records) > AIRTABLE_MAX_BATCH_WRITE_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot write more than {AIRTABLE_MAX_BATCH_WRITE_RECORDS} records at once",
+        )
+
+
+@app.post(
+    "/api/airtable-records-batch/{interview_id}/{base_id}/{table_name}",
+    tags=["airtable"],
+    response_model=list[BatchRecordResult],
+)
+async def create_airtable_records(
+    request: Request,
+    base_id: str,
+    table_name: str,
+    interview_id: str,
+    interview_service: InterviewService = Depends(get_interview_service),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+    outbox_service: AirtableOutboxService = Depends(get_airtable_outbox_service),
+    idempotency_service: AirtableIdempotencyService = Depends(
+        get_airtable_idempotency_service
+    ),
+    idempotency_key: str | None = Header(default=None),
+    records: list[Record] = Body(...),
+) -> list[BatchRecordResult] | JSONResponse:
+    """
+    Create several airtable records in a table, using as few requests to
+    Airtable as possible. Returns the result for each record in the same order
+    they were given, so that records that failed can be retried.
+
+    If AIRTABLE_OUTBOX_ENABLED is set, the records are stored in the outbox to
+    be created later and a 202 is returned, with the outbox entry id of each
+    record.
+
+    If an `Idempotency-Key` header is given, retrying the request with the
+    same key returns the same results instead of creating the records again. The results
+    aren't kept if any record failed, so that the records that failed can be
+    retried with the same key.
+    """
+    _validate_batch_size(records)
+
+    async def create() -> list[BatchRecordResult] | JSONResponse:
+        if AIRTABLE_OUTBOX_ENABLED:
+            entries = await asyncio.to_thread(
+                outbox_service.enqueue,
+                interview_id,
+                base_id,
+                table_name,
+                AirtableOutboxOperation.CREATE,
+                [(None, record) for record in records],
+            )
+            return _accepted(
+                [
+                    BatchRecordResult(statusCode=202, outboxEntryId=str(entry.id))
+                    for entry in entries
+                ]
+            )
+
+        airtable_config = await get_fresh_airtable_config(
+            interview_service, interview_id
+        )
+        airtable_client = AsyncAirtableAPI(airtable_config)
+        results = await airtable_client.batch_create_records(
+            base_id, table_name, records
+        )
+        if AIRTABLE_MIRROR_ENABLED:
+            await asyncio.to_thread(
+                mirror_service.upsert_records,
+                interview_id,
+                base_id,
+                table_name,
+                [result.record for result in results if result.record],
+            )
+        return results
+
+    return await _idempotent_write(
+        idempotency_service, interview_id, idempotency_key, request, records, create
+    )
+
+
+@app.patch(
+    "/api/airtable-records-batch/{interview_id}/{base_id}/{table_name}",
+    tags=["airtable"],
+    response_model=list[BatchRecordResult],
+)
+async def update_airtable_records(
+    request: Request,
+    base_id: str,
+    table_name: str,
+    interview_id: str,
+    interview_service: InterviewService = Depends(get_interview_service),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+    outbox_service: AirtableOutboxService = Depends(get_airtable_outbox_service),
+    idempotency_service: AirtableIdempotencyService = Depends(
+        get_airtable_idempotency_service
+    ),
+    idempotency_key: str | None = Header(default=None),
+    updates: list[RecordUpdate] = Body(...),
+) -> list[BatchRecordResult] | JSONResponse:
+    """
+    Update several airtable records in a table, using as few requests to
+    Airtable as possible. Returns the result for each update in the same order
+    they were given, so that updates that failed can be retried.
+
+    If AIRTABLE_OUTBOX_ENABLED is set, the updates are stored in the outbox to
+    be applied later and a 202 is returned, with the outbox entry id of each
+    update.
+
+    If an `Idempotency-Key` header is given, retrying the request with the
+    same key returns the same results instead of applying the updates again. The results
+    aren't kept if any record failed, so that the records that failed can be
+    retried with the same key.
+    """
+    _validate_batch_size(updates)
+
+    async def apply_updates() -> list[BatchRecordResult] | JSONResponse:
+        if AIRTABLE_OUTBOX_ENABLED:
+            entries = await asyncio.to_thread(
+                outbox_service.enqueue,
+                interview_id,
+                base_id,
+                table_name,
+                AirtableOutboxOperation.UPDATE,
+                [(update.id, update.fields) for update in updates],
+            )
+            return _accepted(
+                [
+                    BatchRecordResult(statusCode=202, outboxEntryId=str(entry.id))
+                    for entry in entries
+                ]
+            )
+
+        airtable_config = await get_fresh_airtable_config(
+            interview_service, interview_id
+        )
+        airtable_client = AsyncAirtableAPI(airtable_config)
+        results = await airtable_client.batch_update_records(
+            base_id, table_name, updates
+        )
+        if AIRTABLE_MIRROR_ENABLED:
+            await asyncio.to_thread(
+                mirror_service.upsert_records,
+                interview_id,
+                base_id,
+                table_name,
+                [result.record for result in results if result.record],
+            )
+        return results
+
+    return await _idempotent_write(
+        idempotency_service,
+        interview_id,
+        idempotency_key,
+        request,
+        updates,
+        apply_updates,
+    )
+
+@app.patch(
+    "/api/airtable-records-upsert/{interview_id}/{base_id}/{table_name}",
+    tags=["airtable"],
+    response_model=list[BatchRecordResult],
+)
+async def upsert_airtable_records(
+    request: Request,
+    base_id: str,
+    table_name: str,
+    interview_id: str,
+    interview_service: InterviewService = Depends(get_interview_service),
+    mirror_service: AirtableMirrorService = Depends(get_airtable_mirror_service),
+    idempotency_service: AirtableIdempotencyService = Depends(
+        get_airtable_idempotency_service
+    ),
+    idempotency_key: str | None = Header(default=None),
+    upsert: RecordUpsert = Body(...),
+) -> list[BatchRecordResult] | JSONResponse:
+    """
+    Create or update several airtable records in a table. A record is updated
+    if there is already a record with the same values in `fieldsToMergeOn`,
+    and created otherwise, so a keyed write takes a single round trip instead
+    of a lookup followed by an update. Returns the result for each record in
+    the same order they were given.
+
+    Upserts are always sent to Airtable directly, even if
+    AIRTABLE_OUTBOX_ENABLED is set, because whether they create a record
+    depends on what is in the table when they are applied.
+
+    If an `Idempotency-Key` header is given, retrying the request with the
+    same key returns the same results instead of upserting the records again. The results
+    aren't kept if any record failed, so that the records that failed can be
+    retried with the same key.
+    """
+    _validate_batch_size(upsert.records)
+
+    async def apply_upsert() -> list[BatchRecordResult]:
+        airtable_config = await get_fresh_airtable_config(
+            interview_service, interview_id
+        )
+        airtable_client = AsyncAirtableAPI(airtable_config)
+        results = await airtable_client.batch_upsert_records(
+            base_id, table_name, upsert.records, upsert.fieldsToMergeOn
+        )
+        if AIRTABLE_MIRROR_ENABLED:
+            await asyncio.to_thread(
+                mirror_service.upsert_records,
+                interview_id,
+                base_id,
+                table_name,
+                [result.record for result in results if result.record],
+            )
+        return results
+
+    return await _idempotent_write(
+        idempotency_service,
+        interview_id,
+        idempotency_key,
+        request,
+        upsert,
+        apply_upsert,
+    )
+
+
+@app.get(
+    "/api/airtable-outbox/{interview_id}/{entry_id}",
+    tags=["airtable"],
+    response_model=AirtableOutboxEntryRead,
+)
+def get_airtable_outbox_entry(
+    interview_id: str,
+    entry_id: uuid.UUID,
+    outbox_service: AirtableOutboxService = Depends(get_airtable_outbox_service),
+) -> AirtableOutboxEntryRead:
+    """
+    Get the delivery status of a record write that was stored in the
+    Airtable outbox: whether it is still pending, was delivered (along with
+    the id of the record), or was given up on (along with the last error).
+    """
+    return AirtableOutboxEntryRead.from_orm(
+        outbox_service.get_entry(interview_id, str(entry_id))
+    )
+
 
 @app.get('/api/google-sheets-oauth-callback', tags=["googleSheets"])
 async def google_sheets_oauth_callback(
@@ -758,6 +1817,9 @@ async def google_sheets_oauth_callback(
     We receive the access token, and other auth data, and store it into a
     DataStoreSetting model.
     '''
+    # the Google auth libraries are only loaded once they're used
+    from google_auth_oauthlib.flow import Flow  # pylint: disable=import-error
+
     LOG.info("Storing Google Sheets auth config to db")
     interview_id = state
 
@@ -860,6 +1922,9 @@ async def airtable_auth(
 async def airtable_callback(
     request: Request,
     interview_service: InterviewService = Depends(get_interview_service),
+    airtable_schema_service: AirtableSchemaService = Depends(
+        get_airtable_schema_service
+    ),
     session: Session = Depends(get_session),
 ):
     '''This is the callback that Airtable itself calls as part of the OAuth
@@ -899,9 +1964,13 @@ async def airtable_callback(
         'grant_type': "authorization_code",
     }
 
-    response = httpx.post(url=AIRTABLE_TOKEN_URL,
-        headers=headers,
-        data=params
+    response = await airtable_rate_limiter.send_async(
+        OAUTH_BUCKET,
+        lambda: get_http_client().post(
+            url=AIRTABLE_TOKEN_URL,
+            headers=headers,
+            data=params
+        )
     )
     response_json = response.json()
     redirect_to = ''
@@ -935,9 +2004,11 @@ async def airtable_callback(
         # create empty data_store_settings object
         interview = interview_service.get_interview_by_id(interview_id)
 
-        # fetch airtable schema
+        # fetch airtable schema. The schema is fetched with the blocking
+        # client, so run it in the threadpool to keep the event loop free.
         airtable_client = AirtableAPI(airtable_config)
-        airtable_config.bases = airtable_client.fetch_schema()
+        bases = await run_in_threadpool(airtable_client.fetch_schema)
+        account_id = await run_in_threadpool(airtable_client.fetch_user_id)
 
         # create new DataStoreSetting model
         new_data_store_setting = DataStoreSetting(
@@ -950,6 +2021,11 @@ async def airtable_callback(
         # commit to db
         interview_service.update_interview(interview_id, interview)
 
+        # the schema is stored separately, now that its setting exists
+        airtable_schema_service.save_bases(
+            new_data_store_setting.id, bases, account_id
+        )
+
         params = {
             'id': 'airtable',
             'state': state
@@ -965,94 +2041,6 @@ async def airtable_callback(
     return RedirectResponse(redirect_to, status_code=302)
 
 
-def is_airtable_access_token_expired(
-    airtable_config: AirtableConfig,
-    buffer=AIRTABLE_AUTH_TIMEOUT_BUFFER_MS
-):
-    """
-    Checks to see if the token expiry time (minus a buffer) has passed.
-    """
-    # time is stored in miliseconds, but python wants seconds
-    token_expiry_time = datetime.fromtimestamp(
-        airtable_config.authSettings.accessTokenExpires //1000
-    ) - timedelta(milliseconds=buffer)
-    now = datetime.now()
-    if now > token_expiry_time:
-        LOG.info("Token expired | Current time: %s | Token expiry time: %s", now, token_expiry_time)
-        return True
-    return False
-
-def is_airtable_refresh_token_expired(airtable_config: AirtableConfig, buffer):
-    """
-        Checks to see if the token expiry time (minus a buffer) has passed.
-    """
-    # time is stored in miliseconds, but python wants seconds
-    if airtable_config.authSettings:
-        token_expiry_time = datetime.fromtimestamp(
-            airtable_config.authSettings.refreshTokenExpires//1000
-        ) - timedelta(milliseconds=buffer)
-        now = datetime.now()
-        if now > token_expiry_time:
-            LOG.info(
-                "Refresh token expired | Current time: %s | Refresh token expiry time: %s",
-                now,
-                token_expiry_time
-            )
-            return True
-        LOG.info(
-            "Refresh token NOT expired | Current time: %s | Refresh token expiry time: %s",
-            now,
-            token_expiry_time
-        )
-    return False
-
-# TODO - Run this on a schedule or on certain Airtable API calls
-def refresh_airtable_auth(airtable_config: AirtableConfig):
-    if AIRTABLE_TOKEN_URL is None:
-        LOG.error("AIRTABLE_TOKEN_URL environment variable is not set")
-        return
-
-    if airtable_config.authSettings is None:
-        return
-
-    credentials = f"{AIRTABLE_CLIENT_ID}:{AIRTABLE_CLIENT_SECRET}".encode('utf-8')
-    encoded_credentials = base64.b64encode(credentials).decode('utf-8')
-    authorizationHeader = f"Basic {encoded_credentials}"
-    headers = {
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Authorization': authorizationHeader
-    }
-    params = {
-        'client_id': AIRTABLE_CLIENT_ID,
-        'grant_type': "refresh_token",
-        'refresh_token': airtable_config.authSettings.refreshToken,
-    }
-    response = httpx.post(url=AIRTABLE_TOKEN_URL,
-        headers=headers,
-        data=params
-    )
-    if response.status_code == 400:
-        return airtable_config
-    output = response.json()
-    now = datetime.now()
-
-    access_token_expires_in_seconds = int(output['expires_in'])
-    access_token_expires = now + timedelta(seconds=access_token_expires_in_seconds)
-    access_token_expires_timestamp = (access_token_expires.timestamp())*1000
-    output['expires_in'] = access_token_expires_timestamp
-
-    refresh_token_expires_in_seconds = int(output['refresh_expires_in'])
-    refresh_token_expires = now + timedelta(seconds=refresh_token_expires_in_seconds)
-    refresh_token_expires_timestamp = (refresh_token_expires.timestamp())*1000
-    output['refresh_expires_in'] = refresh_token_expires_timestamp
-
-    airtable_config.authSettings.accessToken = output['access_token']
-    airtable_config.authSettings.refreshToken = output['refresh_token']
-    airtable_config.authSettings.accessTokenExpires = output['expires_in']
-    airtable_config.authSettings.refreshTokenExpires = output['refresh_expires_in']
-    return airtable_config
-
-
 @app.get("/api/refresh-and-update-airtable-auth", tags=["airtable"])
 async def refresh_and_update_airtable_auth(
     interview_id: str,
@@ -1061,10 +2049,12 @@ async def refresh_and_update_airtable_auth(
 ):
     LOG.info("Refreshing Airtable auth token")
     airtable_config = interview_service.get_airtable_config(interview_id)
-    refreshed_airtable_config = refresh_airtable_auth(airtable_config)
-
-    if refreshed_airtable_config:
-        return interview_service.update_data_store_config(interview_id, refreshed_airtable_config)
+    # the tokens are only stored if nobody else refreshed them in the
+    # meantime, since Airtable refresh tokens can only be used once
+    await refresh_and_save_airtable_auth(
+        interview_service, interview_id, airtable_config
+    )
+    return interview_service.get_interview_by_id(interview_id)
 
 @app.get("/api/get-expiring-airtable-refresh-tokens", tags=["airtable"])
 async def get_expiring_airtable_refresh_tokens():
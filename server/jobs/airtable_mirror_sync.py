@@ -0,0 +1,58 @@
+"""Sync the local Airtable mirror for every interview that has an Airtable
+data store. Lookups sync stale tables on their own, so running this on a
+schedule just keeps the mirror warm so that respondents don't have to wait
+for a sync.
+"""
+import asyncio
+import logging
+
+from sqlmodel import Session, select
+
+from server.api.airtable_auth import get_unexpired_airtable_config
+from server.api.async_airtable_api import AsyncAirtableAPI, close_http_client
+from server.api.services.airtable_mirror_service import AirtableMirrorService
+from server.api.services.interview_service import InterviewService
+from server.engine import create_fk_constraint_engine
+from server.models.data_store_setting.data_store_type import DataStoreType
+from server.models.interview import Interview
+
+LOG = logging.getLogger(__name__)
+
+
+async def sync_all_mirrored_tables(session: Session) -> None:
+    interview_service = InterviewService(session)
+    mirror_service = AirtableMirrorService(session)
+    for interview in session.exec(select(Interview)):
+        if not any(
+            setting.type == DataStoreType.AIRTABLE
+            for setting in interview.data_store_settings
+        ):
+            continue
+        try:
+            airtable_config = get_unexpired_airtable_config(
+                interview_service, str(interview.id)
+            )
+            if airtable_config is None:
+                # nobody has used the interview in a while, its lookups sync
+                # the tables they need once it's used again
+                continue
+            await mirror_service.sync_interview_tables(
+                AsyncAirtableAPI(airtable_config), interview
+            )
+        except Exception:  # pylint: disable=broad-except
+            # one broken interview (e.g. a revoked token) shouldn't stop us from
+            # syncing the rest
+            LOG.exception(
+                "Failed to sync Airtable mirror for interview %s", interview.id
+            )
+
+
+async def main() -> None:
+    with Session(create_fk_constraint_engine()) as db_session:
+        await sync_all_mirrored_tables(db_session)
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
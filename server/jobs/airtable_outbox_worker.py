@@ -0,0 +1,55 @@
+"""Deliver the record writes waiting in the Airtable outbox. When
+AIRTABLE_OUTBOX_ENABLED is set, the API server runs `run_outbox_worker` in
+the background. Running this module delivers everything that is currently
+due and exits, e.g. to drain the outbox after an Airtable outage.
+"""
+import asyncio
+import logging
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from server.api.airtable_config import (
+    AIRTABLE_OUTBOX_BATCH_SIZE,
+    AIRTABLE_OUTBOX_FLUSH_INTERVAL_SECONDS,
+)
+from server.api.async_airtable_api import close_http_client
+from server.api.services.airtable_outbox_service import AirtableOutboxService
+from server.engine import create_fk_constraint_engine
+
+LOG = logging.getLogger(__name__)
+
+
+async def flush_outbox(engine: Engine) -> int:
+    """Deliver one batch of due entries. Returns how many were attempted."""
+    with Session(engine) as session:
+        return await AirtableOutboxService(session).deliver_due_entries()
+
+
+async def run_outbox_worker(engine: Engine) -> None:
+    """Deliver due entries until cancelled, waiting between batches unless
+    there is a backlog.
+    """
+    while True:
+        try:
+            attempted = await flush_outbox(engine)
+        except Exception:  # pylint: disable=broad-except
+            # keep the worker alive, the entries will be retried
+            LOG.exception("Failed to flush the Airtable outbox")
+            attempted = 0
+        if attempted < AIRTABLE_OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(AIRTABLE_OUTBOX_FLUSH_INTERVAL_SECONDS)
+
+
+async def main() -> None:
+    engine = create_fk_constraint_engine()
+    while await flush_outbox(engine) >= AIRTABLE_OUTBOX_BATCH_SIZE:
+        pass
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    # this module is also imported by the API server, which sets up its own
+    # logging
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""Renew Airtable access tokens before they expire.
+
+Airtable access tokens only last an hour. Rather than refreshing a token in
+the middle of a request once it has expired, the API server runs
+`run_token_refresher` in the background, which renews every token that
+expires within AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS, every
+AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS. Only the tokens of interviews that
+were used in the last AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS are renewed:
+refresh tokens rotate on every refresh, so renewing every token would keep
+the grants of abandoned interviews alive forever, and their editors would
+never be told that the grant expired. Requests still refresh a token
+themselves if it's about to expire, e.g. if the refresher isn't running.
+Running this module renews the expiring tokens once and exits.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from server.api.airtable_auth import refresh_airtable_auth
+from server.api.async_airtable_api import close_http_client
+from server.api.services.interview_service import InterviewService
+from server.engine import create_fk_constraint_engine
+from server.jobs.jobs_config import (
+    AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS,
+    AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS,
+    AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS,
+)
+from server.models.airtable_token_use import AirtableTokenUse
+from server.models.data_store_setting.airtable_config import AirtableConfig
+from server.models.data_store_setting.data_store_setting import DataStoreSetting
+from server.models.data_store_setting.data_store_type import DataStoreType
+
+LOG = logging.getLogger(__name__)
+
+
+def _get_airtable_settings(engine: Engine) -> list[tuple[Any, Any]]:
+    """The Airtable settings whose tokens were used recently"""
+    used_since = datetime.utcnow() - timedelta(
+        days=AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS
+    )
+    with Session(engine) as session:
+        return session.exec(
+            select(DataStoreSetting.interview_id, DataStoreSetting.config)
+            .join(
+                AirtableTokenUse,
+                AirtableTokenUse.data_store_setting_id == DataStoreSetting.id,
+            )
+            .where(
+                DataStoreSetting.type == DataStoreType.AIRTABLE,
+                AirtableTokenUse.last_used_at >= used_since,
+            )
+        ).all()
+
+
+def _save_refreshed_auth(
+    engine: Engine,
+    interview_id: str,
+    used_refresh_token: str,
+    refreshed_config: AirtableConfig,
+) -> bool:
+    with Session(engine) as session:
+        return InterviewService(session).save_refreshed_airtable_auth(
+            interview_id, used_refresh_token, refreshed_config
+        )
+
+
+async def refresh_expiring_tokens(engine: Engine) -> int:
+    """Renew the access tokens of recently used interviews that expire soon.
+    Returns how many were renewed."""
+    # the database is read and written in a thread, so that the event loop
+    # keeps serving requests meanwhile
+    settings = await asyncio.to_thread(_get_airtable_settings, engine)
+
+    refreshed = 0
+    for interview_id, config in settings:
+        try:
+            airtable_config = AirtableConfig.parse_obj(config)
+            auth_settings = airtable_config.authSettings
+            now_ms = time.time() * 1000
+            # the refresh token has expired, so the editor has to connect
+            # Airtable again
+            if (
+                not auth_settings.refreshToken
+                or auth_settings.refreshTokenExpires <= now_ms
+            ):
+                continue
+            if (
+                auth_settings.accessTokenExpires
+                > now_ms + AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS * 1000
+            ):
+                continue
+
+            used_refresh_token = auth_settings.refreshToken
+            new_config = await refresh_airtable_auth(airtable_config.copy(deep=True))
+            # refresh_airtable_auth gives the config back unchanged when
+            # Airtable turns the refresh token down
+            if (
+                new_config is None
+                or new_config.authSettings.refreshToken == used_refresh_token
+            ):
+                continue
+            # the tokens are only stored if nobody else refreshed them first
+            if await asyncio.to_thread(
+                _save_refreshed_auth,
+                engine,
+                str(interview_id),
+                used_refresh_token,
+                new_config,
+            ):
+                refreshed += 1
+        except Exception:  # pylint: disable=broad-except
+            # one bad setting shouldn't stop the others from being refreshed
+            LOG.exception(
+                "Failed to refresh the Airtable token of interview %s", interview_id
+            )
+    return refreshed
+
+
+async def run_token_refresher(engine: Engine) -> None:
+    """Renew expiring access tokens until cancelled"""
+    while True:
+        try:
+            refreshed = await refresh_expiring_tokens(engine)
+            if refreshed:
+                LOG.info("Refreshed %d Airtable access tokens", refreshed)
+        except Exception:  # pylint: disable=broad-except
+            # keep the refresher alive, requests can still refresh tokens
+            LOG.exception("Failed to refresh Airtable access tokens")
+        await asyncio.sleep(AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS)
+
+
+async def main() -> None:
+    engine = create_fk_constraint_engine()
+    refreshed = await refresh_expiring_tokens(engine)
+    LOG.info("Refreshed %d Airtable access tokens", refreshed)
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    # this module is also imported by the API server, which sets up its own
+    # logging
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,37 @@
+"""Leases that keep a background job from running in more than one API server
+process at a time."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from server.models.job_lease import JobLease
+
+
+def take_job_lease(engine: Engine, name: str, holder: str, seconds: float) -> bool:
+    """
+    Take (or renew) the lease of a job for `seconds`, unless another holder's
+    lease on it hasn't expired yet.
+
+    Returns: whether `holder` has the lease now
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    with Session(engine) as session:
+        # a single statement, so that two processes can't both take the lease
+        taken = session.execute(
+            insert(JobLease)
+            .values(name=name, holder=holder, expires_at=expires_at)
+            .on_conflict_do_update(
+                index_elements=["name"],
+                set_={"holder": holder, "expires_at": expires_at},
+                where=or_(
+                    JobLease.expires_at <= now,  # type: ignore
+                    JobLease.holder == holder,
+                ),
+            )
+        ).rowcount
+        session.commit()
+    return taken == 1
@@ -4,3 +4,35 @@ AWS_ACCESS_KEY_ID = env.get_env('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = env.get_env('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = env.get_env('AWS_REGION')
 SERVER_URI = env.get_env('REACT_APP_SERVER_URI')
+
+# Background schema refresh of every connected data store. The API server
+# refreshes all schemas every SCHEMA_REFRESH_INTERVAL_SECONDS (0 turns the
+# periodic refresh off, refreshes requested by editors still run), at most
+# SCHEMA_REFRESH_CONCURRENCY interviews at a time, and spreads the refreshes
+# out over SCHEMA_REFRESH_JITTER_SECONDS so they don't all hit Airtable and
+# Google at once.
+SCHEMA_REFRESH_INTERVAL_SECONDS = float(
+    env.get_env('SCHEMA_REFRESH_INTERVAL_SECONDS') or 3600
+)
+SCHEMA_REFRESH_CONCURRENCY = int(env.get_env('SCHEMA_REFRESH_CONCURRENCY') or 2)
+SCHEMA_REFRESH_JITTER_SECONDS = float(
+    env.get_env('SCHEMA_REFRESH_JITTER_SECONDS') or 300
+)
+
+# Background refresh of Airtable access tokens. Every
+# AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS (0 turns it off), the API server
+# renews the access tokens that expire within
+# AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS, so that requests don't have to wait
+# for a refresh. This should be more than the interval plus the 10 minutes
+# before expiry at which requests refresh the token themselves. Only the
+# tokens of interviews used in the last AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS
+# are renewed; the others are refreshed by their next request, or expire.
+AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS = float(
+    env.get_env('AIRTABLE_TOKEN_REFRESH_INTERVAL_SECONDS') or 300
+)
+AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS = float(
+    env.get_env('AIRTABLE_TOKEN_REFRESH_AHEAD_SECONDS') or 1800
+)
+AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS = float(
+    env.get_env('AIRTABLE_TOKEN_REFRESH_MAX_IDLE_DAYS') or 7
+)
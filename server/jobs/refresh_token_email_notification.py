@@ -1,6 +1,6 @@
 import datetime
+from functools import cache
 
-import boto3
 import requests
 
 from server.jobs.jobs_config import (
@@ -13,21 +13,28 @@ from server.jobs.jobs_config import (
 # Define the endpoint URL
 ENDPOINT_URL = f"{SERVER_URI}/api/get-expiring-airtable-refresh-tokens"
 
-# Define the SES client
-ses_client = boto3.client(
-    "ses",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
 
-# Make the request to the endpoint
-response = requests.get(ENDPOINT_URL)
+@cache
+def get_ses_client():
+    """Get the SES client. boto3 takes a while to import, so it is only
+    loaded once there is an email to send."""
+    import boto3
+
+    return boto3.client(
+        "ses",
+        region_name=AWS_REGION,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+    )
 
-# Parse the response data
-data = response.json()
 
 if __name__ == "__main__":
+    # Make the request to the endpoint
+    response = requests.get(ENDPOINT_URL)
+
+    # Parse the response data
+    data = response.json()
+
     # Iterate over the interviews and send the emails
     for interview_id, interview_data in data.items():
         email = interview_data["owner"]["email"]
@@ -45,7 +52,7 @@ if __name__ == "__main__":
         print([email])
         sender_email = "no-reply@tsdataclinic.com"
         raw_email = {"Data": f"Subject: {subject} \n\n{body}\n"}
-        response = ses_client.send_raw_email(
+        response = get_ses_client().send_raw_email(
             Source=sender_email, Destinations=[email], RawMessage=raw_email
         )
         print(response)
@@ -0,0 +1,258 @@
+"""Refresh the schemas of every connected data store in the background.
+
+The API server runs a `SchemaRefreshScheduler`, which refreshes the Airtable
+and Google Sheets schemas of every interview every
+SCHEMA_REFRESH_INTERVAL_SECONDS, and runs the refreshes that editors ask for
+from the update-schema endpoint. Every server process runs a scheduler, but
+only the one that holds the periodic refresh's lease queues it. Running this
+module refreshes every schema once and exits.
+"""
+import asyncio
+import itertools
+import logging
+import random
+import uuid
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from server.api.airtable_auth import (
+    get_fresh_airtable_config,
+    get_unexpired_airtable_config,
+)
+from server.api.airtable_config import AIRTABLE_SCHEMA_REUSE_SECONDS
+from server.api.async_airtable_api import close_http_client
+from server.api.services.airtable_schema_service import AirtableSchemaService
+from server.api.services.data_store_service import (
+    AirtableSchemaChanges,
+    DataStoreService,
+    GoogleSheetsUpdateSchemaOptions,
+)
+from server.api.services.interview_service import InterviewService
+from server.engine import create_fk_constraint_engine
+from server.jobs.jobs_config import (
+    SCHEMA_REFRESH_CONCURRENCY,
+    SCHEMA_REFRESH_INTERVAL_SECONDS,
+    SCHEMA_REFRESH_JITTER_SECONDS,
+)
+from server.jobs.job_lease import take_job_lease
+from server.models.data_store_setting.data_store_setting import DataStoreSetting
+from server.models.data_store_setting.data_store_type import DataStoreType
+
+LOG = logging.getLogger(__name__)
+
+# refreshes that editors ask for go ahead of the periodic ones
+REQUESTED_PRIORITY = 0
+PERIODIC_PRIORITY = 1
+
+# the lease on queueing the periodic refresh
+PERIODIC_REFRESH_LEASE = "schema_refresh.periodic"
+
+RefreshKey = tuple[str, DataStoreType]
+
+
+async def refresh_schema(
+    engine: Engine,
+    interview_id: str,
+    data_store_type: DataStoreType,
+    spreadsheet_ids: list[str] | None = None,
+    reuse_recent: bool = False,
+) -> None:
+    """
+    Refresh the schema of one data store of an interview.
+
+    Arguments:
+    - spreadsheet_ids: For Google Sheets, the spreadsheets to fetch. Defaults
+      to the spreadsheets that are already in the schema.
+    - reuse_recent: For Airtable, skip the refresh if the schema was refreshed
+      in the last AIRTABLE_SCHEMA_REUSE_SECONDS, e.g. along with another
+      interview connected to the same bases. This is a periodic refresh,
+      so an Airtable schema whose token has expired is skipped: nobody has
+      used the interview in a while.
+    """
+    with Session(engine) as session:
+        interview_service = InterviewService(session)
+        options = None
+        if data_store_type == DataStoreType.AIRTABLE:
+            if not reuse_recent:
+                # an editor asked for this refresh
+                await get_fresh_airtable_config(interview_service, interview_id)
+            elif get_unexpired_airtable_config(interview_service, interview_id) is None:
+                LOG.info(
+                    "Skipped the Airtable schema of idle interview %s", interview_id
+                )
+                return
+        else:
+            if spreadsheet_ids is None:
+                gsheets_config = interview_service.get_google_sheets_config(
+                    interview_id
+                )
+                spreadsheet_ids = [
+                    spreadsheet.id for spreadsheet in gsheets_config.spreadsheets or []
+                ]
+            if not spreadsheet_ids:
+                return
+            options = GoogleSheetsUpdateSchemaOptions(spreadsheetIds=spreadsheet_ids)
+
+        # the schemas are fetched with blocking clients
+        result = await asyncio.to_thread(
+            DataStoreService(session).update_schema,
+            data_store_type,
+            interview_id,
+            options,
+            AIRTABLE_SCHEMA_REUSE_SECONDS if reuse_recent else None,
+        )
+        if isinstance(result, AirtableSchemaChanges):
+            if result.sharedSettings:
+                LOG.info(
+                    "Shared the Airtable schema of interview %s with %d others",
+                    interview_id,
+                    result.sharedSettings,
+                )
+            if result.changed:
+                LOG.info(
+                    "Airtable schema of interview %s changed: %s",
+                    interview_id,
+                    result.bases,
+                )
+        else:
+            LOG.info(
+                "Refreshed %s schema of interview %s",
+                data_store_type.value,
+                interview_id,
+            )
+
+
+class SchemaRefreshScheduler:
+    """
+    Runs schema refreshes in the background, SCHEMA_REFRESH_CONCURRENCY at a
+    time. A refresh that is asked for again before it ran is only run once.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._queue: asyncio.PriorityQueue[
+            tuple[int, int, RefreshKey]
+        ] = asyncio.PriorityQueue()
+        # keeps queue entries with the same priority in order
+        self._counter = itertools.count()
+        # the refreshes that haven't run yet, with the spreadsheet ids to
+        # refresh for Google Sheets
+        self._pending: dict[RefreshKey, list[str] | None] = {}
+        # identifies this scheduler as the holder of the periodic refresh's
+        # lease
+        self._lease_holder = uuid.uuid4().hex
+
+    def enqueue(
+        self,
+        interview_id: str,
+        data_store_type: DataStoreType,
+        spreadsheet_ids: list[str] | None = None,
+        priority: int = REQUESTED_PRIORITY,
+    ) -> None:
+        """Queue a refresh of the schema of one data store of an interview"""
+        key = (interview_id, data_store_type)
+        self._pending[key] = spreadsheet_ids
+        self._queue.put_nowait((priority, next(self._counter), key))
+
+    def enqueue_all(self) -> None:
+        """Queue a refresh of every data store of every interview"""
+        with Session(self.engine) as session:
+            settings = session.exec(
+                select(DataStoreSetting.interview_id, DataStoreSetting.type)
+            ).all()
+            # clean up the schemas of interviews that were deleted since the
+            # last time
+            AirtableSchemaService(session).delete_unused_blobs()
+        for interview_id, data_store_type in settings:
+            key = (str(interview_id), data_store_type)
+            if key not in self._pending:
+                self.enqueue(*key, priority=PERIODIC_PRIORITY)
+
+    async def _work(self) -> None:
+        while True:
+            priority, _, key = await self._queue.get()
+            interview_id, data_store_type = key
+            try:
+                if key not in self._pending:
+                    # this refresh was queued twice and already ran
+                    continue
+                spreadsheet_ids = self._pending.pop(key)
+                await refresh_schema(
+                    self.engine,
+                    interview_id,
+                    data_store_type,
+                    spreadsheet_ids,
+                    # editors who ask for a refresh get a fresh schema
+                    reuse_recent=priority == PERIODIC_PRIORITY,
+                )
+            except Exception:  # pylint: disable=broad-except
+                # one broken data store (e.g. a revoked token) shouldn't stop
+                # us from refreshing the rest
+                LOG.exception(
+                    "Failed to refresh the %s schema of interview %s",
+                    data_store_type.value,
+                    interview_id,
+                )
+            finally:
+                self._queue.task_done()
+
+    def _start_workers(self) -> list[asyncio.Task]:
+        return [
+            asyncio.create_task(self._work())
+            for _ in range(max(SCHEMA_REFRESH_CONCURRENCY, 1))
+        ]
+
+    async def run(self) -> None:
+        """Run requested refreshes, and refresh every schema periodically,
+        until cancelled"""
+        workers = self._start_workers()
+        try:
+            if SCHEMA_REFRESH_INTERVAL_SECONDS <= 0:
+                await asyncio.gather(*workers)
+            while True:
+                # add jitter so servers that started together (or run several
+                # workers) don't refresh every schema at the same moment
+                await asyncio.sleep(random.uniform(0, SCHEMA_REFRESH_JITTER_SECONDS))
+                try:
+                    # the lease lasts an interval, so other server processes
+                    # skip their turn if this one just queued the refresh.
+                    # If this process goes away, another one takes over once
+                    # the lease has expired.
+                    if await asyncio.to_thread(
+                        take_job_lease,
+                        self.engine,
+                        PERIODIC_REFRESH_LEASE,
+                        self._lease_holder,
+                        SCHEMA_REFRESH_INTERVAL_SECONDS,
+                    ):
+                        self.enqueue_all()
+                except Exception:  # pylint: disable=broad-except
+                    LOG.exception("Failed to queue the periodic schema refresh")
+                await asyncio.sleep(SCHEMA_REFRESH_INTERVAL_SECONDS)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def run_until_empty(self) -> None:
+        """Run the queued refreshes and return once they are done"""
+        workers = self._start_workers()
+        try:
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+async def main() -> None:
+    scheduler = SchemaRefreshScheduler(create_fk_constraint_engine())
+    scheduler.enqueue_all()
+    await scheduler.run_until_empty()
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    # this module is also imported by the API server, which sets up its own
+    # logging
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,6 +1,8 @@
 # Import any modules that contain sqlite tables so that the tables can get
 # created when we call server/db.py is loaded, because it imports this entire
 # directory in a single statement (`from . import models`)
-from . import (conditional_action, interview, interview_screen,
-               interview_screen_entry, submission_action, user)
+from . import (airtable_idempotency_key, airtable_mirror, airtable_outbox,
+               airtable_schema, airtable_token_use, conditional_action,
+               interview, interview_screen, interview_screen_entry,
+               job_lease, submission_action, user)
 from .data_store_setting import data_store_setting
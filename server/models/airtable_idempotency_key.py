@@ -0,0 +1,33 @@
+"""This file includes the model for idempotency keys of Airtable record
+writes. This is an internal table that is never returned by the API: it holds
+the result of each write that was made with an `Idempotency-Key` header, so
+that a retry of the write gets the same result back.
+"""
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column
+from sqlalchemy.dialects.sqlite import JSON
+from sqlmodel import Field, SQLModel
+
+# the status code of a key that was claimed by a write that hasn't finished yet
+PENDING_STATUS_CODE = 0
+
+
+class AirtableIdempotencyKey(SQLModel, table=True):
+    """The stored result of a write made with an idempotency key."""
+
+    __tablename__: str = "airtable_idempotency_key"
+    interview_id: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+
+    # a hash of the request that was made with this key, so that reusing the
+    # key for a different request is caught
+    request_hash: str
+    # PENDING_STATUS_CODE until the write finishes
+    status_code: int
+    response: Any = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow, nullable=False, index=True
+    )
+    expires_at: datetime = Field(nullable=False, index=True)
@@ -0,0 +1,53 @@
+"""This file includes the models for the local Airtable mirror. These are
+internal tables that are never returned by the API: they hold a copy of the
+records of any Airtable table that an interview looks up records from.
+
+Each Airtable data store setting has its own mirror, synced with its own
+credentials, so that an interview is never answered with records that were
+read with someone else's token.
+"""
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Column, ForeignKey
+from sqlalchemy.dialects.sqlite import JSON
+from sqlmodel import Field, SQLModel
+from sqlmodel.sql.sqltypes import GUID
+
+
+def _data_store_setting_id_column() -> Column:
+    # the mirror goes away with its data store setting
+    return Column(
+        GUID(),
+        ForeignKey("data_store_setting.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+
+class AirtableMirrorTable(SQLModel, table=True):
+    """The sync state of a single mirrored Airtable table."""
+
+    __tablename__: str = "airtable_mirror_table"
+    data_store_setting_id: uuid.UUID = Field(sa_column=_data_store_setting_id_column())
+    base_id: str = Field(primary_key=True)
+    table_name: str = Field(primary_key=True)
+
+    # the last time we pulled changes from Airtable
+    last_synced_at: datetime | None
+    # the last time we pulled the full table from Airtable (this is the only
+    # way we can find out about deleted records)
+    last_full_sync_at: datetime | None
+
+
+class AirtableMirrorRecord(SQLModel, table=True):
+    """A single mirrored Airtable record."""
+
+    __tablename__: str = "airtable_mirror_record"
+    data_store_setting_id: uuid.UUID = Field(sa_column=_data_store_setting_id_column())
+    base_id: str = Field(primary_key=True)
+    table_name: str = Field(primary_key=True)
+    record_id: str = Field(primary_key=True)
+    created_time: str | None
+    fields: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    synced_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
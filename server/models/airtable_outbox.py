@@ -0,0 +1,69 @@
+"""This file includes the models for the Airtable outbox: record creates and
+updates that were accepted from respondents and are waiting to be delivered
+to Airtable by the outbox worker.
+"""
+import enum
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import Column
+from sqlalchemy.dialects.sqlite import JSON
+from sqlmodel import Field
+
+from server.models_util import APIModel
+
+
+class AirtableOutboxOperation(str, enum.Enum):
+    CREATE = "create"
+    UPDATE = "update"
+
+
+class AirtableOutboxStatus(str, enum.Enum):
+    """The delivery status of an outbox entry"""
+
+    # waiting to be delivered (or retried)
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    # delivery failed too many times, or in a way that retrying won't fix
+    DEAD = "dead"
+
+
+class AirtableOutboxEntryBase(APIModel):
+    """The base AirtableOutboxEntry model"""
+
+    interview_id: uuid.UUID = Field(index=True)
+    base_id: str
+    table_name: str
+    operation: AirtableOutboxOperation
+    # the record to update, or the record that was created once it's delivered
+    record_id: Optional[str]
+    status: AirtableOutboxStatus = Field(
+        default=AirtableOutboxStatus.PENDING, index=True
+    )
+    attempts: int = 0
+    last_error: Optional[str]
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    delivered_at: Optional[datetime]
+
+
+class AirtableOutboxEntry(AirtableOutboxEntryBase, table=True):
+    """The AirtableOutboxEntry model as a database table."""
+
+    __tablename__: str = "airtable_outbox_entry"
+    id: Optional[uuid.UUID] = Field(
+        default_factory=uuid.uuid4, primary_key=True, nullable=False
+    )
+    fields: dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    # the earliest time the worker should (re)try to deliver this entry
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class AirtableOutboxEntryRead(AirtableOutboxEntryBase):
+    """The AirtableOutboxEntry model used in HTTP responses when reading
+    from the database.
+
+    `id` is not optional because it must exist already if it's in the database.
+    """
+
+    id: uuid.UUID
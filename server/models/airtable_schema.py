@@ -0,0 +1,76 @@
+"""This file includes the models for the stored Airtable schemas. These are
+internal tables that are never returned by the API as is: the schema of an
+Airtable data store setting is kept here instead of in the setting's `config`
+JSON, so that reading a setting's auth tokens doesn't load its whole schema,
+and so that a single base or table can be loaded on its own.
+
+The fields of each table are stored as a compressed blob that is addressed by
+the hash of its contents. Interviews that are connected to the same Airtable
+bases reference the same blobs, so each distinct table schema is only stored
+once.
+"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, ForeignKey, LargeBinary
+from sqlmodel import Field, SQLModel
+from sqlmodel.sql.sqltypes import GUID
+
+
+def _data_store_setting_id_column() -> Column:
+    # the schema goes away with its data store setting
+    return Column(
+        GUID(),
+        ForeignKey("data_store_setting.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+
+class AirtableSchemaBlob(SQLModel, table=True):
+    """The zlib-compressed JSON of the fields of a table, stored under the
+    sha256 hash of the uncompressed JSON."""
+
+    __tablename__: str = "airtable_schema_blob"
+    hash: str = Field(primary_key=True)
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    # the size of the uncompressed JSON
+    size: int
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class AirtableSchemaSource(SQLModel, table=True):
+    """Where the Airtable schema of a data store setting was last fetched
+    from, and when."""
+
+    __tablename__: str = "airtable_schema_source"
+    data_store_setting_id: uuid.UUID = Field(sa_column=_data_store_setting_id_column())
+    # the id of the Airtable user whose token the schema was fetched with
+    account_id: str | None = Field(default=None, index=True)
+    refreshed_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+
+class AirtableSchemaBase(SQLModel, table=True):
+    """A base in the Airtable schema of a data store setting."""
+
+    __tablename__: str = "airtable_schema_base"
+    data_store_setting_id: uuid.UUID = Field(sa_column=_data_store_setting_id_column())
+    base_id: str = Field(primary_key=True, index=True)
+    name: str | None
+    fingerprint: str | None
+    # the order of the base in the schema
+    position: int
+
+
+class AirtableSchemaTable(SQLModel, table=True):
+    """A table of a base in the Airtable schema of a data store setting."""
+
+    __tablename__: str = "airtable_schema_table"
+    data_store_setting_id: uuid.UUID = Field(sa_column=_data_store_setting_id_column())
+    base_id: str = Field(primary_key=True)
+    table_id: str = Field(primary_key=True, index=True)
+    name: str | None
+    description: str | None
+    # the order of the table in its base
+    position: int
+    # the blob with the table's fields
+    blob_hash: str = Field(foreign_key="airtable_schema_blob.hash", index=True)
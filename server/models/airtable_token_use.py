@@ -0,0 +1,29 @@
+"""This file includes the model for the last use of the Airtable tokens of a
+data store setting. This is an internal table that is never returned by the
+API: the token refresher only renews the tokens of settings that were used
+recently, so that the grants of interviews nobody uses any more are left to
+expire (and their editors get the refresh token expiry email).
+"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, ForeignKey
+from sqlmodel import Field, SQLModel
+from sqlmodel.sql.sqltypes import GUID
+
+
+class AirtableTokenUse(SQLModel, table=True):
+    """When the Airtable tokens of a data store setting were last used"""
+
+    __tablename__: str = "airtable_token_use"
+    # goes away with its data store setting
+    data_store_setting_id: uuid.UUID = Field(
+        sa_column=Column(
+            GUID(),
+            ForeignKey("data_store_setting.id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+    )
+    last_used_at: datetime = Field(
+        default_factory=datetime.utcnow, nullable=False, index=True
+    )
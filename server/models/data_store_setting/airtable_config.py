@@ -38,6 +38,10 @@ class AirtableBase(BaseModel):
     id: str
     tables: list[AirtableTable]
 
+    # a hash of the base's schema as Airtable last sent it to us, so that a
+    # schema refresh can tell if the base changed
+    fingerprint: str | None = None
+
 
 class AirtableAuthConfig(BaseModel):
     accessToken: str = Field(
@@ -69,5 +73,7 @@ class AirtableConfig(BaseModel):
     apiKey: str | None = None
     authSettings: AirtableAuthConfig
 
-    # An Airtable schema is represented by a list of bases
+    # An Airtable schema is represented by a list of bases. It is stored in
+    # its own tables rather than in the setting's config, so it is only set
+    # in API responses.
     bases: list[AirtableBase] | None = None
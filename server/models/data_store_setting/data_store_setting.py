@@ -48,6 +48,14 @@ class DataStoreSetting(DataStoreSettingBase, table=True):
     # relationships
     interview: "Interview" = Relationship(back_populates="data_store_settings")
 
+    @validator("config")
+    def remove_schema(cls, value: dict) -> dict:  # pylint: disable=no-self-argument
+        # An Airtable schema is stored in its own tables (see
+        # AirtableSchemaService), so it is never kept in the config. This runs
+        # after `validate_config`, so `value` is a dict here.
+        value.pop("bases", None)
+        return value
+
 
 class DataStoreSettingCreate(DataStoreSettingBase):
     """The DataStoreSetting model used when creating a new model.
@@ -41,6 +41,8 @@ class GoogleSheetsSpreadsheet(BaseModel):
     title: str
     id: str
     worksheets: list[GoogleSheetsWorksheet]
+    # the Drive revision of the spreadsheet that the schema was fetched from
+    revision: str | None = None
 
 
 class GoogleSheetsConfig(BaseModel):
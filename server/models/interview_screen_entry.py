@@ -25,9 +25,18 @@ class ResponseType(str, enum.Enum):
 
 class AirtableOptions(BaseModel):
     selectedBase: str
+    # the fields to search on
     selectedFields: list[str]
     selectedTable: str
 
+    # options that are pushed down to Airtable when looking up records
+    # the fields to return for each record. All fields are returned if None.
+    returnedFields: Optional[list[str]]
+    view: Optional[str]
+    # field names to sort by, prefixed with a '-' to sort in descending order
+    sort: Optional[list[str]]
+    maxRecords: Optional[int]
+
 
 class SelectableOption(BaseModel):
     id: str
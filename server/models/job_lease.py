@@ -0,0 +1,19 @@
+"""This file includes the model for the leases of background jobs. This is an
+internal table that is never returned by the API: every API server process
+runs the same background jobs, and a job that should only run in one process
+at a time (e.g. queueing the periodic schema refresh) first takes its lease
+here.
+"""
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class JobLease(SQLModel, table=True):
+    """The process that holds a background job's lease, until it expires"""
+
+    __tablename__: str = "job_lease"
+    name: str = Field(primary_key=True)
+    # a random id of the process that holds the lease
+    holder: str
+    expires_at: datetime = Field(nullable=False)
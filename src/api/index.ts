@@ -18,13 +18,16 @@ export type { ResponseType } from './models/ResponseType';
 export type { SerializedActionConfig } from './models/SerializedActionConfig';
 export type { SerializedAirtableAuthConfig } from './models/SerializedAirtableAuthConfig';
 export type { SerializedAirtableBase } from './models/SerializedAirtableBase';
+export type { SerializedAppendRowResult } from './models/SerializedAppendRowResult';
 export type { SerializedAirtableConfig } from './models/SerializedAirtableConfig';
 export type { SerializedAirtableField } from './models/SerializedAirtableField';
 export type { SerializedAirtableOptions } from './models/SerializedAirtableOptions';
 export type { SerializedAirtableTable } from './models/SerializedAirtableTable';
+export type { SerializedBatchRecordResult } from './models/SerializedBatchRecordResult';
 export type { SerializedConditionalActionCreate } from './models/SerializedConditionalActionCreate';
 export type { SerializedConditionalActionRead } from './models/SerializedConditionalActionRead';
 export type { SerializedConditionGroup } from './models/SerializedConditionGroup';
+export type { SerializedDataStoreSchema } from './models/SerializedDataStoreSchema';
 export type { SerializedDataStoreSettingCreate } from './models/SerializedDataStoreSettingCreate';
 export type { SerializedDataStoreSettingRead } from './models/SerializedDataStoreSettingRead';
 export type { SerializedEditRowPayload } from './models/SerializedEditRowPayload';
@@ -47,6 +50,8 @@ export type { SerializedInterviewScreenRead } from './models/SerializedInterview
 export type { SerializedInterviewScreenReadWithChildren } from './models/SerializedInterviewScreenReadWithChildren';
 export type { SerializedInterviewScreenUpdate } from './models/SerializedInterviewScreenUpdate';
 export type { SerializedInterviewUpdate } from './models/SerializedInterviewUpdate';
+export type { SerializedRecordUpdate } from './models/SerializedRecordUpdate';
+export type { SerializedRecordUpsert } from './models/SerializedRecordUpsert';
 export type { SerializedSelectableOption } from './models/SerializedSelectableOption';
 export type { SerializedSingleCondition } from './models/SerializedSingleCondition';
 export type { SerializedSingleSelectOptions } from './models/SerializedSingleSelectOptions';
@@ -8,5 +8,6 @@ export type SerializedAirtableBase = {
   name?: string;
   id: string;
   tables: Array<SerializedAirtableTable>;
+  fingerprint?: string;
 };
 
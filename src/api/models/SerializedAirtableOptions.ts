@@ -6,5 +6,9 @@ export type SerializedAirtableOptions = {
   selectedBase: string;
   selectedFields: Array<string>;
   selectedTable: string;
+  returnedFields?: Array<string> | null;
+  view?: string | null;
+  sort?: Array<string> | null;
+  maxRecords?: number | null;
 };
 
@@ -0,0 +1,14 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * The result of appending a single row to a worksheet. If the append
+ * failed, `rowNumber` is None and `error` and `statusCode` say why.
+ */
+export type SerializedAppendRowResult = {
+  rowNumber?: number;
+  error?: string;
+  statusCode?: number;
+};
+
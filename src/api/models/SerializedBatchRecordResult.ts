@@ -0,0 +1,16 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * The result of creating or updating a single record in a batch. If the
+ * write failed, `record` is None and `error` and `statusCode` say why, so
+ * the caller can retry just the records that failed.
+ */
+export type SerializedBatchRecordResult = {
+  record?: any;
+  error?: string;
+  statusCode?: number;
+  outboxEntryId?: string;
+};
+
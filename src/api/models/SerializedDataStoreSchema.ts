@@ -0,0 +1,16 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+import type { SerializedAirtableBase } from './SerializedAirtableBase';
+import type { SerializedGoogleSheetsSpreadsheet } from './SerializedGoogleSheetsSpreadsheet';
+
+/**
+ * The schema of a data store: a list of bases for airtable, or a list of
+ * spreadsheets for google sheets
+ */
+export type SerializedDataStoreSchema = {
+  bases?: Array<SerializedAirtableBase>;
+  spreadsheets?: Array<SerializedGoogleSheetsSpreadsheet>;
+};
+
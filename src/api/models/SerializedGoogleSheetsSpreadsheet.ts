@@ -8,5 +8,6 @@ export type SerializedGoogleSheetsSpreadsheet = {
   title: string;
   id: string;
   worksheets: Array<SerializedGoogleSheetsWorksheet>;
+  revision?: string;
 };
 
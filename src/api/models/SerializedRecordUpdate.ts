@@ -0,0 +1,12 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * An update to a single record in a batch update
+ */
+export type SerializedRecordUpdate = {
+  id: string;
+  fields: any;
+};
+
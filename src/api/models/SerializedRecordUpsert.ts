@@ -0,0 +1,13 @@
+/* istanbul ignore file */
+/* tslint:disable */
+/* eslint-disable */
+
+/**
+ * Records to create, or to update if a record with the same values in
+ * `fieldsToMergeOn` already exists
+ */
+export type SerializedRecordUpsert = {
+  fieldsToMergeOn: Array<string>;
+  records: Array<Record<string, any>>;
+};
+
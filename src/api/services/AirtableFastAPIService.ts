@@ -1,6 +1,10 @@
 /* istanbul ignore file */
 /* tslint:disable */
 /* eslint-disable */
+import type { SerializedBatchRecordResult } from '../models/SerializedBatchRecordResult';
+import type { SerializedRecordUpdate } from '../models/SerializedRecordUpdate';
+import type { SerializedRecordUpsert } from '../models/SerializedRecordUpsert';
+
 import type { CancelablePromise } from '../core/CancelablePromise';
 import type { BaseHttpRequest } from '../core/BaseHttpRequest';
 
@@ -44,6 +48,7 @@ export class AirtableFastAPIService {
    * @param tableName
    * @param interviewId
    * @param requestBody
+   * @param idempotencyKey
    * @returns any Successful Response
    * @throws ApiError
    */
@@ -52,6 +57,7 @@ export class AirtableFastAPIService {
     tableName: string,
     interviewId: string,
     requestBody: any,
+    idempotencyKey?: string,
   ): CancelablePromise<any> {
     return this.httpRequest.request({
       method: 'POST',
@@ -61,6 +67,9 @@ export class AirtableFastAPIService {
         'table_name': tableName,
         'interview_id': interviewId,
       },
+      headers: {
+        'idempotency-key': idempotencyKey,
+      },
       body: requestBody,
       mediaType: 'application/json',
       errors: {
@@ -108,6 +117,7 @@ export class AirtableFastAPIService {
    * @param recordId
    * @param interviewId
    * @param requestBody
+   * @param idempotencyKey
    * @returns any Successful Response
    * @throws ApiError
    */
@@ -117,6 +127,7 @@ export class AirtableFastAPIService {
     recordId: string,
     interviewId: string,
     requestBody: any,
+    idempotencyKey?: string,
   ): CancelablePromise<any> {
     return this.httpRequest.request({
       method: 'PUT',
@@ -127,6 +138,135 @@ export class AirtableFastAPIService {
         'record_id': recordId,
         'interview_id': interviewId,
       },
+      headers: {
+        'idempotency-key': idempotencyKey,
+      },
+      body: requestBody,
+      mediaType: 'application/json',
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Create Airtable Records
+   * Create several airtable records in a table, using as few requests to
+   * Airtable as possible. Returns the result for each record in the same order
+   * they were given, so that records that failed can be retried.
+   * @param baseId
+   * @param tableName
+   * @param interviewId
+   * @param requestBody
+   * @param idempotencyKey
+   * @returns SerializedBatchRecordResult Successful Response
+   * @throws ApiError
+   */
+  public createAirtableRecords(
+    baseId: string,
+    tableName: string,
+    interviewId: string,
+    requestBody: Array<Record<string, any>>,
+    idempotencyKey?: string,
+  ): CancelablePromise<Array<SerializedBatchRecordResult>> {
+    return this.httpRequest.request({
+      method: 'POST',
+      url: '/api/airtable-records-batch/{interview_id}/{base_id}/{table_name}',
+      path: {
+        'base_id': baseId,
+        'table_name': tableName,
+        'interview_id': interviewId,
+      },
+      headers: {
+        'idempotency-key': idempotencyKey,
+      },
+      body: requestBody,
+      mediaType: 'application/json',
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Update Airtable Records
+   * Update several airtable records in a table, using as few requests to
+   * Airtable as possible. Returns the result for each update in the same order
+   * they were given, so that updates that failed can be retried.
+   * @param baseId
+   * @param tableName
+   * @param interviewId
+   * @param requestBody
+   * @param idempotencyKey
+   * @returns SerializedBatchRecordResult Successful Response
+   * @throws ApiError
+   */
+  public updateAirtableRecords(
+    baseId: string,
+    tableName: string,
+    interviewId: string,
+    requestBody: Array<SerializedRecordUpdate>,
+    idempotencyKey?: string,
+  ): CancelablePromise<Array<SerializedBatchRecordResult>> {
+    return this.httpRequest.request({
+      method: 'PATCH',
+      url: '/api/airtable-records-batch/{interview_id}/{base_id}/{table_name}',
+      path: {
+        'base_id': baseId,
+        'table_name': tableName,
+        'interview_id': interviewId,
+      },
+      headers: {
+        'idempotency-key': idempotencyKey,
+      },
+      body: requestBody,
+      mediaType: 'application/json',
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Upsert Airtable Records
+   * Create or update several airtable records in a table. A record is updated
+   * if there is already a record with the same values in `fieldsToMergeOn`,
+   * and created otherwise, so a keyed write takes a single round trip instead
+   * of a lookup followed by an update. Returns the result for each record in
+   * the same order they were given.
+   *
+   * Upserts are always sent to Airtable directly, even if
+   * AIRTABLE_OUTBOX_ENABLED is set, because whether they create a record
+   * depends on what is in the table when they are applied.
+   *
+   * If an `Idempotency-Key` header is given, retrying the request with the
+   * same key returns the same results instead of upserting the records again.
+   * @param baseId
+   * @param tableName
+   * @param interviewId
+   * @param requestBody
+   * @param idempotencyKey
+   * @returns SerializedBatchRecordResult Successful Response
+   * @throws ApiError
+   */
+  public upsertAirtableRecords(
+    baseId: string,
+    tableName: string,
+    interviewId: string,
+    requestBody: SerializedRecordUpsert,
+    idempotencyKey?: string,
+  ): CancelablePromise<Array<SerializedBatchRecordResult>> {
+    return this.httpRequest.request({
+      method: 'PATCH',
+      url: '/api/airtable-records-upsert/{interview_id}/{base_id}/{table_name}',
+      path: {
+        'base_id': baseId,
+        'table_name': tableName,
+        'interview_id': interviewId,
+      },
+      headers: {
+        'idempotency-key': idempotencyKey,
+      },
       body: requestBody,
       mediaType: 'application/json',
       errors: {
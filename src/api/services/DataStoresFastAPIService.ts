@@ -2,6 +2,9 @@
 /* tslint:disable */
 /* eslint-disable */
 import type { DataStoreType } from '../models/DataStoreType';
+import type { SerializedAirtableBase } from '../models/SerializedAirtableBase';
+import type { SerializedAirtableTable } from '../models/SerializedAirtableTable';
+import type { SerializedDataStoreSchema } from '../models/SerializedDataStoreSchema';
 import type { SerializedGoogleSheetsUpdateSchemaOptions } from '../models/SerializedGoogleSheetsUpdateSchemaOptions';
 
 import type { CancelablePromise } from '../core/CancelablePromise';
@@ -13,20 +16,25 @@ export class DataStoresFastAPIService {
 
   /**
    * Update Data Store Schema
-   * Fetch the updated data store schema for a given data store type (e.g.
-   * airtable or google sheets) and store the updated schema for the given
-   * interview id.
+   * Queue a refresh of the data store schema for a given data store type (e.g.
+   * airtable or google sheets) of the given interview, and return the schema
+   * we have stored right now. The refresh runs in the background, so the new
+   * schema shows up once it is done.
+   *
+   * For google sheets, `spreadsheetIds` picks the spreadsheets to fetch.
+   * Without it, the spreadsheets that are already in the schema are
+   * refreshed.
    * @param dataStoreType
    * @param interviewId
    * @param requestBody
-   * @returns any Successful Response
+   * @returns SerializedDataStoreSchema Successful Response
    * @throws ApiError
    */
   public updateDataStoreSchema(
     dataStoreType: DataStoreType,
     interviewId: string,
     requestBody?: SerializedGoogleSheetsUpdateSchemaOptions,
-  ): CancelablePromise<any> {
+  ): CancelablePromise<SerializedDataStoreSchema> {
     return this.httpRequest.request({
       method: 'POST',
       url: '/api/data-store/{data_store_type}/update-schema/{interview_id}',
@@ -42,4 +50,59 @@ export class DataStoresFastAPIService {
     });
   }
 
+  /**
+   * Get Airtable Base Schema
+   * Get the stored schema of a single base of an interview's Airtable
+   * data store.
+   * @param interviewId
+   * @param baseId
+   * @returns SerializedAirtableBase Successful Response
+   * @throws ApiError
+   */
+  public getAirtableBaseSchema(
+    interviewId: string,
+    baseId: string,
+  ): CancelablePromise<SerializedAirtableBase> {
+    return this.httpRequest.request({
+      method: 'GET',
+      url: '/api/data-store/airtable/schema/{interview_id}/{base_id}',
+      path: {
+        'interview_id': interviewId,
+        'base_id': baseId,
+      },
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Get Airtable Table Schema
+   * Get the stored schema of a single table of an interview's Airtable
+   * data store.
+   * @param interviewId
+   * @param baseId
+   * @param tableId
+   * @returns SerializedAirtableTable Successful Response
+   * @throws ApiError
+   */
+  public getAirtableTableSchema(
+    interviewId: string,
+    baseId: string,
+    tableId: string,
+  ): CancelablePromise<SerializedAirtableTable> {
+    return this.httpRequest.request({
+      method: 'GET',
+      url: '/api/data-store/airtable/schema/{interview_id}/{base_id}/{table_id}',
+      path: {
+        'interview_id': interviewId,
+        'base_id': baseId,
+        'table_id': tableId,
+      },
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
 }
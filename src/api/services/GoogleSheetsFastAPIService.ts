@@ -3,6 +3,7 @@
 /* eslint-disable */
 import type { CancelablePromise } from '../core/CancelablePromise';
 import type { BaseHttpRequest } from '../core/BaseHttpRequest';
+import type { SerializedAppendRowResult } from '../models/SerializedAppendRowResult';
 
 export class GoogleSheetsFastAPIService {
 
@@ -38,4 +39,118 @@ export class GoogleSheetsFastAPIService {
     });
   }
 
+  /**
+   * Get Google Sheets Records
+   * Search the rows of a Google Sheets worksheet. Filtering can be performed
+   * by adding query parameters to the URL, keyed by column name. The search
+   * is case-insensitive and returns the rows that match any of the terms.
+   * @param interviewId
+   * @param spreadsheetId
+   * @param worksheetTitle
+   * @param match
+   * @param maxRecords
+   * @returns string Successful Response
+   * @throws ApiError
+   */
+  public getGoogleSheetsRecords(
+    interviewId: string,
+    spreadsheetId: string,
+    worksheetTitle: string,
+    match: 'substring' | 'prefix' = 'substring',
+    maxRecords?: number,
+  ): CancelablePromise<Array<Record<string, string>>> {
+    return this.httpRequest.request({
+      method: 'GET',
+      url: '/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}',
+      path: {
+        'interview_id': interviewId,
+        'spreadsheet_id': spreadsheetId,
+        'worksheet_title': worksheetTitle,
+      },
+      query: {
+        'match': match,
+        'maxRecords': maxRecords,
+      },
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Append Google Sheets Records
+   * Append rows to a Google Sheets worksheet. Each record is keyed by column
+   * name. Returns the result for each record in the same order they were
+   * given, with the row number it was written to.
+   * @param interviewId
+   * @param spreadsheetId
+   * @param worksheetTitle
+   * @param requestBody
+   * @returns SerializedAppendRowResult Successful Response
+   * @throws ApiError
+   */
+  public appendGoogleSheetsRecords(
+    interviewId: string,
+    spreadsheetId: string,
+    worksheetTitle: string,
+    requestBody: Array<Record<string, any>>,
+  ): CancelablePromise<Array<SerializedAppendRowResult>> {
+    return this.httpRequest.request({
+      method: 'POST',
+      url: '/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}',
+      path: {
+        'interview_id': interviewId,
+        'spreadsheet_id': spreadsheetId,
+        'worksheet_title': worksheetTitle,
+      },
+      body: requestBody,
+      mediaType: 'application/json',
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
+  /**
+   * Update Google Sheets Record
+   * Update the row of a Google Sheets worksheet whose `primaryKeyColumn` is
+   * `primary_key`. The body is keyed by column name, and only those columns
+   * are written. Returns the updated row, keyed by column name.
+   * @param interviewId
+   * @param spreadsheetId
+   * @param worksheetTitle
+   * @param primaryKey
+   * @param primaryKeyColumn
+   * @param requestBody
+   * @returns any Successful Response
+   * @throws ApiError
+   */
+  public updateGoogleSheetsRecord(
+    interviewId: string,
+    spreadsheetId: string,
+    worksheetTitle: string,
+    primaryKey: string,
+    primaryKeyColumn: string,
+    requestBody: Record<string, any>,
+  ): CancelablePromise<Record<string, any>> {
+    return this.httpRequest.request({
+      method: 'PATCH',
+      url: '/api/google-sheets-records/{interview_id}/{spreadsheet_id}/{worksheet_title}/{primary_key}',
+      path: {
+        'interview_id': interviewId,
+        'spreadsheet_id': spreadsheetId,
+        'worksheet_title': worksheetTitle,
+        'primary_key': primaryKey,
+      },
+      query: {
+        'primaryKeyColumn': primaryKeyColumn,
+      },
+      body: requestBody,
+      mediaType: 'application/json',
+      errors: {
+        422: `Validation Error`,
+      },
+    });
+  }
+
 }
@@ -6,6 +6,7 @@ import {
 } from '@dataclinic/interview';
 import { useParams } from 'react-router-dom';
 import { useMutation } from '@tanstack/react-query';
+import { v4 as uuidv4 } from 'uuid';
 import useInterview from '../../hooks/useInterview';
 import useInterviewScreenEntries from '../../hooks/useInterviewScreenEntries';
 import useInterviewScreens from '../../hooks/useInterviewScreens';
@@ -16,6 +17,11 @@ import * as InterviewScreenEntry from '../../models/InterviewScreenEntry';
 import * as SubmissionAction from '../../models/SubmissionAction';
 import ConfigurableScript from '../../script/ConfigurableScript';
 import { FastAPIService } from '../../api/FastAPIService';
+import { ApiError } from '../../api';
+import type {
+  SerializedBatchRecordResult,
+  SerializedRecordUpdate,
+} from '../../api';
 import assertUnreachable from '../../util/assertUnreachable';
 import type { ResponseData } from '../../script/types';
 import { useToast } from '../ui/Toast';
@@ -25,6 +31,19 @@ import Modal from '../ui/Modal';
 
 const api = new FastAPIService();
 
+// Airtable writes are sent with an idempotency key, so they are safe to retry
+// when the request failed because of the network or the server
+const MAX_AIRTABLE_WRITE_RETRIES = 2;
+function shouldRetryAirtableWrite(
+  failureCount: number,
+  error: unknown,
+): boolean {
+  return (
+    failureCount < MAX_AIRTABLE_WRITE_RETRIES &&
+    !(error instanceof ApiError && error.status < 500)
+  );
+}
+
 type Props = {
   interviewId: string;
   onInterviewReset: () => void;
@@ -60,42 +79,75 @@ function BaseInterviewRunnerView({
     ResponseData | undefined
   >();
   const entries = useInterviewScreenEntries(interviewId);
-  const { mutate: airtableUpdateRecord, isLoading: isUpdatingAirtableRecord } =
-    useMutation({
-      mutationFn: (data: {
-        baseId: string;
-        fields: { [fieldName: string]: string };
-        recordId: string;
-        tableId: string;
-      }) =>
-        api.airtable.updateAirtableRecord(
-          data.baseId,
-          data.tableId,
-          data.recordId,
-          interviewId,
-          data.fields,
-        ),
-    });
-
-  const { mutate: airtableCreateRecord, isLoading: isCreatingAirtableRecord } =
-    useMutation({
-      mutationFn: (data: {
-        baseId: string;
-        fields: { [fieldName: string]: string };
-        tableId: string;
-      }) =>
-        api.airtable.createAirtableRecord(
-          data.baseId,
-          data.tableId,
-          interviewId,
-          data.fields,
-        ),
-    });
   const raiseHTTPErrorToast = useHTTPErrorToast();
   const [errorOnComplete, setErrorOnComplete] = React.useState<
     { errorMessage: string; errorTitle: string } | undefined
   >();
 
+  const onAirtableWriteError = (error: unknown): void => {
+    const { errorMessage, errorTitle } = raiseHTTPErrorToast({ error });
+    setErrorOnComplete({ errorMessage, errorTitle });
+  };
+
+  // records in a batch can fail independently of each other, so raise an
+  // error for the first one that failed
+  const onAirtableWriteSuccess = (
+    results: SerializedBatchRecordResult[],
+  ): void => {
+    const failedResult = results.find(result => result.error);
+    if (failedResult) {
+      const { errorMessage, errorTitle } = raiseHTTPErrorToast({
+        error: undefined,
+        overrideMessage: failedResult.error,
+      });
+      setErrorOnComplete({ errorMessage, errorTitle });
+    }
+  };
+
+  const {
+    mutate: airtableUpdateRecords,
+    isLoading: isUpdatingAirtableRecords,
+  } = useMutation({
+    mutationFn: (data: {
+      baseId: string;
+      idempotencyKey: string;
+      tableId: string;
+      updates: SerializedRecordUpdate[];
+    }) =>
+      api.airtable.updateAirtableRecords(
+        data.baseId,
+        data.tableId,
+        interviewId,
+        data.updates,
+        data.idempotencyKey,
+      ),
+    retry: shouldRetryAirtableWrite,
+    onError: onAirtableWriteError,
+    onSuccess: onAirtableWriteSuccess,
+  });
+
+  const {
+    mutate: airtableCreateRecords,
+    isLoading: isCreatingAirtableRecords,
+  } = useMutation({
+    mutationFn: (data: {
+      baseId: string;
+      idempotencyKey: string;
+      records: Array<{ [fieldName: string]: string }>;
+      tableId: string;
+    }) =>
+      api.airtable.createAirtableRecords(
+        data.baseId,
+        data.tableId,
+        interviewId,
+        data.records,
+        data.idempotencyKey,
+      ),
+    retry: shouldRetryAirtableWrite,
+    onError: onAirtableWriteError,
+    onSuccess: onAirtableWriteSuccess,
+  });
+
   const onInterviewComplete = React.useCallback(
     (responseData: ResponseData): void => {
       if (interview) {
@@ -109,7 +161,26 @@ function BaseInterviewRunnerView({
             new Map(),
           );
 
-        // handle all on-submit actions
+        // collect the records to write for all on-submit actions, grouped by
+        // table, so that each table is written to in as few requests as
+        // possible
+        const updatesByTable: Map<
+          string,
+          {
+            baseId: string;
+            tableId: string;
+            updates: SerializedRecordUpdate[];
+          }
+        > = new Map();
+        const recordsByTable: Map<
+          string,
+          {
+            baseId: string;
+            records: Array<{ [fieldName: string]: string }>;
+            tableId: string;
+          }
+        > = new Map();
+
         interview.submissionActions.forEach(submissionAction => {
           const { config: actionConfig } = submissionAction;
           switch (actionConfig.type) {
@@ -157,21 +228,14 @@ function BaseInterviewRunnerView({
                     },
                   );
 
-                  airtableUpdateRecord(
-                    {
-                      baseId,
-                      tableId,
-                      fields,
-                      recordId: airtableRecordId,
-                    },
-                    {
-                      onError: error => {
-                        const { errorMessage, errorTitle } =
-                          raiseHTTPErrorToast({ error });
-                        setErrorOnComplete({ errorMessage, errorTitle });
-                      },
-                    },
-                  );
+                  const tableKey = `${baseId}/${tableId}`;
+                  const tableUpdates = updatesByTable.get(tableKey) ?? {
+                    baseId,
+                    tableId,
+                    updates: [],
+                  };
+                  tableUpdates.updates.push({ fields, id: airtableRecordId });
+                  updatesByTable.set(tableKey, tableUpdates);
                 }
               }
               break;
@@ -211,35 +275,32 @@ function BaseInterviewRunnerView({
                 },
               );
 
-              airtableCreateRecord(
-                {
-                  fields,
-                  baseId: baseTarget,
-                  tableId: tableTarget,
-                },
-                {
-                  onError: error => {
-                    const { errorMessage, errorTitle } = raiseHTTPErrorToast({
-                      error,
-                    });
-                    setErrorOnComplete({ errorMessage, errorTitle });
-                  },
-                },
-              );
+              const tableKey = `${baseTarget}/${tableTarget}`;
+              const tableRecords = recordsByTable.get(tableKey) ?? {
+                baseId: baseTarget,
+                records: [],
+                tableId: tableTarget,
+              };
+              tableRecords.records.push(fields);
+              recordsByTable.set(tableKey, tableRecords);
               break;
             }
             default:
               assertUnreachable(actionConfig);
           }
         });
+
+        // each write gets its own idempotency key, which is reused if the
+        // write is retried
+        updatesByTable.forEach(tableUpdates =>
+          airtableUpdateRecords({ ...tableUpdates, idempotencyKey: uuidv4() }),
+        );
+        recordsByTable.forEach(tableRecords =>
+          airtableCreateRecords({ ...tableRecords, idempotencyKey: uuidv4() }),
+        );
       }
     },
-    [
-      interview,
-      airtableUpdateRecord,
-      airtableCreateRecord,
-      raiseHTTPErrorToast,
-    ],
+    [interview, airtableUpdateRecords, airtableCreateRecords],
   );
 
   // Construct and run an interview on component load.
@@ -286,7 +347,7 @@ function BaseInterviewRunnerView({
         <InterviewCompletionScreen
           interview={interview}
           isUpdatingBackend={
-            isUpdatingAirtableRecord || isCreatingAirtableRecord
+            isUpdatingAirtableRecords || isCreatingAirtableRecords
           }
           onStartNewInterview={onStartNewInterview}
           error={errorOnComplete}
@@ -12,6 +12,7 @@ import * as DataStoreSetting from '../../../../models/DataStoreSetting';
 import Button from '../../../ui/Button';
 import LabelWrapper from '../../../ui/LabelWrapper';
 import Dropdown from '../../../ui/Dropdown';
+import { useToast } from '../../../ui/Toast';
 import { FastAPIService } from '../../../../api/FastAPIService';
 import assertUnreachable from '../../../../util/assertUnreachable';
 
@@ -28,6 +29,7 @@ type Props = {
 function SettingsCard({ interview, onInterviewChange }: Props): JSX.Element {
   const navigate = useNavigate();
   const location = useLocation();
+  const toaster = useToast();
   const [openGDrivePicker] = useDrivePicker();
 
   const configuredSettings = React.useMemo(() => {
@@ -82,9 +84,18 @@ function SettingsCard({ interview, onInterviewChange }: Props): JSX.Element {
     });
   };
 
+  // schemas are refreshed in the background, so let the editor know to
+  // check back instead of reloading right away
+  const notifySchemaRefreshQueued = (): void => {
+    toaster.notifySuccess(
+      'Schema refresh started',
+      'Reload the page in a minute to see the updated schema.',
+    );
+  };
+
   const updateAirtableSchema = async (): Promise<void> => {
     await api.dataStores.updateDataStoreSchema('airtable', interview.id);
-    navigate(0);
+    notifySchemaRefreshQueued();
   };
 
   const handleRefreshAirtableTokens = async (): Promise<void> => {
@@ -95,6 +106,8 @@ function SettingsCard({ interview, onInterviewChange }: Props): JSX.Element {
   const updateGoogleSheetsSchema = async (
     docs: CallbackDoc[],
   ): Promise<void> => {
+    // the picked spreadsheets aren't stored yet, so their schema is fetched
+    // before the request returns
     await api.dataStores.updateDataStoreSchema('google_sheets', interview.id, {
       spreadsheetIds: docs.map(doc => doc.id),
     });
@@ -26,12 +26,37 @@ export default function useAirtableQuery(
     queryFn: async () => {
       // fetch all based on Base and Table
       if (queryString && interviewId && queryOptions) {
-        const { selectedBase, selectedFields, selectedTable } = queryOptions;
+        const {
+          selectedBase,
+          selectedFields,
+          selectedTable,
+          returnedFields,
+          view,
+          sort,
+          maxRecords,
+        } = queryOptions;
         const searchParams = new URLSearchParams();
         selectedFields.forEach(field => {
           searchParams.append(field, queryString);
         });
 
+        // only ask for the fields we need, the searched fields are always
+        // returned so that results can be displayed
+        if (returnedFields && returnedFields.length > 0) {
+          new Set([...selectedFields, ...returnedFields]).forEach(field => {
+            searchParams.append('_fields', field);
+          });
+        }
+        if (view) {
+          searchParams.append('_view', view);
+        }
+        sort?.forEach(field => {
+          searchParams.append('_sort', field);
+        });
+        if (maxRecords) {
+          searchParams.append('_maxRecords', String(maxRecords));
+        }
+
         // TODO: replace this with a function call using the API service class
         const res = await fetch(
           `/api/airtable-records/${interviewId}/${selectedBase}/${selectedTable}?${searchParams.toString()}`,
@@ -11,6 +11,13 @@ const AirtableOptionsSchema = z.object({
   selectedBase: z.string(),
   selectedFields: z.string().array(),
   selectedTable: z.string(),
+
+  // options that are pushed down to Airtable when looking up records
+  returnedFields: z.string().array().optional().nullable(),
+  view: z.string().optional().nullable(),
+  // prefix a field with '-' to sort in descending order
+  sort: z.string().array().optional().nullable(),
+  maxRecords: z.number().optional().nullable(),
 });
 
 const SelectionOptionSchema = z.object({